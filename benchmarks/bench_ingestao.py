@@ -0,0 +1,150 @@
+"""
+Benchmark de ingestão de ponta a ponta sobre corpus sintéticos.
+
+Para cada escala (número de notas distintas), gera — uma vez, com semente
+fixa — um corpus com ``corpus_sintetico.gerar_corpus`` e executa a ingestão
+completa (``varrer_diretorio(completo=True)`` + ``exportar_csv``) em um
+processo separado, com a pasta de saída isolada em um diretório temporário.
+Mede o tempo de parede, o pico de memória residente (RSS, incluindo os
+processos do pool com ``--jobs``) e a vazão em itens/s, e confere se o total
+de itens exportados é o esperado após a deduplicação.
+
+Os resultados podem ser gravados como referência em
+``benchmarks/baseline_ingestao.json`` (``--gravar-baseline``); nas execuções
+seguintes cada escala é comparada com a referência e o script termina com
+código 1 se o tempo ou a memória piorarem além de ``--tolerancia``.
+
+Uso:
+    python3 benchmarks/bench_ingestao.py                          # escalas 1000 e 10000
+    python3 benchmarks/bench_ingestao.py --escalas 100 1000 100000 --jobs 4
+    python3 benchmarks/bench_ingestao.py --gravar-baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus_sintetico import VERSAO_CORPUS, gerar_corpus  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / 'baseline_ingestao.json'
+PASTA_CORPUS = Path(tempfile.gettempdir()) / 'corpus_nfe_sintetico'
+
+
+def preparar_corpus(notas: int, semente: int, duplicatas: float) -> tuple[Path, dict]:
+    """Gera o corpus da escala, ou reaproveita o gerado em uma execução anterior."""
+    pasta = PASTA_CORPUS / f'v{VERSAO_CORPUS}-{notas}-{semente}-{duplicatas:g}'
+    resumo_json = pasta.with_name(pasta.name + '.json')
+    if resumo_json.exists():
+        return pasta, json.loads(resumo_json.read_text(encoding='utf-8'))
+    print(f"Gerando corpus de {notas} notas em {pasta}...", flush=True)
+    resumo = gerar_corpus(pasta, notas, semente, duplicatas)._asdict()
+    resumo_json.write_text(json.dumps(resumo), encoding='utf-8')
+    return pasta, resumo
+
+
+def executar_ingestao(pasta_corpus: Path, pasta_saida: Path, jobs: int) -> dict:
+    """Ingestão completa no processo atual (chamado pelo processo filho)."""
+    import processadorCuponsFiscais
+
+    # Redireciona resources/outputData para a pasta temporária
+    processadorCuponsFiscais.__file__ = str(pasta_saida / 'src' / 'processadorCuponsFiscais.py')
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with processadorCuponsFiscais.ProcessadorDeCupons() as app:
+            app.varrer_diretorio(pasta_corpus, completo=True, jobs=jobs)
+            itens = app.exportar_csv()
+    segundos = time.perf_counter() - inicio
+    # ru_maxrss em KB no Linux e em bytes no macOS
+    escala = 1 if sys.platform == 'darwin' else 1024
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * escala
+    return {
+        'segundos': round(segundos, 3),
+        'itens': itens,
+        'itens_por_segundo': round(itens / segundos, 1) if segundos else 0.0,
+        'rss_pico_mb': round(rss / (1024 * 1024), 1),
+        'etapas_segundos': app.metricas.relatorio()['etapas_segundos'],
+    }
+
+
+def medir_escala(notas: int, semente: int, duplicatas: float, jobs: int) -> dict:
+    pasta, resumo = preparar_corpus(notas, semente, duplicatas)
+    with tempfile.TemporaryDirectory() as saida:
+        processo = subprocess.run(
+            [sys.executable, __file__, '--executar', str(pasta), saida, '--jobs', str(jobs)],
+            capture_output=True, text=True,
+        )
+    if processo.returncode != 0:
+        raise RuntimeError(f"ingestão de {notas} notas falhou:\n{processo.stderr[-2000:]}")
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    resultado.update(notas=notas, itens_esperados=resumo['itens'], bytes_corpus=resumo['bytes'],
+                     arquivos=sum(resumo['arquivos'].values()))
+    return resultado
+
+
+def comparar(resultado: dict, referencia: dict, tolerancia: float) -> list[str]:
+    """Regressões de tempo ou memória acima da tolerância em relação à referência."""
+    regressoes = []
+    for campo in ('segundos', 'rss_pico_mb'):
+        if referencia.get(campo) and resultado[campo] > referencia[campo] * (1 + tolerancia):
+            regressoes.append(f"{campo}: {referencia[campo]} → {resultado[campo]} "
+                              f"(+{resultado[campo] / referencia[campo] - 1:.0%})")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark de ingestão sobre corpus sintéticos.')
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1000, 10000], metavar='NOTAS')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--duplicatas', type=float, default=0.1)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='piora relativa aceita antes de acusar regressão (0.25 = 25%%)')
+    parser.add_argument('--gravar-baseline', action='store_true',
+                        help=f'grava os resultados como referência em {BASELINE.name}')
+    parser.add_argument('--executar', nargs=2, metavar=('CORPUS', 'SAIDA'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        print(json.dumps(executar_ingestao(Path(args.executar[0]), Path(args.executar[1]), args.jobs)))
+        return 0
+
+    baseline = json.loads(BASELINE.read_text(encoding='utf-8')) if BASELINE.exists() else {}
+    chave_config = f'jobs={args.jobs},semente={args.semente},duplicatas={args.duplicatas:g}'
+    referencias = baseline.get('resultados', {}).get(chave_config, {})
+
+    resultados, falhas = {}, []
+    print(f"{'notas':>8} {'arquivos':>9} {'itens':>9} {'segundos':>9} {'itens/s':>9} {'RSS MB':>8}")
+    for notas in args.escalas:
+        r = medir_escala(notas, args.semente, args.duplicatas, args.jobs)
+        resultados[str(notas)] = r
+        print(f"{notas:>8} {r['arquivos']:>9} {r['itens']:>9} {r['segundos']:>9.2f} "
+              f"{r['itens_por_segundo']:>9.0f} {r['rss_pico_mb']:>8.1f}")
+        if r['itens'] != r['itens_esperados']:
+            falhas.append(f"{notas} notas: {r['itens']} itens exportados, esperados {r['itens_esperados']}")
+        if str(notas) in referencias and not args.gravar_baseline:
+            falhas += [f"{notas} notas: {m}" for m in comparar(r, referencias[str(notas)], args.tolerancia)]
+
+    if args.gravar_baseline:
+        baseline.setdefault('resultados', {}).setdefault(chave_config, {}).update(resultados)
+        baseline['maquina'] = f'{platform.system()} {platform.machine()}, Python {platform.python_version()}'
+        BASELINE.write_text(json.dumps(baseline, ensure_ascii=False, indent=1) + '\n', encoding='utf-8')
+        print(f"Referência gravada em {BASELINE}")
+
+    for falha in falhas:
+        print(f"[REGRESSÃO] {falha}")
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
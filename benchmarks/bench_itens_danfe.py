@@ -0,0 +1,67 @@
+"""
+Benchmark do parser de itens do DANFE (texto da consulta da NFC-e).
+
+Compara o regex anterior — nome com ``.+?`` no início, aplicado ao texto
+achatado em uma linha — com ``extratorPdf.iterar_itens_danfe``, que avança
+pelas âncoras ``(Código: …) Vl. Total``. Mostra o tempo por página para
+documentos de tamanhos crescentes e para um texto sem itens válidos (onde o
+regex anterior retrocede sobre o documento inteiro a cada posição).
+
+Uso:
+    python3 benchmarks/bench_itens_danfe.py
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from extratorPdf import iterar_itens_danfe  # noqa: E402
+
+ITENS_POR_PAGINA = 30
+
+_REGEX_ANTERIOR = (
+    r'(?P<nome>.+?)'
+    r'\(Código:\s*(?P<codigo>[A-Za-z]?\d+)\)'
+    r'\s*Vl\. Total'
+    r'\s*Qtde\.:\s*(?P<qtd>[\d,.]+)'
+    r'\s*UN:\s*(?P<un>\w+)'
+    r'\s*Vl\. Unit\.:\s*(?P<vunit>[\d,.]+)'
+    r'\s*(?P<vtotal>[\d,.]+)'
+)
+
+
+def parser_anterior(texto: str) -> int:
+    texto_linear = texto.replace('\n', ' ').replace('\r', '')
+    return sum(1 for _ in re.finditer(_REGEX_ANTERIOR, texto_linear))
+
+
+def parser_ancoras(texto: str) -> int:
+    return sum(1 for _ in iterar_itens_danfe(texto))
+
+
+def pagina(n: int, valida: bool = True) -> str:
+    linhas = ['08/06/2025, 10:32 NFC-e', 'SUPERMERCADO BOM PRECO LTDA',
+              'CNPJ: 06.057.223/0491-89', 'AV BOA VIAGEM, 100, Recife, PE']
+    for i in range(ITENS_POR_PAGINA):
+        linhas.append(f'PRODUTO {n:03d}-{i:03d} EMBALAGEM 500G (Código: {n * 1000 + i})'
+                      + (' Vl. Total' if valida else ''))
+        linhas.append('Qtde.:1 UN: UN Vl. Unit.: 4,89 4,89')
+    linhas.append(f'https://nfce.sefaz.pe.gov.br/nfce/consulta {n + 1}/99')
+    return '\n'.join(linhas)
+
+
+def medir(nome: str, texto: str, paginas: int) -> None:
+    for parser in (parser_anterior, parser_ancoras):
+        repeticoes = max(1, 100 // paginas)
+        segundos = timeit.timeit(lambda: parser(texto), number=repeticoes) / repeticoes
+        print(f"{nome:<22} {paginas:>4} pág.  {parser.__name__:<16} "
+              f"{segundos * 1000 / paginas:8.3f} ms/pág.  ({parser(texto)} itens)")
+
+
+if __name__ == '__main__':
+    for paginas in (1, 10, 50):
+        medir('DANFE válido', '\n'.join(pagina(n) for n in range(paginas)), paginas)
+    for paginas in (1, 2, 4):
+        medir('sem âncora completa', '\n'.join(pagina(n, valida=False) for n in range(paginas)), paginas)
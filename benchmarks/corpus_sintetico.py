@@ -0,0 +1,310 @@
+"""
+Gerador de corpus sintético de notas fiscais para benchmarks de ingestão.
+
+Com uma semente fixa, gera sempre a mesma pasta de entrada, no formato que
+chega em ``resources/notas_fiscais``:
+
+- XMLs avulsos de NF-e (modelo 55) e NFC-e (modelo 65), com chave de acesso
+  de 44 dígitos e dígito verificador válidos;
+- ZIPs com dezenas de XMLs, parte deles dentro de ZIPs aninhados;
+- exportações do app Citizen (XLSX, aba 'Notas Fiscais');
+- PDFs da página de consulta da NFC-e impressa pelo navegador, no layout
+  lido por ``extratorPdf.iterar_itens_danfe`` (âncoras ``(Código: …) Vl.
+  Total``, rótulo "Chave de acesso" e URL de consulta com a chave). Parte
+  das notas existe só em PDF.
+
+Uma fração das notas (``taxa_duplicatas``) aparece também em um segundo
+arquivo — outro ZIP, uma exportação Citizen ou um PDF —, como
+acontece quando a mesma compra é baixada por mais de um caminho. A
+deduplicação por chave deve manter uma única cópia de cada nota, de modo
+que o total de itens esperado é conhecido (:attr:`ResumoCorpus.itens`).
+
+Uso:
+    python3 benchmarks/corpus_sintetico.py PASTA --notas 1000 [--semente 42] [--duplicatas 0.1]
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+# Catálogo: (descrição, EAN, NCM, unidade, preço base)
+PRODUTOS = [
+    ('LEITE INTEGRAL 1L', '7891000100103', '04012010', 'UN', 4.89),
+    ('LEITE DESNATADO 1L', '7891000100110', '04011010', 'UN', 5.19),
+    ('CAFE TORRADO MOIDO 500G', '7896005800010', '09012100', 'PCT', 18.90),
+    ('ARROZ BRANCO TIPO 1 5KG', '7896006700012', '10063021', 'PCT', 27.50),
+    ('FEIJAO CARIOCA 1KG', '7896006700029', '07133319', 'PCT', 8.99),
+    ('ACUCAR CRISTAL 1KG', '7896006700036', '17019900', 'PCT', 4.79),
+    ('OLEO DE SOJA 900ML', '7891107000014', '15079011', 'UN', 7.49),
+    ('MACARRAO ESPAGUETE 500G', '7896022200018', '19021900', 'PCT', 4.39),
+    ('PAO FRANCES', 'SEM GTIN', '19059090', 'KG', 14.90),
+    ('BANANA PRATA', 'SEM GTIN', '08039000', 'KG', 6.99),
+    ('TOMATE', 'SEM GTIN', '07020000', 'KG', 7.98),
+    ('CEBOLA', 'SEM GTIN', '07031019', 'KG', 5.49),
+    ('BATATA INGLESA', 'SEM GTIN', '07019000', 'KG', 6.49),
+    ('PEITO DE FRANGO CONGELADO 1KG', '7891515000012', '02071400', 'KG', 19.90),
+    ('CARNE MOIDA PATINHO', 'SEM GTIN', '02013000', 'KG', 42.90),
+    ('OVOS BRANCOS 12UN', '7898903000015', '04072100', 'DZ', 11.99),
+    ('QUEIJO MUSSARELA FATIADO', 'SEM GTIN', '04069090', 'KG', 54.90),
+    ('PRESUNTO COZIDO FATIADO', 'SEM GTIN', '16024900', 'KG', 36.90),
+    ('MANTEIGA COM SAL 200G', '7891097100016', '04051000', 'UN', 12.49),
+    ('IOGURTE NATURAL 170G', '7891025100018', '04032000', 'UN', 3.29),
+    ('REFRIGERANTE COLA 2L', '7894900011517', '22021000', 'UN', 9.99),
+    ('AGUA MINERAL 1,5L', '7896065800017', '22011000', 'UN', 2.99),
+    ('CERVEJA LATA 350ML', '7891149100019', '22030000', 'UN', 3.79),
+    ('SUCO DE LARANJA 1L', '7896004000015', '20091200', 'UN', 8.49),
+    ('BISCOITO RECHEADO 140G', '7896058200014', '19053100', 'PCT', 2.99),
+    ('SABAO EM PO 1KG', '7891150000011', '34022000', 'CX', 15.90),
+    ('DETERGENTE LIQUIDO 500ML', '7891022100015', '34022000', 'UN', 2.49),
+    ('PAPEL HIGIENICO 12 ROLOS', '7896110000010', '48181000', 'PCT', 21.90),
+    ('CREME DENTAL 90G', '7891528000013', '33061000', 'UN', 4.99),
+    ('SABONETE 85G', '7891150000028', '34011190', 'UN', 2.29),
+    ('SHAMPOO 350ML', '7891150000035', '33051000', 'UN', 16.90),
+    ('ALFACE CRESPA', 'SEM GTIN', '07051900', 'UN', 3.49),
+    ('MACA GALA', 'SEM GTIN', '08081000', 'KG', 9.98),
+    ('LARANJA PERA', 'SEM GTIN', '08051000', 'KG', 4.49),
+    ('FARINHA DE TRIGO 1KG', '7896079900013', '11010010', 'PCT', 5.99),
+    ('MARGARINA 500G', '7891515000029', '15171000', 'UN', 8.99),
+    ('SACOLA PLASTICA', 'SEM GTIN', '39232100', 'UN', 0.15),
+]
+
+# Emitentes: (CNPJ, razão social, nome fantasia, logradouro, bairro, município, UF, CEP)
+LOJAS = [
+    ('06057223049189', 'SUPERMERCADO BOM PRECO LTDA', 'BOM PRECO', 'AV BOA VIAGEM', 'BOA VIAGEM', 'Recife', 'PE',
+     '51020000'),
+    ('11222333000144', 'ATACADAO DO NORDESTE SA', 'ATACADAO', 'BR 101 SUL', 'PRAZERES', 'Jaboatao', 'PE', '54345000'),
+    ('22333444000155', 'MERCADINHO SAO JOSE LTDA', 'SAO JOSE', 'RUA DO SOL', 'CENTRO', 'Olinda', 'PE', '53020000'),
+    ('33444555000166', 'HIPERMERCADO CASA FORTE LTDA', 'CASA FORTE', 'AV 17 DE AGOSTO', 'CASA FORTE', 'Recife', 'PE',
+     '52060000'),
+    ('44555666000177', 'PADARIA E CONVENIENCIA AURORA ME', 'AURORA', 'RUA DA AURORA', 'BOA VISTA', 'Recife', 'PE',
+     '50050000'),
+    ('55666777000188', 'FARMACIA POPULAR DO POVO LTDA', 'FARMAPOVO', 'AV CAXANGA', 'MADALENA', 'Recife', 'PE',
+     '50720000'),
+]
+
+_NS = 'http://www.portalfiscal.inf.br/nfe'
+
+# Versão do conteúdo gerado; muda quando a mesma semente passa a gerar outro corpus
+VERSAO_CORPUS = 2
+
+_CABECALHO_CITIZEN = ['Chave', 'Descricao', 'TipoDespesa', 'NomeFantasia', 'RazaoSocial', 'Endereco', 'Numero',
+                      'Bairro', 'Cidade', 'UF', 'CEP', 'Quantidade', 'ValorUnitarioProduto', 'ValorTotalProduto',
+                      'DataEmissao', 'CNPJ', 'Unidade', 'NCM']
+
+
+class ResumoCorpus(NamedTuple):
+    """Conteúdo gerado: notas distintas, itens esperados após a deduplicação e arquivos."""
+    notas: int
+    itens: int
+    duplicatas: int
+    arquivos: dict[str, int]
+    bytes: int
+
+
+def _digito_verificador(base: str) -> str:
+    """Dígito verificador da chave de acesso (módulo 11, pesos 2 a 9)."""
+    soma = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(base)))
+    resto = soma % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+class _Nota(NamedTuple):
+    chave: str
+    loja: tuple
+    emissao: datetime
+    numero: int
+    modelo: str
+    itens: list[tuple]  # (produto, qtd, valor_unitario, valor_total)
+
+
+def _gerar_nota(rng: random.Random, numero: int) -> _Nota:
+    loja = rng.choice(LOJAS)
+    emissao = datetime(2024, 1, 1, 8) + timedelta(days=rng.randrange(900), minutes=rng.randrange(720))
+    modelo = rng.choice(['65', '65', '55'])
+    base = (f"26{emissao:%y%m}{loja[0]}{modelo}{rng.randrange(1, 10):03d}{numero:09d}1"
+            f"{rng.randrange(10 ** 8):08d}")
+    itens = []
+    for produto in rng.sample(PRODUTOS, rng.randint(3, min(30, len(PRODUTOS)))):
+        qtd = round(rng.uniform(0.2, 3), 3) if produto[3] == 'KG' else float(rng.randint(1, 6))
+        unitario = round(produto[4] * rng.uniform(0.9, 1.3), 2)
+        itens.append((produto, qtd, unitario, round(qtd * unitario, 2)))
+    return _Nota(base + _digito_verificador(base), loja, emissao, numero, modelo, itens)
+
+
+def xml_da_nota(nota: _Nota) -> bytes:
+    """XML de NF-e/NFC-e autorizada (``nfeProc``) com os campos lidos pelo extrator e pelo DANFE."""
+    cnpj, razao, fantasia, logradouro, bairro, municipio, uf, cep = nota.loja
+    dets = ''.join(
+        f'<det nItem="{n}"><prod><cProd>{PRODUTOS.index(p) + 1:04d}</cProd><cEAN>{p[1]}</cEAN>'
+        f'<xProd>{p[0]}</xProd><NCM>{p[2]}</NCM><CFOP>5102</CFOP><uCom>{p[3]}</uCom><qCom>{qtd:.4f}</qCom>'
+        f'<vUnCom>{unitario:.2f}</vUnCom><vProd>{total:.2f}</vProd></prod></det>'
+        for n, (p, qtd, unitario, total) in enumerate(nota.itens, 1)
+    )
+    total = sum(i[3] for i in nota.itens)
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<nfeProc xmlns="{_NS}" versao="4.00"><NFe><infNFe Id="NFe{nota.chave}" versao="4.00">'
+        f'<ide><mod>{nota.modelo}</mod><serie>1</serie><nNF>{nota.numero}</nNF>'
+        f'<dhEmi>{nota.emissao:%Y-%m-%dT%H:%M:%S}-03:00</dhEmi><natOp>VENDA</natOp></ide>'
+        f'<emit><CNPJ>{cnpj}</CNPJ><xNome>{razao}</xNome><xFant>{fantasia}</xFant>'
+        f'<enderEmit><xLgr>{logradouro}</xLgr><nro>{100 + nota.numero % 900}</nro><xBairro>{bairro}</xBairro>'
+        f'<xMun>{municipio}</xMun><UF>{uf}</UF><CEP>{cep}</CEP></enderEmit></emit>'
+        f'{dets}'
+        f'<total><ICMSTot><vProd>{total:.2f}</vProd><vNF>{total:.2f}</vNF></ICMSTot></total>'
+        f'<pag><detPag><tPag>03</tPag><vPag>{total:.2f}</vPag></detPag></pag>'
+        f'</infNFe></NFe></nfeProc>'
+    ).encode('utf-8')
+
+
+def _linhas_citizen(nota: _Nota) -> list[list]:
+    cnpj, razao, fantasia, logradouro, bairro, municipio, uf, cep = nota.loja
+    return [
+        [nota.chave, p[0], 'DocumentoFiscal', fantasia, razao, logradouro, 100 + nota.numero % 900, bairro,
+         municipio, uf, f'{cep[:5]}-{cep[5:]}', f'{qtd:g}'.replace('.', ','), unitario, total,
+         f'{nota.emissao:%d/%m/%Y}', cnpj, p[3], p[2]]
+        for p, qtd, unitario, total in nota.itens
+    ]
+
+
+def _gravar_citizen(caminho: Path, notas: list[_Nota]) -> None:
+    import pandas as pd
+
+    titulo = ['Exportação Citizen'] + [None] * (len(_CABECALHO_CITIZEN) - 1)
+    linhas = [linha for nota in notas for linha in _linhas_citizen(nota)]
+    pd.DataFrame([titulo, _CABECALHO_CITIZEN] + linhas).to_excel(
+        caminho, sheet_name='Notas Fiscais', index=False, header=False)
+
+
+def _valor(numero: float) -> str:
+    return f'{numero:.2f}'.replace('.', ',')
+
+
+def _gravar_pdf_consulta(caminho: Path, nota: _Nota) -> None:
+    """Página de consulta da NFC-e impressa em PDF, com cabeçalho e rodapé do navegador."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    cnpj, razao, fantasia, logradouro, bairro, municipio, uf, cep = nota.loja
+    url = 'https://nfce.sefaz.pe.gov.br/nfce/consulta'
+    linhas = [razao, f'CNPJ: {cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}',
+              f'{logradouro}, {100 + nota.numero % 900}, {bairro}, {municipio}, {uf}']
+    for p, qtd, unitario, total in nota.itens:
+        linhas.append(f'{p[0]} (Código: {PRODUTOS.index(p) + 1:04d}) Vl. Total')
+        linhas.append(f"Qtde.:{f'{qtd:g}'.replace('.', ',')} UN: {p[3]} Vl. Unit.: {_valor(unitario)} {_valor(total)}")
+    linhas += [f'Qtde. total de itens: {len(nota.itens)}',
+               f'Valor a pagar R$: {_valor(sum(i[3] for i in nota.itens))}',
+               f'Número: {nota.numero} Série: 1 Emissão: {nota.emissao:%d/%m/%Y %H:%M:%S}',
+               'Chave de acesso:', ' '.join(nota.chave[i:i + 4] for i in range(0, 44, 4)),
+               f'{url}?p={nota.chave}|2|1|1']
+
+    por_pagina = 45
+    paginas = [linhas[i:i + por_pagina] for i in range(0, len(linhas), por_pagina)]
+    folha = canvas.Canvas(str(caminho), pagesize=A4)
+    for n, pagina in enumerate(paginas, 1):
+        folha.setFont('Helvetica', 9)
+        y = A4[1] - 30
+        for linha in [f'{nota.emissao:%d/%m/%Y, %H:%M} NFC-e'] + pagina + [f'{url} {n}/{len(paginas)}']:
+            folha.drawString(30, y, linha)
+            y -= 16
+        folha.showPage()
+    folha.save()
+
+
+def _zip_de_xmls(notas: list[_Nota]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for nota in notas:
+            zf.writestr(f'NFe{nota.chave}.xml', xml_da_nota(nota))
+    return buffer.getvalue()
+
+
+def gerar_corpus(pasta: Path, notas: int, semente: int = 42, taxa_duplicatas: float = 0.1,
+                 notas_por_zip: int = 50, notas_por_xlsx: int = 200, max_pdfs: int = 20,
+                 proporcoes: tuple[float, float, float] = (0.4, 0.35, 0.25)) -> ResumoCorpus:
+    """
+    Gera ``notas`` notas distintas em ``pasta``, repartidas entre XMLs avulsos,
+    ZIPs e exportações Citizen segundo ``proporcoes``. Um quinto dos ZIPs vai
+    dentro de outro ZIP. Das notas avulsas, até metade de ``max_pdfs`` vem
+    só em PDF. ``taxa_duplicatas`` das notas ganham uma segunda cópia (em
+    outro ZIP, em uma exportação Citizen ou, até completar ``max_pdfs``, em
+    PDF).
+    """
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(semente)
+    todas = [_gerar_nota(rng, numero) for numero in range(1, notas + 1)]
+
+    corte_xml = int(notas * proporcoes[0])
+    corte_zip = corte_xml + int(notas * proporcoes[1])
+    avulsas, em_zip, em_xlsx = todas[:corte_xml], todas[corte_xml:corte_zip], todas[corte_zip:]
+    arquivos = {'xml': 0, 'zip': 0, 'xlsx': 0, 'pdf': 0}
+
+    so_pdf = avulsas[:min(max_pdfs // 2, len(avulsas) // 2)]
+    for nota in so_pdf:
+        _gravar_pdf_consulta(pasta / f'NFCe_{nota.chave}.pdf', nota)
+        arquivos['pdf'] += 1
+    for nota in avulsas[len(so_pdf):]:
+        (pasta / f'NFe{nota.chave}.xml').write_bytes(xml_da_nota(nota))
+        arquivos['xml'] += 1
+
+    lotes = [em_zip[i:i + notas_por_zip] for i in range(0, len(em_zip), notas_por_zip)]
+    for n, lote in enumerate(lotes):
+        conteudo = _zip_de_xmls(lote)
+        if n % 5 == 4:
+            # Exportação que vem "zipada duas vezes"
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zf:
+                zf.writestr(f'lote_{n:04d}.zip', conteudo)
+            conteudo = buffer.getvalue()
+        (pasta / f'lote_{n:04d}.zip').write_bytes(conteudo)
+        arquivos['zip'] += 1
+
+    for n in range(0, len(em_xlsx), notas_por_xlsx):
+        _gravar_citizen(pasta / f'citizen_{n // notas_por_xlsx:04d}.xlsx', em_xlsx[n:n + notas_por_xlsx])
+        arquivos['xlsx'] += 1
+
+    # Segunda cópia de uma fração das notas, em outro formato ou arquivo
+    duplicadas = rng.sample(todas, int(notas * taxa_duplicatas))
+    chaves_xml = {nota.chave for nota in avulsas[len(so_pdf):]}
+    copias_xml, copias_citizen = [], []
+    for nota in duplicadas:
+        if arquivos['pdf'] < max_pdfs and nota.chave in chaves_xml:
+            _gravar_pdf_consulta(pasta / f'NFCe_{nota.chave}.pdf', nota)
+            arquivos['pdf'] += 1
+        elif rng.random() < 0.5:
+            copias_xml.append(nota)
+        else:
+            copias_citizen.append(nota)
+    if copias_xml:
+        (pasta / 'reenvio_duplicadas.zip').write_bytes(_zip_de_xmls(copias_xml))
+        arquivos['zip'] += 1
+    if copias_citizen:
+        _gravar_citizen(pasta / 'citizen_duplicadas.xlsx', copias_citizen)
+        arquivos['xlsx'] += 1
+
+    return ResumoCorpus(
+        notas=notas,
+        itens=sum(len(nota.itens) for nota in todas),
+        duplicatas=len(duplicadas),
+        arquivos=arquivos,
+        bytes=sum(f.stat().st_size for f in pasta.iterdir()),
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um corpus sintético de notas fiscais.')
+    parser.add_argument('pasta', type=Path)
+    parser.add_argument('--notas', type=int, default=1000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--duplicatas', type=float, default=0.1, help='fração das notas com uma segunda cópia')
+    parser.add_argument('--pdfs', type=int, default=20, help='máximo de PDFs (metade com notas só em PDF)')
+    args = parser.parse_args()
+    resumo = gerar_corpus(args.pasta, args.notas, args.semente, args.duplicatas, max_pdfs=args.pdfs)
+    print(json.dumps(resumo._asdict(), ensure_ascii=False, indent=1))
@@ -0,0 +1,190 @@
+"""
+Acumulador colunar dos itens extraídos.
+
+Guardar cada item como um dicionário custa centenas de bytes por item (a
+tabela do dict, mais uma referência por campo) e a montagem do DataFrame no
+final percorre todos eles de novo. O acumulador guarda os itens por coluna:
+
+- ``qtd``, ``preco_unit`` e ``preco_total`` em ``array('d')`` (8 bytes por valor);
+- os demais campos codificados por dicionário: um ``array('i')`` de códigos
+  por coluna e a lista dos valores distintos. Loja, CNPJ, endereço, chave
+  NF-e, data e arquivo de origem se repetem a cada item, e cada valor
+  distinto é guardado uma única vez.
+
+Os itens chegam como dicts (um documento por vez) e ficam pendentes até
+formar um lote de ``TAMANHO_LOTE``; o lote é então convertido coluna a coluna
+com numpy/pandas (``pd.factorize`` para os códigos), em vez de campo a campo.
+
+:meth:`AcumuladorItens.para_dataframe` entrega o mesmo DataFrame que
+``pd.DataFrame(lista_de_dicts)`` produziria — colunas na ordem em que
+apareceram, NaN onde o item não tinha o campo — com os valores de texto
+montados por indexação vetorizada dos códigos. :meth:`AcumuladorItens.blocos`
+entrega esse DataFrame em fatias, para a exportação em blocos.
+"""
+from array import array
+from itertools import chain
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+# Campos numéricos dos itens (guardados como float)
+COLUNAS_NUMERICAS = frozenset({'qtd', 'preco_unit', 'preco_total'})
+
+# Itens pendentes convertidos de uma vez para as colunas
+TAMANHO_LOTE = 4096
+
+_AUSENTE = -1
+
+
+class _ColunaNumerica:
+    __slots__ = ('valores',)
+
+    def __init__(self, faltantes: int = 0):
+        self.valores = array('d', [np.nan]) * faltantes
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    def anexar(self, valores: list) -> None:
+        self.valores.frombytes(np.array(valores, dtype=np.float64).tobytes())
+
+    def completar(self, tamanho: int) -> None:
+        self.valores.extend(array('d', [np.nan]) * (tamanho - len(self.valores)))
+
+    def valor(self, i: int):
+        valor = self.valores[i]
+        return None if valor != valor else valor
+
+    def para_numpy(self) -> np.ndarray:
+        return np.array(self.valores, dtype=np.float64)
+
+    def fatia(self, inicio: int, fim: int, tabela: None = None) -> np.ndarray:
+        return np.frombuffer(self.valores, dtype=np.float64)[inicio:fim].copy()
+
+
+class _ColunaCodificada:
+    __slots__ = ('codigos', 'indice', 'distintos')
+
+    def __init__(self, faltantes: int = 0):
+        self.codigos = array('i', [_AUSENTE]) * faltantes
+        self.indice: dict = {}
+        self.distintos: list = []
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    def anexar(self, valores: list) -> None:
+        # None e NaN viram -1 no factorize, como campo ausente
+        codigos, distintos = pd.factorize(np.array(valores, dtype=object), use_na_sentinel=True)
+        globais = np.empty(len(distintos) + 1, dtype=np.int32)
+        for local, valor in enumerate(distintos):
+            codigo = self.indice.get(valor)
+            if codigo is None:
+                codigo = self.indice[valor] = len(self.distintos)
+                self.distintos.append(valor)
+            globais[local] = codigo
+        globais[-1] = _AUSENTE
+        self.codigos.frombytes(globais[codigos].tobytes())
+
+    def completar(self, tamanho: int) -> None:
+        self.codigos.extend(array('i', [_AUSENTE]) * (tamanho - len(self.codigos)))
+
+    def valor(self, i: int):
+        codigo = self.codigos[i]
+        return None if codigo == _AUSENTE else self.distintos[codigo]
+
+    def tabela(self) -> np.ndarray:
+        # O último elemento (NaN) atende os códigos -1 (campo ausente)
+        valores = np.empty(len(self.distintos) + 1, dtype=object)
+        valores[:-1] = self.distintos
+        valores[-1] = np.nan
+        return valores
+
+    def para_numpy(self) -> np.ndarray:
+        return self.tabela()[np.frombuffer(self.codigos, dtype=np.int32)]
+
+    def fatia(self, inicio: int, fim: int, tabela: np.ndarray) -> np.ndarray:
+        return tabela[np.frombuffer(self.codigos, dtype=np.int32)[inicio:fim]]
+
+
+class AcumuladorItens:
+    """
+    Itens (dicts com os campos do CSV) acumulados por coluna.
+
+    Aceita ``extend`` como a lista de dicts que substitui; ``len``, iteração e
+    indexação devolvem os itens como dicts, para inspeção e testes.
+    """
+
+    def __init__(self, itens: Iterable[dict] = ()):
+        self._colunas: dict[str, _ColunaNumerica | _ColunaCodificada] = {}
+        self._tamanho = 0
+        self._pendentes: list[dict] = []
+        self.extend(itens)
+
+    def __len__(self) -> int:
+        return self._tamanho + len(self._pendentes)
+
+    def __iter__(self) -> Iterator[dict]:
+        self._converter_pendentes()
+        return (self[i] for i in range(self._tamanho))
+
+    def __getitem__(self, i: int) -> dict:
+        self._converter_pendentes()
+        if i < 0:
+            i += self._tamanho
+        if not 0 <= i < self._tamanho:
+            raise IndexError(i)
+        item = {}
+        for nome, coluna in self._colunas.items():
+            valor = coluna.valor(i)
+            if valor is not None:
+                item[nome] = valor
+        return item
+
+    def extend(self, itens: Iterable[dict]) -> None:
+        """Acrescenta itens; campos novos passam a valer NaN nos itens anteriores."""
+        self._pendentes.extend(itens)
+        if len(self._pendentes) >= TAMANHO_LOTE:
+            self._converter_pendentes()
+
+    def _converter_pendentes(self) -> None:
+        lote, self._pendentes = self._pendentes, []
+        if not lote:
+            return
+        for nome in dict.fromkeys(chain.from_iterable(lote)):
+            coluna = self._colunas.get(nome)
+            if coluna is None:
+                tipo = _ColunaNumerica if nome in COLUNAS_NUMERICAS else _ColunaCodificada
+                coluna = self._colunas[nome] = tipo(self._tamanho)
+            coluna.anexar([item.get(nome) for item in lote])
+        self._tamanho += len(lote)
+        for coluna in self._colunas.values():
+            if len(coluna) < self._tamanho:
+                coluna.completar(self._tamanho)
+
+    def para_dataframe(self) -> pd.DataFrame:
+        """DataFrame equivalente a ``pd.DataFrame(list(self))``."""
+        self._converter_pendentes()
+        if not self._tamanho:
+            return pd.DataFrame()
+        return pd.DataFrame({nome: coluna.para_numpy() for nome, coluna in self._colunas.items()}, copy=False)
+
+    def colunas(self) -> list[str]:
+        """Nomes das colunas, na ordem em que apareceram."""
+        self._converter_pendentes()
+        return list(self._colunas)
+
+    def blocos(self, tamanho: int) -> Iterator[pd.DataFrame]:
+        """
+        O DataFrame de :meth:`para_dataframe` em fatias consecutivas de até
+        ``tamanho`` itens, sem montá-lo inteiro (índice de cada fatia a partir de 0).
+        """
+        self._converter_pendentes()
+        # Valores distintos de cada coluna de texto, montados uma vez para todas as fatias
+        tabelas = {nome: coluna.tabela() for nome, coluna in self._colunas.items()
+                   if isinstance(coluna, _ColunaCodificada)}
+        for inicio in range(0, self._tamanho, tamanho):
+            fim = min(inicio + tamanho, self._tamanho)
+            yield pd.DataFrame({nome: coluna.fatia(inicio, fim, tabelas.get(nome))
+                                for nome, coluna in self._colunas.items()}, copy=False)
@@ -0,0 +1,209 @@
+"""
+Base consolidada em SQLite, com notas e itens em tabelas separadas.
+
+O CSV repete loja, CNPJ, endereço, data e chave em cada item e obriga quem o
+consome (dashboard, dicionário, detecção de arquivos novos) a carregar o
+histórico inteiro. Esta base, opcional (``--sqlite`` na linha de comando),
+fica em ``resources/outputData/minha_inflacao.sqlite``:
+
+- ``notas``: uma linha por nota (chave, loja, CNPJ, endereço, data de
+  emissão em ISO, arquivo de origem), identificada pela chave NF-e ou, sem
+  ela, por ``arquivo_origem|data|loja``;
+- ``itens``: uma linha por item (produto, EAN, NCM, quantidade, preços),
+  ligada à nota por ``nota_id``.
+
+Há índices por produto, data de emissão, CNPJ e chave, de modo que filtros
+como "estes produtos neste período" viram consultas indexadas
+(:meth:`BaseSqlite.consultar_itens`) em vez de filtros sobre o DataFrame.
+
+:meth:`BaseSqlite.sincronizar` recebe a base exportada no CSV e faz um
+*upsert* por nota: cada nota guarda uma assinatura dos seus itens e só as
+notas novas ou alteradas são regravadas; as que saíram da base são
+removidas. Os ids das notas permanecem estáveis entre execuções.
+"""
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from notas_itens import COLUNAS_ITEM, COLUNAS_NOTA, separar_notas
+
+NOME_BASE_SQLITE = 'minha_inflacao.sqlite'
+
+_ESQUEMA = """
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS notas (
+    id             INTEGER PRIMARY KEY,
+    identificador  TEXT NOT NULL UNIQUE,
+    chave_nfe      TEXT,
+    loja           TEXT,
+    cnpj           TEXT,
+    endereco       TEXT,
+    emitida_em     TEXT,
+    arquivo_origem TEXT,
+    assinatura     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS itens (
+    id          INTEGER PRIMARY KEY,
+    nota_id     INTEGER NOT NULL REFERENCES notas (id) ON DELETE CASCADE,
+    categoria   TEXT,
+    produto     TEXT,
+    produto_raw TEXT,
+    qtd         REAL,
+    unidade     TEXT,
+    preco_unit  REAL,
+    preco_total REAL,
+    codigo      TEXT,
+    ean         TEXT,
+    ncm         TEXT
+);
+CREATE TABLE IF NOT EXISTS metadados (
+    nome  TEXT PRIMARY KEY,
+    valor TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_notas_chave ON notas (chave_nfe);
+CREATE INDEX IF NOT EXISTS idx_notas_emitida_em ON notas (emitida_em);
+CREATE INDEX IF NOT EXISTS idx_notas_cnpj ON notas (cnpj);
+CREATE INDEX IF NOT EXISTS idx_itens_nota ON itens (nota_id);
+CREATE INDEX IF NOT EXISTS idx_itens_produto ON itens (produto);
+"""
+
+
+def _assinaturas(df: pd.DataFrame, codigos: np.ndarray, quantidade: int) -> list[str]:
+    """Assinatura do conteúdo (campos e ordem dos itens) de cada nota."""
+    hash_linha = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    posicao = pd.Series(codigos).groupby(codigos).cumcount().to_numpy().astype(np.uint64)
+    with np.errstate(over='ignore'):
+        misturado = hash_linha ^ ((posicao + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15))
+        soma = np.zeros(quantidade, dtype=np.uint64)
+        np.add.at(soma, codigos, misturado)
+    contagem = np.bincount(codigos, minlength=quantidade)
+    return [f'{s:016x}-{c}' for s, c in zip(soma.tolist(), contagem.tolist())]
+
+
+def _valores(df: pd.DataFrame, colunas: list[str]) -> Iterable[tuple]:
+    """Linhas de ``df`` com NaN como None (NULL), faltando colunas como None."""
+    presentes = df.reindex(columns=colunas).astype(object)
+    return presentes.where(presentes.notna(), None).itertuples(index=False, name=None)
+
+
+class BaseSqlite:
+    """Acesso à base SQLite de notas e itens."""
+
+    def __init__(self, caminho: Path | str = ':memory:'):
+        self.caminho = caminho
+        if caminho != ':memory:':
+            Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(caminho))
+        self._conn.executescript(_ESQUEMA)
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM notas').fetchone()[0]
+
+    def sincronizar(self, df: pd.DataFrame) -> tuple[int, int]:
+        """
+        Atualiza a base para refletir ``df`` (a base exportada no CSV). Notas
+        novas ou com itens alterados são regravadas, notas ausentes de ``df``
+        são removidas. Retorna ``(notas_gravadas, notas_removidas)``.
+        """
+        notas, itens = separar_notas(df)
+        codigos = itens['id_nota'].to_numpy()
+        colunas_assinatura = [c for c in COLUNAS_NOTA + COLUNAS_ITEM if c in df.columns]
+        notas['assinatura'] = _assinaturas(df[colunas_assinatura], codigos, len(notas))
+        notas['emitida_em'] = (
+            pd.to_datetime(notas['data'], format='mixed', dayfirst=True, errors='coerce').dt.strftime('%Y-%m-%d')
+            if 'data' in notas.columns else None
+        )
+
+        anteriores = dict(self._conn.execute('SELECT identificador, assinatura FROM notas'))
+        alteradas = notas[[anteriores.get(i) != a for i, a in zip(notas['identificador'], notas['assinatura'])]]
+        atuais = set(notas['identificador'])
+        removidas = [i for i in anteriores if i not in atuais]
+
+        colunas_nota = ['identificador', 'chave_nfe', 'loja', 'cnpj', 'endereco', 'emitida_em',
+                        'arquivo_origem', 'assinatura']
+        atualizacao = ', '.join(f'{c} = excluded.{c}' for c in colunas_nota[1:])
+        with self._conn:
+            self._conn.executemany('DELETE FROM notas WHERE identificador = ?', ((i,) for i in removidas))
+            self._conn.executemany(
+                f'INSERT INTO notas ({", ".join(colunas_nota)}) VALUES ({", ".join("?" * len(colunas_nota))}) '
+                f'ON CONFLICT (identificador) DO UPDATE SET {atualizacao}',
+                _valores(alteradas, colunas_nota),
+            )
+            if not alteradas.empty:
+                ids = dict(self._conn.execute('SELECT identificador, id FROM notas'))
+                nota_id = {n: ids[i] for n, i in zip(alteradas['id_nota'], alteradas['identificador'])}
+                self._conn.executemany('DELETE FROM itens WHERE nota_id = ?', ((i,) for i in nota_id.values()))
+                novos = itens[itens['id_nota'].isin(nota_id.keys())]
+                novos = novos.assign(id_nota=novos['id_nota'].map(nota_id))
+                self._conn.executemany(
+                    f'INSERT INTO itens (nota_id, {", ".join(COLUNAS_ITEM)}) '
+                    f'VALUES ({", ".join("?" * (len(COLUNAS_ITEM) + 1))})',
+                    _valores(novos, ['id_nota'] + COLUNAS_ITEM),
+                )
+        return len(alteradas), len(removidas)
+
+    @staticmethod
+    def _assinatura_arquivo(caminho: Path) -> str:
+        stat = Path(caminho).stat()
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    def marcar_exportacao(self, caminho_csv: Path) -> None:
+        """Registra que a base corresponde ao CSV ``caminho_csv`` como está agora."""
+        with self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO metadados VALUES (?, ?)',
+                               ('csv', self._assinatura_arquivo(caminho_csv)))
+
+    def corresponde_a(self, caminho_csv: Path) -> bool:
+        """Indica se a base foi sincronizada com o CSV atual (e não com uma versão anterior)."""
+        linha = self._conn.execute("SELECT valor FROM metadados WHERE nome = 'csv'").fetchone()
+        try:
+            return linha is not None and linha[0] == self._assinatura_arquivo(caminho_csv)
+        except OSError:
+            return False
+
+    def consultar_itens(self, produtos: Iterable[str] | None = None, origens: Iterable[str] | None = None,
+                        inicio: str | None = None, fim: str | None = None,
+                        cnpj: str | None = None) -> pd.DataFrame:
+        """
+        Itens com os dados da nota, nas colunas do CSV ('data' em datetime64),
+        filtrados na própria consulta. ``inicio``/``fim`` são datas ISO
+        (``AAAA-MM-DD``), inclusive.
+        """
+        condicoes, parametros = [], []
+        for coluna, valores in [('i.produto', produtos), ('n.arquivo_origem', origens)]:
+            if valores is not None:
+                valores = list(valores)
+                condicoes.append(f'{coluna} IN ({", ".join("?" * len(valores))})')
+                parametros += valores
+        for condicao, valor in [('n.emitida_em >= ?', inicio), ('n.emitida_em <= ?', fim), ('n.cnpj = ?', cnpj)]:
+            if valor is not None:
+                condicoes.append(condicao)
+                parametros.append(valor)
+        onde = f'WHERE {" AND ".join(condicoes)}' if condicoes else ''
+        consulta = f"""
+            SELECT n.emitida_em AS data, n.loja, n.cnpj, n.endereco, i.categoria, i.produto, i.produto_raw,
+                   i.qtd, i.unidade, i.preco_unit, i.preco_total, i.codigo, i.ean, i.ncm, n.chave_nfe,
+                   n.arquivo_origem
+            FROM itens i JOIN notas n ON n.id = i.nota_id
+            {onde}
+            ORDER BY n.emitida_em, i.id
+        """
+        df = pd.read_sql_query(consulta, self._conn, params=parametros)
+        df['data'] = pd.to_datetime(df['data'], format='%Y-%m-%d')
+        return df
+
+    def produtos(self) -> list[str]:
+        """Nomes brutos distintos dos produtos (antes do dicionário)."""
+        return [linha[0] for linha in self._conn.execute(
+            'SELECT DISTINCT COALESCE(produto_raw, produto) FROM itens WHERE COALESCE(produto_raw, produto) IS NOT NULL')]
+
+    def origens(self) -> set[str]:
+        """Valores distintos de 'arquivo_origem'."""
+        return {linha[0] for linha in self._conn.execute(
+            'SELECT DISTINCT arquivo_origem FROM notas WHERE arquivo_origem IS NOT NULL')}
+
+    def fechar(self) -> None:
+        self._conn.close()
@@ -0,0 +1,118 @@
+"""
+Cache do texto extraído de DANFEs em PDF.
+
+A montagem do layout pelo pdfplumber é a etapa mais lenta da leitura de
+PDFs, e se repete a cada execução para arquivos que não mudaram. Este cache
+guarda, por PDF, a chave de acesso encontrada e o texto de cada página,
+endereçados pelo SHA-256 dos bytes do arquivo — o mesmo DANFE avulso ou
+dentro de um ZIP, renomeado ou movido, reaproveita a mesma entrada.
+
+Cada entrada é um JSON comprimido com gzip em
+``resources/outputData/cache_pdf/<sha256>-<versao>.json.gz``. A etiqueta de
+versão entra no nome do arquivo: mudar a forma de extrair o texto invalida
+as entradas antigas, que são apagadas por :meth:`CacheTextoPdf.podar`. A
+poda também aplica o limite de tamanho, removendo primeiro as entradas
+usadas há mais tempo (o mtime é atualizado a cada leitura).
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from manifesto import calcular_sha256
+
+NOME_CACHE_PDF = 'cache_pdf'
+
+# Tamanho máximo do cache em disco antes da poda
+LIMITE_CACHE_PDF = 256 * 1024 * 1024
+
+_SUFIXO = '.json.gz'
+
+
+def sha256_da_fonte(fonte, tamanho_bloco: int = 1 << 20) -> str:
+    """
+    SHA-256 de um caminho ou de um arquivo binário aberto. Arquivos abertos
+    são lidos do início e devolvidos na posição 0.
+    """
+    if isinstance(fonte, (str, Path)):
+        return calcular_sha256(fonte, tamanho_bloco)
+    h = hashlib.sha256()
+    fonte.seek(0)
+    for bloco in iter(lambda: fonte.read(tamanho_bloco), b''):
+        h.update(bloco)
+    fonte.seek(0)
+    return h.hexdigest()
+
+
+class CacheTextoPdf:
+    """
+    Entradas ``{chave, paginas}`` por SHA-256 do PDF.
+
+    ``paginas`` é None quando o PDF foi pulado (chave já conhecida) e o texto
+    não chegou a ser extraído. A instância guarda apenas caminho e limites,
+    podendo ser repassada aos processos do pool de extração.
+    """
+
+    def __init__(self, pasta: Path | str, versao: str, limite_bytes: int = LIMITE_CACHE_PDF):
+        self.pasta = Path(pasta)
+        self.limite_bytes = limite_bytes
+        self.etiqueta = hashlib.sha1(versao.encode('utf-8')).hexdigest()[:8]
+
+    def _caminho(self, digest: str) -> Path:
+        return self.pasta / f'{digest}-{self.etiqueta}{_SUFIXO}'
+
+    def obter(self, digest: str) -> dict | None:
+        """Entrada do PDF, ou None se não houver (ou estiver ilegível)."""
+        caminho = self._caminho(digest)
+        try:
+            with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+                entrada = json.load(f)
+            os.utime(caminho)
+        except (OSError, ValueError, EOFError):
+            return None
+        return entrada
+
+    def gravar(self, digest: str, chave: str | None, paginas: list[str] | None) -> None:
+        """Grava (ou substitui) a entrada de forma atômica; falhas de escrita são ignoradas."""
+        try:
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f, gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as gz:
+                gz.write(json.dumps({'chave': chave, 'paginas': paginas}, ensure_ascii=False).encode('utf-8'))
+            os.replace(temporario, self._caminho(digest))
+        except OSError as e:
+            print(f"[AVISO] Cache de PDF não gravado: {e}")
+
+    def podar(self) -> int:
+        """
+        Remove entradas de outras versões e, se o cache passar do limite,
+        as usadas há mais tempo. Retorna quantas entradas foram removidas.
+        """
+        if not self.pasta.is_dir():
+            return 0
+        atuais, removidas = [], 0
+        for item in os.scandir(self.pasta):
+            try:
+                if item.name.endswith(f'-{self.etiqueta}{_SUFIXO}'):
+                    stat = item.stat()
+                    atuais.append((stat.st_mtime_ns, stat.st_size, item.path))
+                    continue
+                if item.name.endswith((_SUFIXO, '.tmp')):
+                    os.remove(item.path)
+                    removidas += 1
+            except OSError:
+                continue
+
+        total = sum(tamanho for _, tamanho, _ in atuais)
+        for _, tamanho, caminho in sorted(atuais):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            removidas += 1
+        return removidas
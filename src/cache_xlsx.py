@@ -0,0 +1,142 @@
+"""
+Cache das exportações Citizen (XLSX) já normalizadas.
+
+Ler um XLSX é muito mais lento do que ler um arquivo colunar, e a mesma
+exportação costuma ser colocada de novo, sem mudanças, na pasta de notas.
+Este cache guarda a tabela de itens já normalizada de cada planilha em
+Parquet, endereçada pelo SHA-256 dos bytes do XLSX, em
+``resources/outputData/cache_xlsx/<sha256>-<versao>.parquet``. As chaves das
+notas (na ordem da planilha, inclusive notas sem itens válidos) vão nos
+metadados do arquivo.
+
+Cada fonte lida registra uma referência ``origem -> sha256`` (um arquivo
+pequeno por origem, gravado de forma atômica, o que permite gravar a partir
+dos processos do pool). :meth:`CacheXlsx.podar` remove as referências cujas
+fontes sumiram da pasta de notas e as entradas que ficaram sem referência.
+
+O Parquet exige o pacote ``pyarrow``; sem ele o cache fica desligado
+(:data:`CACHE_XLSX_DISPONIVEL` é False) e as planilhas são sempre relidas.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional
+    pa = pq = None
+
+CACHE_XLSX_DISPONIVEL = pq is not None
+
+NOME_CACHE_XLSX = 'cache_xlsx'
+
+_SUFIXO = '.parquet'
+_METADADO_CHAVES = b'chaves_nfe'
+
+
+class CacheXlsx:
+    """
+    Entradas ``(chaves, itens)`` por SHA-256 da planilha, onde ``itens`` é a
+    tabela normalizada (sem ``arquivo_origem``) com a coluna ``_nota``
+    apontando para a posição da chave em ``chaves``.
+    """
+
+    def __init__(self, pasta: Path | str, versao: str):
+        self.pasta = Path(pasta)
+        self.etiqueta = hashlib.sha1(versao.encode('utf-8')).hexdigest()[:8]
+
+    def _caminho(self, digest: str) -> Path:
+        return self.pasta / f'{digest}-{self.etiqueta}{_SUFIXO}'
+
+    def _pasta_referencias(self) -> Path:
+        return self.pasta / 'referencias'
+
+    def obter(self, digest: str) -> tuple[list[str], pd.DataFrame] | None:
+        """Tabela da planilha, ou None se não houver (ou estiver ilegível)."""
+        if not CACHE_XLSX_DISPONIVEL:
+            return None
+        try:
+            tabela = pq.read_table(self._caminho(digest))
+            chaves = json.loads(tabela.schema.metadata[_METADADO_CHAVES])
+        except (OSError, ValueError, KeyError, TypeError, pa.ArrowException):
+            return None
+        itens = tabela.replace_schema_metadata(None).to_pandas()
+        # Colunas de texto voltam como objetos str, iguais aos da leitura da planilha
+        texto = [c for c in itens.columns if itens[c].dtype.kind not in 'fiu']
+        return chaves, itens.astype({c: object for c in texto})
+
+    def gravar(self, digest: str, chaves: list[str], itens: pd.DataFrame) -> None:
+        """Grava a tabela de forma atômica; falhas de escrita são ignoradas."""
+        if not CACHE_XLSX_DISPONIVEL:
+            return
+        try:
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            tabela = pa.Table.from_pandas(itens, preserve_index=False)
+            metadados = {**(tabela.schema.metadata or {}),
+                         _METADADO_CHAVES: json.dumps(chaves).encode('utf-8')}
+            fd, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+            os.close(fd)
+            pq.write_table(tabela.replace_schema_metadata(metadados), temporario)
+            os.replace(temporario, self._caminho(digest))
+        except (OSError, pa.ArrowException) as e:
+            print(f"[AVISO] Cache de XLSX não gravado: {e}")
+
+    def referenciar(self, origem: str, digest: str) -> None:
+        """Registra que ``origem`` (valor de 'arquivo_origem') usa a entrada ``digest``."""
+        if not CACHE_XLSX_DISPONIVEL:
+            return
+        pasta = self._pasta_referencias()
+        nome = hashlib.sha1(origem.encode('utf-8')).hexdigest() + '.json'
+        try:
+            pasta.mkdir(parents=True, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'origem': origem, 'sha256': digest}, f, ensure_ascii=False)
+            os.replace(temporario, pasta / nome)
+        except OSError as e:
+            print(f"[AVISO] Referência do cache de XLSX não gravada: {e}")
+
+    def podar(self, existe: Callable[[str], bool]) -> int:
+        """
+        Remove as referências cujas origens não existem mais (segundo
+        ``existe(origem)``) e as entradas sem nenhuma referência ou de outra
+        versão. Retorna quantas entradas foram removidas.
+        """
+        if not self.pasta.is_dir():
+            return 0
+        referenciados = set()
+        pasta_referencias = self._pasta_referencias()
+        if pasta_referencias.is_dir():
+            for item in os.scandir(pasta_referencias):
+                try:
+                    with open(item.path, encoding='utf-8') as f:
+                        referencia = json.load(f)
+                    if existe(referencia['origem']):
+                        referenciados.add(referencia['sha256'])
+                        continue
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    pass
+
+        removidas = 0
+        for item in os.scandir(self.pasta):
+            if not item.is_file() or not item.name.endswith((_SUFIXO, '.tmp')):
+                continue
+            digest, _, etiqueta = item.name[:-len(_SUFIXO)].rpartition('-')
+            if etiqueta == self.etiqueta and digest in referenciados:
+                continue
+            try:
+                os.remove(item.path)
+                removidas += 1
+            except OSError:
+                pass
+        return removidas
@@ -0,0 +1,205 @@
+"""
+Checkpoints da ingestão, para retomar uma execução interrompida.
+
+Os itens extraídos ficam em memória até :meth:`exportar_csv` — se a execução
+morre no meio de um ZIP grande ou da pasta (falta de memória, Ctrl+C, membro
+corrompido), tudo o que foi lido se perde e a próxima execução recomeça do
+zero. Durante a varredura, :class:`CheckpointIngestao` grava periodicamente
+em ``resources/outputData/checkpoint_ingestao/`` o que já foi concluído:
+
+- ``parte_NNNNNN.json`` — um incremento por gravação: os itens, as chaves NF-e
+  (com origem, formato e quantidade de itens), as cópias de notas puladas, as
+  chaves da base anterior substituídas e as origens concluídas desde a
+  gravação anterior;
+- ``estado.json`` — os parâmetros da execução (pasta, ``--full``, filtros),
+  a assinatura ``(tamanho, mtime_ns)`` de cada arquivo a ler e quantas partes
+  são válidas.
+
+Cada arquivo é gravado de forma atômica (temporário + ``os.replace``) e a
+parte antes do estado: uma parte gravada por uma execução que morreu antes de
+atualizar o estado é simplesmente ignorada.
+
+Uma origem (arquivo avulso ou membro de ZIP, como em ``arquivo_origem``) só
+conta como concluída quando o documento seguinte já é de outra origem ou o
+arquivo terminou — uma origem com várias notas (lote de XMLs, planilha
+Citizen) interrompida no meio é lida de novo por inteiro.
+
+Com ``--resume``, :meth:`CheckpointIngestao.carregar` devolve o progresso
+acumulado se os parâmetros forem os mesmos; o processador restaura os itens
+e as chaves e ignora as origens concluídas. Depois de uma exportação bem
+sucedida o checkpoint é apagado.
+"""
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from manifesto import gravar_json_atomico
+
+NOME_CHECKPOINT = 'checkpoint_ingestao'
+
+# Incrementar quando o formato das partes mudar — checkpoints antigos são descartados
+VERSAO_CHECKPOINT = 2
+
+# Segundos entre gravações periódicas do checkpoint
+INTERVALO_CHECKPOINT = 30.0
+
+
+class Retomada(NamedTuple):
+    """Progresso de uma execução interrompida, lido do checkpoint."""
+    itens: list[dict]
+    chaves: dict[str, tuple[str, str, int]]  # chave -> (origem, formato, qtd_itens)
+    substituidas: set[str]
+    concluidas: set[str]
+    assinaturas: dict[str, tuple[int, int]]
+    copias: list[tuple[str, str, str]]  # (chave, origem, formato) das notas puladas
+
+
+def _valor_json(valor):
+    # Escalares numpy (itens vindos de planilhas) e demais tipos sem conversão direta
+    return valor.item() if hasattr(valor, 'item') else str(valor)
+
+
+class CheckpointIngestao:
+    """
+    Progresso de uma varredura, gravado em incrementos na pasta ``pasta``.
+
+    O processador informa cada documento registrado (:meth:`documento`) e
+    cada arquivo concluído (:meth:`arquivo_concluido`); a cada ``intervalo``
+    segundos, numa fronteira entre origens, o que já foi concluído é gravado.
+    """
+
+    def __init__(self, pasta: Path, intervalo: float = INTERVALO_CHECKPOINT,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.pasta = Path(pasta)
+        self.intervalo = intervalo
+        self._relogio = relogio
+        self._estado: dict = {}
+        self._ultima_gravacao = relogio()
+        # Concluído desde a última gravação
+        self._itens: list[dict] = []
+        self._chaves: dict[str, tuple[str, str, int]] = {}
+        self._substituidas: set[str] = set()
+        self._concluidas: list[str] = []
+        self._copias: list[tuple[str, str, str]] = []
+        # Origem em leitura: (origem, itens, chaves, substituídas, cópias) — só entra na parte depois de concluída
+        self._atual: tuple[str, list[dict], dict[str, tuple[str, str, int]], set[str],
+                           list[tuple[str, str, str]]] | None = None
+
+    @property
+    def _caminho_estado(self) -> Path:
+        return self.pasta / 'estado.json'
+
+    def _caminho_parte(self, numero: int) -> Path:
+        return self.pasta / f'parte_{numero:06d}.json'
+
+    def iniciar(self, parametros: dict, assinaturas: dict[str, tuple[int, int]]) -> None:
+        """Descarta o checkpoint anterior e começa um novo para esta execução."""
+        self.descartar()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self._estado = {
+            'versao': VERSAO_CHECKPOINT,
+            'parametros': parametros,
+            'assinaturas': assinaturas,
+            'partes': 0,
+        }
+        gravar_json_atomico(self._caminho_estado, self._estado, _valor_json)
+        self._ultima_gravacao = self._relogio()
+
+    def carregar(self, parametros: dict) -> Retomada | None:
+        """
+        Lê o progresso gravado, se houver um checkpoint desta versão e com os
+        mesmos ``parametros``; as partes seguintes continuam a numeração.
+        """
+        try:
+            estado = json.loads(self._caminho_estado.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if estado.get('versao') != VERSAO_CHECKPOINT or estado.get('parametros') != parametros:
+            return None
+        retomada = Retomada([], {}, set(), set(),
+                            {nome: tuple(a) for nome, a in estado.get('assinaturas', {}).items()}, [])
+        try:
+            for numero in range(1, estado['partes'] + 1):
+                parte = json.loads(self._caminho_parte(numero).read_text(encoding='utf-8'))
+                retomada.itens.extend(parte['itens'])
+                retomada.chaves.update({chave: tuple(fonte) for chave, fonte in parte['chaves'].items()})
+                retomada.substituidas.update(parte['substituidas'])
+                retomada.concluidas.update(parte['concluidas'])
+                retomada.copias.extend(tuple(copia) for copia in parte['copias'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self._estado = estado
+        self._ultima_gravacao = self._relogio()
+        return retomada
+
+    def documento(self, origem: str, itens: list[dict] = (), chave: str | None = None,
+                  formato: str | None = None, substituida: bool = False, copia: bool = False) -> None:
+        """
+        Registra um documento processado. Um documento pulado (duplicata) vem
+        sem itens, com ``copia`` — sua chave é guardada como cópia da nota.
+        """
+        if self._atual is not None and self._atual[0] != origem:
+            self._concluir_atual()
+            self.gravar_se_devido()
+        if self._atual is None:
+            self._atual = (origem, [], {}, set(), [])
+        _, itens_atuais, chaves, substituidas, copias = self._atual
+        itens_atuais.extend(itens)
+        if copia:
+            copias.append((chave, origem, formato))
+        elif chave:
+            chaves[chave] = (origem, formato, len(itens))
+            if substituida:
+                substituidas.add(chave)
+
+    def _concluir_atual(self) -> None:
+        if self._atual is None:
+            return
+        origem, itens, chaves, substituidas, copias = self._atual
+        self._atual = None
+        self._itens.extend(itens)
+        self._chaves.update(chaves)
+        self._substituidas |= substituidas
+        self._copias.extend(copias)
+        self._concluidas.append(origem)
+
+    def arquivo_concluido(self, relativo: str, inteiro: bool = True) -> None:
+        """
+        Fecha a última origem de um arquivo. Com ``inteiro``, o próprio
+        arquivo conta como concluído e não é reaberto na retomada; sem ele
+        (origens ainda pendentes de outra etapa), só as origens lidas contam.
+        """
+        self._concluir_atual()
+        if inteiro:
+            self._concluidas.append(relativo)
+        self.gravar_se_devido()
+
+    def gravar_se_devido(self) -> None:
+        if self._relogio() - self._ultima_gravacao >= self.intervalo:
+            self.gravar()
+
+    def gravar(self) -> None:
+        """Grava o que foi concluído desde a última gravação como uma nova parte."""
+        self._ultima_gravacao = self._relogio()
+        if not self._estado or not (self._concluidas or self._itens):
+            return
+        numero = self._estado['partes'] + 1
+        gravar_json_atomico(self._caminho_parte(numero), {
+            'itens': self._itens,
+            'chaves': self._chaves,
+            'substituidas': sorted(self._substituidas),
+            'concluidas': self._concluidas,
+            'copias': self._copias,
+        }, _valor_json)
+        self._estado['partes'] = numero
+        gravar_json_atomico(self._caminho_estado, self._estado, _valor_json)
+        self._itens, self._chaves, self._substituidas, self._concluidas, self._copias = [], {}, set(), [], []
+
+    def descartar(self) -> None:
+        """Apaga o checkpoint (após uma exportação bem sucedida ou ao recomeçar)."""
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        self._estado = {}
+        self._atual = None
+        self._itens, self._chaves, self._substituidas, self._concluidas, self._copias = [], {}, set(), [], []
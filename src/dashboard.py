@@ -14,25 +14,60 @@ import json
 import urllib.parse
 import urllib.request
 from pathlib import Path
-from utils import filtrar_produtos, resolver_danfe
+from manifesto import ManifestoIngestao, NOME_MANIFESTO
+from notas_itens import separar_notas
+from utils import (abrir_base_sqlite, acrescentar_itens, carregar_base, carregar_notas_itens, filtrar_produtos,
+                   resolver_danfe)
+from vigia import NOME_STATUS, ler_status, vigia_ativo
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Minha Inflação Pessoal", layout="wide")
 st.title("🛒 Monitor de Preços & Inflação Pessoal")
 
 # --- CARREGAMENTO DOS DADOS ---
-@st.cache_data
+# Caminho automático: src -> raiz -> resources -> outputData
+PASTA_SAIDA = Path(__file__).resolve().parent.parent / 'resources' / 'outputData'
+
+
+@st.cache_resource
+def _base_em_memoria():
+    # Dicionário compartilhado entre as sessões: a atualização pela barra
+    # lateral troca a base por ela mesma acrescida dos itens novos, sem reler
+    # o disco. Usa o Parquet (já tipado) quando existir; senão, o CSV.
+    return {'df': carregar_base(PASTA_SAIDA)}
+
+
 def carregar_dados():
-    # Caminho automático: src -> raiz -> resources -> outputData
-    caminho_csv = Path(__file__).resolve().parent.parent / 'resources' / 'outputData' / 'minha_inflacao.csv'
-    
-    if not caminho_csv.exists():
+    return _base_em_memoria()['df']
+
+
+@st.cache_data
+def carregar_notas():
+    """
+    Tabelas de notas e de itens (``notas_itens``). Sem os arquivos Parquet,
+    são montadas a partir da base item a item.
+    """
+    tabelas = carregar_notas_itens(PASTA_SAIDA)
+    if tabelas is None:
+        base = carregar_base(PASTA_SAIDA)
+        if base is None:
+            return None
+        tabelas = separar_notas(base)
+    return tabelas
+
+
+def consultar_itens_sqlite(**filtros):
+    """
+    Itens filtrados direto na base SQLite (consulta indexada), ou None se a
+    base não existir ou não estiver sincronizada com o CSV.
+    """
+    base = abrir_base_sqlite(PASTA_SAIDA)
+    if base is None:
         return None
-    
-    # Lê com padrão brasileiro
-    df = pd.read_csv(caminho_csv, sep=';', decimal=',', encoding='utf-8-sig')
-    df['data'] = pd.to_datetime(df['data'], format='mixed', dayfirst=True)
-    return df.sort_values('data')
+    try:
+        return base.consultar_itens(**filtros)
+    finally:
+        base.fechar()
 
 
 @st.cache_data(ttl=60 * 60 * 24)
@@ -151,51 +186,38 @@ def _formatar_notas_endereco_html(df_notas_endereco: pd.DataFrame, limite_notas:
     return '<hr style="margin:6px 0"/>'.join(blocos)
 
 
-def preparar_mapa_notas(df_compras: pd.DataFrame):
-    """Retorna DataFrame agregado por endereço para mapa de compras por NF."""
-    if 'endereco' not in df_compras.columns:
-        return pd.DataFrame()
+def preparar_mapa_notas(df_notas: pd.DataFrame, df_itens: pd.DataFrame):
+    """
+    Retorna DataFrame agregado por endereço para mapa de compras por NF.
 
-    df_end = df_compras.copy()
-    df_end['endereco'] = df_end['endereco'].fillna('').astype(str).str.strip()
-    df_end = df_end[df_end['endereco'] != '']
-    if df_end.empty:
+    Trabalha sobre a tabela de notas (uma linha por nota, já com totais); os
+    itens só são lidos para o resumo das notas que aparecem nos balões.
+    """
+    if 'endereco' not in df_notas.columns:
         return pd.DataFrame()
 
-    chave = (
-        df_end['chave_nfe'].fillna('').astype(str).str.strip()
-        if 'chave_nfe' in df_end.columns
-        else pd.Series('', index=df_end.index)
-    )
-    fallback = (
-        df_end['arquivo_origem'].fillna('').astype(str).str.strip() + '|'
-        + df_end['data'].dt.strftime('%Y-%m-%d') + '|'
-        + df_end['loja'].fillna('').astype(str).str.strip() + '|'
-        + df_end['endereco']
-    )
-    df_end['id_nota'] = chave.where(chave != '', fallback)
-
-    grupos_nf = []
-    for (id_nota, endereco), grupo in df_end.groupby(['id_nota', 'endereco'], dropna=False):
-        grupos_nf.append(
-            {
-                'id_nota': id_nota,
-                'endereco': endereco,
-                'loja': grupo['loja'].dropna().astype(str).iloc[0] if 'loja' in grupo.columns and not grupo['loja'].dropna().empty else 'Loja não informada',
-                'data_nota_dt': grupo['data'].max(),
-                'arquivo_origem': grupo['arquivo_origem'].dropna().astype(str).iloc[0] if 'arquivo_origem' in grupo.columns and not grupo['arquivo_origem'].dropna().empty else '',
-                'valor_total_nf': float(grupo['preco_total'].sum()),
-                'qtd_itens': int(len(grupo)),
-                'itens_resumo_html': _formatar_itens_nf_html(grupo, limite=5),
-            }
-        )
-
-    df_notas = pd.DataFrame(grupos_nf)
+    df_notas = df_notas.copy()
+    df_notas['endereco'] = df_notas['endereco'].astype(object).fillna('').astype(str).str.strip()
+    df_notas = df_notas[df_notas['endereco'] != '']
     if df_notas.empty:
         return pd.DataFrame()
 
+    loja = df_notas['loja'].astype(object) if 'loja' in df_notas.columns else pd.Series(None, index=df_notas.index)
+    df_notas['loja'] = loja.where(loja.notna(), 'Loja não informada').astype(str)
+    df_notas['arquivo_origem'] = df_notas['arquivo_origem'].astype(object).fillna('').astype(str)
+    df_notas = df_notas.rename(columns={'data': 'data_nota_dt', 'valor_total': 'valor_total_nf'})
+
+    # Resumo dos itens apenas das notas exibidas no balão de cada endereço
+    exibidas = df_notas.sort_values('data_nota_dt', ascending=False).groupby('endereco').head(8)
+    itens_exibidos = df_itens[df_itens['id_nota'].isin(exibidas['id_nota'])]
+    resumos = {
+        id_nota: _formatar_itens_nf_html(grupo, limite=5)
+        for id_nota, grupo in itens_exibidos.groupby('id_nota')
+    }
+    df_notas['itens_resumo_html'] = df_notas['id_nota'].map(resumos).fillna('')
+
     grupos_endereco = []
-    for endereco, grupo_endereco in df_notas.groupby('endereco', dropna=False):
+    for endereco, grupo_endereco in df_notas.groupby('endereco'):
         loja_principal = (
             grupo_endereco['loja'].mode().iloc[0]
             if not grupo_endereco['loja'].dropna().empty
@@ -243,26 +265,54 @@ def preparar_mapa_notas(df_compras: pd.DataFrame):
     df_endereco['valor_total_endereco_str'] = df_endereco['valor_total_endereco'].map(lambda x: f'{x:.2f}')
     return df_endereco
 
+@st.cache_resource
+def _ingestao_carregada():
+    # Última ingestão do vigia (--watch) já refletida nos dados em cache
+    return {}
+
+
+# Com o vigia em execução, a base em cache é descartada a cada nova ingestão
+status_vigia = ler_status(PASTA_SAIDA / NOME_STATUS)
+if status_vigia and status_vigia.get('ultima_ingestao'):
+    carregada = _ingestao_carregada()
+    if carregada.get('ultima_ingestao') not in (None, status_vigia['ultima_ingestao']):
+        _base_em_memoria.clear()
+        carregar_notas.clear()
+    carregada['ultima_ingestao'] = status_vigia['ultima_ingestao']
+
 df = carregar_dados()
 
 
 # -------------------------------------------------------
-# Detecta arquivos na pasta que ainda não estão no CSV
+# Detecta mudanças na pasta desde a última ingestão (manifesto)
 # -------------------------------------------------------
-def detectar_novos_arquivos(df_base):
-    pasta_nf = Path(__file__).resolve().parent.parent / 'resources' / 'notas_fiscais'
-    if not pasta_nf.exists():
-        return []
-    extensoes = {'.xml', '.pdf', '.zip', '.xlsx'}
-    arquivos_na_pasta = {f.name for f in pasta_nf.iterdir() if f.suffix.lower() in extensoes}
-    if df_base is None or 'arquivo_origem' not in df_base.columns:
-        return sorted(arquivos_na_pasta)
-    # Extrai o nome-raiz da origem (antes de '::' nos ZIPs)
-    origens_processadas = {
-        str(origem).split('::')[0]
-        for origem in df_base['arquivo_origem'].dropna()
-    }
-    return sorted(arquivos_na_pasta - origens_processadas)
+PASTA_NOTAS = Path(__file__).resolve().parent.parent / 'resources' / 'notas_fiscais'
+EXTENSOES_NOTAS = {'.xml', '.pdf', '.zip', '.xlsx'}
+
+
+@st.cache_resource
+def _hashes_arquivos():
+    # SHA-256 por (nome, tamanho, mtime): arquivos novos são lidos uma vez só entre os reruns
+    return {}
+
+
+@st.cache_resource(max_entries=1)
+def _carregar_manifesto(assinatura):
+    # Relido só quando manifesto ou CSV mudam (assinatura = tamanho e mtime de ambos).
+    # O manifesto só vale junto com o CSV que ele descreve (mesma regra do processador)
+    if not (PASTA_SAIDA / 'minha_inflacao.csv').exists():
+        return ManifestoIngestao()
+    return ManifestoIngestao.carregar(PASTA_SAIDA / NOME_MANIFESTO)
+
+
+def detectar_mudancas():
+    """Arquivos novos, alterados, renomeados, copiados e removidos desde a última ingestão."""
+    assinatura = tuple(
+        (c.stat().st_size, c.stat().st_mtime_ns) if c.exists() else None
+        for c in (PASTA_SAIDA / NOME_MANIFESTO, PASTA_SAIDA / 'minha_inflacao.csv')
+    )
+    manifesto = _carregar_manifesto(assinatura)
+    return manifesto.comparar_pasta(PASTA_NOTAS, EXTENSOES_NOTAS, _hashes_arquivos())
 
 
 def fechar_aba_navegador():
@@ -472,35 +522,68 @@ def auto_fechar_aba_quando_desconectar(
 # --- BARRA LATERAL (REPROCESSAMENTO) ---
 st.sidebar.header("🔄 Atualizar Dados")
 
-novos = detectar_novos_arquivos(df)
+vigiando = vigia_ativo(status_vigia)
+if vigiando:
+    st.sidebar.info(
+        f"👁️ **Ingestão contínua ativa** ({status_vigia.get('estado')})  \n"
+        f"Última ingestão: {status_vigia.get('ultima_ingestao') or '—'}"
+    )
+    for nome in status_vigia.get('pendentes') or []:
+        st.sidebar.caption(f"⏳ aguardando cópia terminar: {nome}")
+    if status_vigia.get('erro'):
+        st.sidebar.error(f"Última ingestão falhou: {status_vigia['erro']}")
+
+mudancas = detectar_mudancas()
+novos = mudancas.pendentes
 
 if novos:
-    st.sidebar.warning(f"**{len(novos)} arquivo(s) novo(s)** encontrado(s):")
-    for nome in novos:
+    st.sidebar.warning(f"**{len(novos)} arquivo(s) novo(s) ou alterado(s)** encontrado(s):")
+    for nome in mudancas.novos:
         st.sidebar.caption(f"• {nome}")
-else:
+    for nome in mudancas.alterados:
+        st.sidebar.caption(f"• {nome} (alterado)")
+elif not mudancas:
     st.sidebar.success("Nenhum arquivo novo detectado.")
+for nome, anterior in mudancas.renomeados.items():
+    st.sidebar.caption(f"↪ {anterior} → {nome} (renomeado)")
+for nome, original in mudancas.duplicados.items():
+    st.sidebar.caption(f"⧉ {nome}: cópia de {original}")
+for nome in mudancas.removidos:
+    st.sidebar.caption(f"✖ {nome} (removido da pasta)")
 
 if st.sidebar.button(
-    "Processar e Atualizar" if novos else "Reprocessar tudo",
-    type="primary" if novos else "secondary",
+    "Processar e Atualizar" if mudancas else "Reprocessar tudo",
+    type="primary" if mudancas else "secondary",
     use_container_width=True,
+    # O vigia já ingere os arquivos novos; duas ingestões ao mesmo tempo disputariam o manifesto
+    disabled=vigiando,
 ):
-    import subprocess, sys
-    script = Path(__file__).resolve().parent / 'processadorCuponsFiscais.py'
+    from processadorCuponsFiscais import ProcessadorDeCupons
+
     with st.sidebar.status("Processando notas fiscais...", expanded=True) as status:
-        result = subprocess.run(
-            [sys.executable, str(script)],
-            capture_output=True,
-            text=True,
-        )
-    if result.returncode == 0:
+        def _progresso(nome, concluidos, total, itens):
+            status.update(label=f"Processando notas fiscais... {concluidos}/{total}")
+            st.write(f"✔ {nome}: {itens} item(ns)")
+
+        try:
+            # Com mudanças na pasta a ingestão é incremental; sem novidades, reprocessa tudo
+            resultado = ProcessadorDeCupons().atualizar(PASTA_NOTAS, completo=not mudancas, progresso=_progresso)
+        except Exception as e:
+            status.update(label="Erro ao processar", state="error")
+            resultado = None
+            st.sidebar.error("❌ Erro ao processar:")
+            st.sidebar.exception(e)
+        else:
+            status.update(label=f"{len(resultado.arquivos)} arquivo(s) processado(s)", state="complete")
+    if resultado is not None:
+        if resultado.somente_acrescimo and df is not None:
+            # Só houve acréscimos: anexa os itens novos à base já carregada
+            _base_em_memoria()['df'] = acrescentar_itens(df, resultado.novos)
+        else:
+            _base_em_memoria.clear()
+        carregar_notas.clear()
         st.sidebar.success("✅ Dados atualizados!")
-        carregar_dados.clear()
         st.rerun()
-    else:
-        st.sidebar.error("❌ Erro ao processar:")
-        st.sidebar.code(result.stderr[-800:] or result.stdout[-800:])
 
 st.sidebar.divider()
 
@@ -555,7 +638,10 @@ with tab1:
     )
 
     if produtos_selecionados:
-        df_filtrado = df[df['produto'].isin(produtos_selecionados)]
+        # Com a base SQLite, o filtro vira uma consulta pelo índice de produto
+        df_filtrado = consultar_itens_sqlite(produtos=produtos_selecionados, origens=mercados or None)
+        if df_filtrado is None:
+            df_filtrado = df[df['produto'].isin(produtos_selecionados)]
         
         # Gráfico de Linha
         fig_evolucao = px.line(
@@ -1077,6 +1163,10 @@ with tab7:
         "o balão exibe o histórico por dia e o número sobre o pin indica quantas NFs existem no local."
     )
 
+    df_notas_nf, df_itens_nf = carregar_notas()
+    if mercados:
+        df_notas_nf = df_notas_nf[df_notas_nf['arquivo_origem'].isin(mercados)]
+
     data_min_nf = df['data'].min().date()
     data_max_nf = df['data'].max().date()
 
@@ -1099,15 +1189,17 @@ with tab7:
     else:
         data_ini_nf, data_fim_nf = data_min_nf, data_max_nf
 
-    df_nf = df[(df['data'].dt.date >= data_ini_nf) & (df['data'].dt.date <= data_fim_nf)].copy()
+    df_nf = df_notas_nf[
+        (df_notas_nf['data'].dt.date >= data_ini_nf) & (df_notas_nf['data'].dt.date <= data_fim_nf)
+    ]
 
     if filtro_loja_nf and 'loja' in df_nf.columns:
-        df_nf = df_nf[df_nf['loja'].fillna('').str.contains(filtro_loja_nf, case=False, na=False)]
+        df_nf = df_nf[df_nf['loja'].astype(object).fillna('').str.contains(filtro_loja_nf, case=False, na=False)]
 
     if df_nf.empty:
         st.warning("Nenhuma NF encontrada com os filtros selecionados.")
     else:
-        df_mapa_nf = preparar_mapa_notas(df_nf)
+        df_mapa_nf = preparar_mapa_notas(df_nf, df_itens_nf)
 
         if df_mapa_nf.empty:
             st.info(
@@ -1,6 +1,7 @@
 import pandas as pd
 from pathlib import Path
 from thefuzz import process, fuzz
+from utils import abrir_base_sqlite
 
 def carregar_dados_existentes(caminho_dic):
     """Carrega o dicionário atual para não perder nada."""
@@ -41,9 +42,17 @@ def atualizar_dicionario():
         print("Erro: CSV de dados não encontrado em outputData.")
         return
     
-    df_raw = pd.read_csv(arquivo_dados, sep=';', decimal=',', encoding='utf-8-sig')
-    col_nome = 'produto_raw' if 'produto_raw' in df_raw.columns else 'produto'
-    produtos_novos_detectados = df_raw[col_nome].dropna().unique()
+    base = abrir_base_sqlite(pasta_saida)
+    if base is not None:
+        # Base SQLite sincronizada: só os nomes distintos, sem carregar o histórico
+        try:
+            produtos_novos_detectados = base.produtos()
+        finally:
+            base.fechar()
+    else:
+        df_raw = pd.read_csv(arquivo_dados, sep=';', decimal=',', encoding='utf-8-sig')
+        col_nome = 'produto_raw' if 'produto_raw' in df_raw.columns else 'produto'
+        produtos_novos_detectados = df_raw[col_nome].dropna().unique()
 
     df_dic = carregar_dados_existentes(arquivo_dicionario)
     
@@ -0,0 +1,167 @@
+"""
+Gravação da base exportada em blocos, com troca atômica dos arquivos.
+
+Montar a base inteira num DataFrame para só então gravá-la custa cerca do
+dobro da memória da base, e gravar ``minha_inflacao.csv`` no próprio lugar
+deixa um arquivo pela metade visível para quem o lê no meio da exportação
+(o dashboard) — ou para sempre, se a exportação falhar.
+:class:`ExportacaoEmBlocos` recebe a base em blocos já normalizados
+(:meth:`~ExportacaoEmBlocos.gravar`) e os acrescenta a arquivos temporários
+(``*.tmp``, na mesma pasta):
+
+- o CSV, com o cabeçalho no primeiro bloco;
+- a tabela de itens em Parquet (``notas_itens``), um grupo de linhas por
+  bloco, com esquema fixo: valores em float64, loja, produto e unidade
+  categóricos, identificadores como texto;
+- as notas, acumuladas por :class:`~notas_itens.SeparadorNotas` (uma linha
+  por nota, bem menor que a base) e gravadas no final.
+
+:meth:`~ExportacaoEmBlocos.concluir` fecha os temporários e os coloca no
+lugar com ``os.replace``: o CSV primeiro, depois os Parquet, que ficam com
+mtime igual ou posterior ao do CSV (``utils.carregar_notas_itens`` descarta
+Parquet mais antigo que o CSV). Usada como gerenciador de contexto, uma
+exceção antes de concluir apaga os temporários e mantém os arquivos
+anteriores intactos.
+
+Sem o pyarrow, ou se o Parquet falhar, a exportação segue apenas com o CSV.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from notas_itens import SeparadorNotas, caminhos_notas_itens
+
+# Colunas de texto repetitivas gravadas como categóricas no Parquet
+COLUNAS_CATEGORICAS = ['loja', 'produto', 'unidade']
+
+# Colunas de valores gravadas como float64 no Parquet
+COLUNAS_VALORES = ['qtd', 'preco_unit', 'preco_total']
+
+# Colunas numéricas geradas na divisão em notas e itens
+_COLUNAS_NUMERICAS = {'id_nota', 'qtd_itens', 'valor_total'}
+
+
+def _temporario(caminho: Path) -> Path:
+    return caminho.with_name(caminho.name + '.tmp')
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    # str ou None, como o esquema de texto do Parquet espera
+    return serie.astype(object).map(str, na_action='ignore').where(serie.notna(), None)
+
+
+def _tipar(tabela: pd.DataFrame) -> pd.DataFrame:
+    """Tipos do Parquet: data em datetime64, valores em float64, categóricas e texto."""
+    tabela = tabela.copy()
+    for col in tabela.columns:
+        if col == 'data':
+            tabela[col] = pd.to_datetime(tabela[col], format='mixed', dayfirst=True, errors='coerce')
+        elif col in COLUNAS_VALORES:
+            tabela[col] = pd.to_numeric(tabela[col], errors='coerce').astype('float64')
+        elif col in COLUNAS_CATEGORICAS:
+            tabela[col] = _texto(tabela[col]).astype('category')
+        elif col not in _COLUNAS_NUMERICAS:
+            tabela[col] = _texto(tabela[col])
+    return tabela
+
+
+class ExportacaoEmBlocos:
+    """
+    CSV (e Parquet de notas e itens) gravado bloco a bloco em temporários e
+    trocado de uma vez por :meth:`concluir`.
+    """
+
+    def __init__(self, caminho_csv: Path, parquet: bool = True):
+        self.caminho_csv = Path(caminho_csv)
+        self.linhas = 0
+        self._csv = None
+        self._parquet = parquet
+        self._separador = SeparadorNotas()
+        self._escritor = None  # pyarrow.parquet.ParquetWriter dos itens
+        self._esquema = None
+
+    def __enter__(self) -> 'ExportacaoEmBlocos':
+        self.caminho_csv.parent.mkdir(parents=True, exist_ok=True)
+        self._csv = open(_temporario(self.caminho_csv), 'w', encoding='utf-8-sig', newline='')
+        return self
+
+    def __exit__(self, tipo, valor, rastro) -> None:
+        if tipo is not None:
+            self.descartar()
+
+    def gravar(self, bloco: pd.DataFrame) -> None:
+        """Acrescenta um bloco (colunas e tipos finais da base) aos temporários."""
+        bloco.to_csv(self._csv, header=self.linhas == 0, index=False, sep=';', decimal=',')
+        self.linhas += len(bloco)
+        if self._parquet:
+            try:
+                self._gravar_itens(self._separador.itens(bloco))
+            except ImportError:
+                self._desistir_parquet("[AVISO] pyarrow não instalado; base gravada apenas em CSV.")
+            except Exception as e:
+                self._desistir_parquet(f"[AVISO] Parquet não gravado: {e}")
+
+    def _gravar_itens(self, itens: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        itens = _tipar(itens)
+        if self._escritor is None:
+            self._esquema = pa.schema([
+                (col, pa.int64() if col == 'id_nota'
+                 else pa.float64() if col in COLUNAS_VALORES
+                 else pa.dictionary(pa.int32(), pa.string()) if col in COLUNAS_CATEGORICAS
+                 else pa.string())
+                for col in itens.columns
+            ])
+            _, caminho_itens = caminhos_notas_itens(self.caminho_csv)
+            self._escritor = pq.ParquetWriter(_temporario(caminho_itens), self._esquema)
+        self._escritor.write_table(pa.Table.from_pandas(itens, schema=self._esquema, preserve_index=False))
+
+    def _desistir_parquet(self, aviso: str) -> None:
+        print(aviso)
+        self._parquet = False
+        self._separador = None
+        self._descartar_parquet()
+
+    def _fechar_escritor(self) -> None:
+        if self._escritor is not None:
+            escritor, self._escritor = self._escritor, None
+            escritor.close()
+
+    def _descartar_parquet(self) -> None:
+        try:
+            self._fechar_escritor()
+        except Exception:
+            pass
+        for caminho in caminhos_notas_itens(self.caminho_csv):
+            _temporario(caminho).unlink(missing_ok=True)
+
+    def concluir(self) -> None:
+        """Fecha os temporários e os coloca no lugar dos arquivos anteriores."""
+        self._csv.close()
+        if self._parquet:
+            try:
+                self._fechar_escritor()
+                caminho_notas, _ = caminhos_notas_itens(self.caminho_csv)
+                notas = _tipar(self._separador.notas())
+                notas.to_parquet(_temporario(caminho_notas), index=False)
+            except ImportError:
+                self._desistir_parquet("[AVISO] pyarrow não instalado; base gravada apenas em CSV.")
+            except Exception as e:
+                self._desistir_parquet(f"[AVISO] Parquet não gravado: {e}")
+
+        # Base plana das versões anteriores, substituída pelas duas tabelas
+        self.caminho_csv.with_suffix('.parquet').unlink(missing_ok=True)
+        os.replace(_temporario(self.caminho_csv), self.caminho_csv)
+        if self._parquet:
+            for caminho in caminhos_notas_itens(self.caminho_csv):
+                os.replace(_temporario(caminho), caminho)
+
+    def descartar(self) -> None:
+        """Apaga os temporários sem tocar nos arquivos anteriores."""
+        if self._csv is not None:
+            self._csv.close()
+        _temporario(self.caminho_csv).unlink(missing_ok=True)
+        self._descartar_parquet()
@@ -0,0 +1,195 @@
+"""
+Funções auxiliares para DANFEs em PDF.
+
+A extração de texto do pdfplumber interpreta todo o conteúdo da página
+(posição de cada caractere), o que custa centenas de milissegundos por
+página. Para descobrir apenas a chave de acesso — e assim pular PDFs cuja
+nota já foi lida via XML — :func:`sondar_chave_pdf` procura a chave
+diretamente nos links da página (QR Code / URL de consulta) e nas strings
+literais dos fluxos de conteúdo, sem montar o layout.
+
+:func:`iterar_itens_danfe` interpreta os itens do texto da página de
+consulta da NFC-e (SEFAZ) a partir das âncoras ``(Código: …) Vl. Total``.
+"""
+import bisect
+import re
+from typing import Iterator
+
+from pdfminer.pdftypes import resolve1
+
+_CHAVE = re.compile(r'(?<!\d)(\d{44})(?!\d)')
+
+# Strings literais de um fluxo de conteúdo PDF: (texto) com escapes \( \) \\
+_LITERAL = re.compile(rb'\((?:\\.|[^\\)])*\)')
+_ESCAPE = re.compile(rb'\\(.)', re.S)
+
+_ROTULO_CHAVE = re.compile(r'chave\s*de\s*acesso', re.I)
+
+# URL de consulta impressa na página (texto do QR Code) ou seu parâmetro ?p=
+_LINK = re.compile(r'(?:https?://|www\.)\S+|[?&]p=[\d|]+', re.I)
+
+# Quantos caracteres após o rótulo "Chave de acesso" são examinados primeiro
+_JANELA_ROTULO = 300
+
+
+def chave_valida(chave: str) -> bool:
+    """
+    Confere o dígito verificador (módulo 11) de uma chave NF-e de 44 dígitos.
+
+    Exemplos
+    --------
+    >>> chave_valida('26260306057223049189650130001286971130305212')
+    True
+    >>> chave_valida('26260306057223049189650130001286971130305213')
+    False
+    """
+    if len(chave) != 44 or not chave.isdigit():
+        return False
+    soma, peso = 0, 2
+    for digito in reversed(chave[:43]):
+        soma += int(digito) * peso
+        peso = peso + 1 if peso < 9 else 2
+    dv = 11 - soma % 11
+    return int(chave[43]) == (0 if dv >= 10 else dv)
+
+
+def _buscar_chave(texto: str) -> str | None:
+    """Primeira sequência de 44 dígitos com DV válido, ignorando espaços."""
+    for match in _CHAVE.finditer(re.sub(r'\s+', '', texto)):
+        if chave_valida(match.group(1)):
+            return match.group(1)
+    return None
+
+
+def _texto_bruto_da_pagina(pagina) -> str:
+    """
+    Concatena as strings literais dos fluxos de conteúdo da página, na ordem
+    em que aparecem. Fontes com codificação própria (ex.: Identity-H) não
+    produzem texto legível aqui — nesse caso a sonda simplesmente não acha
+    a chave.
+    """
+    partes = []
+    for conteudo in pagina.page_obj.contents:
+        dados = resolve1(conteudo).get_data()
+        for literal in _LITERAL.findall(dados):
+            partes.append(_ESCAPE.sub(rb'\1', literal[1:-1]).decode('latin-1'))
+    return ' '.join(partes)
+
+
+def sondar_chave_pdf(pdf) -> str | None:
+    """
+    Tenta achar a chave de acesso de um DANFE sem extrair o texto da página.
+
+    Examina a primeira e a última página: primeiro os links (a URL do QR
+    Code da NFC-e traz a chave), depois as strings dos fluxos de conteúdo:
+    o trecho logo após o rótulo "Chave de acesso" e as URLs de consulta
+    impressas na página. Só aceita chaves com dígito verificador válido;
+    outras sequências de 44 dígitos (códigos de barras, números de
+    protocolo) não bastam.
+
+    Parâmetros
+    ----------
+    pdf : pdfplumber.PDF
+        Documento já aberto.
+
+    Retorna
+    -------
+    str | None
+        A chave (44 dígitos) ou None se a sonda não foi conclusiva — o
+        chamador deve então recorrer à extração de texto completa.
+    """
+    if not pdf.pages:
+        return None
+    paginas = [pdf.pages[0]] if len(pdf.pages) == 1 else [pdf.pages[0], pdf.pages[-1]]
+
+    for pagina in paginas:
+        try:
+            for link in pagina.hyperlinks:
+                chave = _buscar_chave(link.get('uri') or '')
+                if chave:
+                    return chave
+
+            texto = _texto_bruto_da_pagina(pagina)
+        except Exception:
+            continue
+
+        rotulo = _ROTULO_CHAVE.search(texto)
+        if rotulo:
+            chave = _buscar_chave(texto[rotulo.end():rotulo.end() + _JANELA_ROTULO])
+            if chave:
+                return chave
+        for link in _LINK.finditer(texto):
+            chave = _buscar_chave(link.group())
+            if chave:
+                return chave
+    return None
+
+
+# ── Itens do DANFE (texto da consulta da NFC-e) ───────────────────────────────
+
+# Âncora de cada item: tudo o que vem depois do nome do produto. Começa por um
+# literal, então a busca avança em tempo linear, sem retrocesso sobre o nome.
+_ANCORA_ITEM = re.compile(
+    r'\(Código:\s*(?P<codigo>[A-Za-z]?\d+)\)'
+    r'\s*Vl\. Total'
+    r'\s*Qtde\.:\s*(?P<qtd>[\d,.]+)'
+    r'\s*UN:\s*(?P<un>\w+)'
+    r'\s*Vl\. Unit\.:\s*(?P<vunit>[\d,.]+)'
+    r'\s*(?P<vtotal>[\d,.]+)'
+)
+
+_UFS = 'AC|AL|AP|AM|BA|CE|DF|ES|GO|MA|MT|MS|MG|PA|PB|PR|PE|PI|RJ|RN|RS|RO|RR|SC|SP|SE|TO'
+
+# Linhas que não fazem parte do nome de um produto: cabeçalho da loja (CNPJ,
+# inscrição, endereço terminado em UF, CEP) e o cabeçalho/rodapé que o
+# navegador imprime em cada página (data e hora, URL, numeração "1/2").
+# (um padrão por marca: cada um começa por um literal ou âncora de linha e é
+# varrido rapidamente; uma alternação única seria testada em cada posição).
+_MARCAS_FORA_DO_ITEM = (
+    re.compile(r'C(?:NPJ|PF|EP)\b'),
+    re.compile(r'Inscri[çc][ãa]o'),
+    re.compile(rf'[,-][ \t]*(?:{_UFS})[ \t]*$', re.M),
+    re.compile(r'^(?=[h\d])(?:https?://|\d+[ \t]*/[ \t]*\d+[ \t]*$|\d\d/\d\d/\d{2,4},?[ \t]+\d\d:\d\d\b)', re.M),
+)
+
+
+def _fins_de_linha_fora_do_item(texto: str) -> list[int]:
+    """Posições (crescentes) do fim de cada linha de cabeçalho ou de página."""
+    fins = set()
+    for padrao in _MARCAS_FORA_DO_ITEM:
+        for marca in padrao.finditer(texto):
+            fim = texto.find('\n', marca.end())
+            fins.add(len(texto) if fim < 0 else fim)
+    return sorted(fins)
+
+
+def _limpar_nome(trecho: str) -> str:
+    return trecho.replace('\n', ' ').replace('\r', '').strip()
+
+
+def iterar_itens_danfe(texto: str) -> Iterator[dict]:
+    """
+    Percorre os itens do texto de um DANFE NFC-e em tempo linear.
+
+    Cada âncora ``(Código: …) Vl. Total Qtde.: … UN: … Vl. Unit.: … <total>``
+    fecha um item; o nome é o texto entre a âncora anterior e esta, a partir
+    da última linha de cabeçalho da loja ou de quebra de página (as linhas
+    de cabeçalho são localizadas numa única varredura do texto).
+
+    Retorna
+    -------
+    Iterator[dict]
+        ``{nome, codigo, qtd, un, vunit, vtotal}`` com os valores ainda em
+        texto (formato brasileiro), na ordem do documento.
+    """
+    fins_fora = _fins_de_linha_fora_do_item(texto)
+    fim_anterior = 0
+    for ancora in _ANCORA_ITEM.finditer(texto):
+        corte = bisect.bisect_left(fins_fora, ancora.start()) - 1
+        inicio = max(fim_anterior, fins_fora[corte]) if corte >= 0 else fim_anterior
+        nome = _limpar_nome(texto[inicio:ancora.start()])
+        if not nome:
+            # Nome na mesma linha de uma marca de cabeçalho: usa a última linha do trecho
+            nome = _limpar_nome(texto[fim_anterior:ancora.start()].rsplit('\n', 1)[-1])
+        yield {'nome': nome, **ancora.groupdict()}
+        fim_anterior = ancora.end()
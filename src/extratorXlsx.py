@@ -0,0 +1,288 @@
+"""
+Leitura em streaming das exportações do app Citizen (XLSX).
+
+``pd.read_excel(..., sheet_name=None)`` carrega todas as abas da planilha em
+DataFrames de uma vez. Aqui apenas a aba 'Notas Fiscais' é aberta, com o
+openpyxl em modo somente leitura: as linhas são lidas do XML da planilha
+conforme avançamos, o cabeçalho (linha que contém 'Chave') é localizado no
+caminho e os dados são entregues em blocos de ``TAMANHO_BLOCO_XLSX`` linhas —
+a memória de pico depende do tamanho do bloco, não do tamanho da exportação.
+
+Os valores das células são convertidos como o ``read_excel`` faria (números
+inteiros como ``int``, células vazias, de erro ou com marcadores de nulo como
+NaN), de modo que o restante do importador vê exatamente os mesmos dados.
+
+Para a pré-sondagem da ingestão, :func:`sondar_chaves_citizen` lê apenas a
+coluna 'Chave', percorrendo o XML da aba diretamente (sem criar as células
+do openpyxl) — muito mais rápido do que a leitura completa.
+"""
+import io
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Iterator
+from xml.sax.saxutils import unescape
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+ABA_CITIZEN = 'Notas Fiscais'
+
+# Linhas de dados por bloco entregue por iterar_blocos_citizen
+TAMANHO_BLOCO_XLSX = 5000
+
+# Textos que o read_excel interpreta como nulo (na_values padrão do pandas)
+_NULOS_EXCEL = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+_NAN = float('nan')
+
+
+def _valor_celula(celula):
+    """Valor de uma célula convertido como no ``read_excel``."""
+    valor = celula.value
+    if valor is None or celula.data_type == TYPE_ERROR:
+        return _NAN
+    if celula.data_type == TYPE_NUMERIC:
+        inteiro = int(valor)
+        return inteiro if inteiro == valor else float(valor)
+    if isinstance(valor, str) and valor in _NULOS_EXCEL:
+        return _NAN
+    return valor
+
+
+def iterar_blocos_citizen(fonte, tamanho_bloco: int = TAMANHO_BLOCO_XLSX) -> Iterator[pd.DataFrame]:
+    """
+    Percorre a aba 'Notas Fiscais' de uma exportação Citizen em blocos.
+
+    Parâmetros
+    ----------
+    fonte : str | Path | arquivo binário
+        Planilha XLSX (caminho ou arquivo aberto, ex.: membro de ZIP).
+    tamanho_bloco : int
+        Quantidade máxima de linhas de dados por bloco.
+
+    Retorna
+    -------
+    Iterator[pd.DataFrame]
+        Blocos (dtype object) com as colunas do cabeçalho encontrado. Nada é
+        gerado se a aba não existir ou não houver linha com 'Chave'.
+    """
+    wb = openpyxl.load_workbook(fonte, read_only=True, data_only=True)
+    try:
+        if ABA_CITIZEN not in wb.sheetnames:
+            return
+        aba = wb[ABA_CITIZEN]
+        aba.reset_dimensions()
+        linhas = aba.iter_rows()
+
+        cabecalho = None
+        for linha in linhas:
+            valores = [_valor_celula(celula) for celula in linha]
+            if 'Chave' in valores:
+                cabecalho = valores
+                break
+        if cabecalho is None:
+            return
+
+        largura = len(cabecalho)
+        bloco = []
+        for linha in linhas:
+            valores = [_valor_celula(celula) for celula in linha[:largura]]
+            if len(valores) < largura:
+                valores.extend([_NAN] * (largura - len(valores)))
+            bloco.append(valores)
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=cabecalho, dtype=object)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho, dtype=object)
+    finally:
+        wb.close()
+
+
+# ── Sondagem da coluna 'Chave' ────────────────────────────────────────────────
+
+_REFERENCIA_COLUNA = re.compile(r'[A-Z]+')
+# Bytes repetidos entre blocos na busca pela coluna, para não perder uma célula cortada
+_SOBREPOSICAO = 4096
+
+
+def _local(tag: str) -> str:
+    """Nome da tag ou atributo sem o namespace."""
+    return tag.rpartition('}')[2]
+
+
+def _indice_coluna(referencia: str) -> int:
+    """Posição (a partir de 0) da coluna de uma referência como 'AB12'."""
+    indice = 0
+    for letra in _REFERENCIA_COLUNA.match(referencia).group():
+        indice = indice * 26 + ord(letra) - ord('A') + 1
+    return indice - 1
+
+
+def _partes_da_aba(z: zipfile.ZipFile, nome: str) -> tuple[str | None, str | None]:
+    """Caminhos, dentro do pacote, da aba ``nome`` e da tabela de textos compartilhados."""
+    aba_id = None
+    for elem in ET.fromstring(z.read('xl/workbook.xml')).iter():
+        if _local(elem.tag) == 'sheet' and elem.get('name') == nome:
+            aba_id = next((v for k, v in elem.attrib.items() if _local(k) == 'id'), None)
+    aba = compartilhados = None
+    for rel in ET.fromstring(z.read('xl/_rels/workbook.xml.rels')):
+        alvo = rel.get('Target', '')
+        alvo = alvo[1:] if alvo.startswith('/') else f'xl/{alvo}'
+        if rel.get('Id') == aba_id:
+            aba = alvo
+        elif rel.get('Type', '').endswith('/sharedStrings'):
+            compartilhados = alvo
+    return aba, compartilhados
+
+
+def _textos_compartilhados(z: zipfile.ZipFile, caminho: str | None) -> list[str]:
+    textos: list[str] = []
+    if caminho is None:
+        return textos
+    with z.open(caminho) as f:
+        for _, elem in ET.iterparse(f):
+            if _local(elem.tag) != 'si':
+                continue
+            partes = []
+            for filho in elem:
+                if _local(filho.tag) == 't':
+                    partes.append(filho.text or '')
+                elif _local(filho.tag) == 'r':  # texto formatado: um <t> por trecho
+                    partes += [t.text or '' for t in filho if _local(t.tag) == 't']
+            textos.append(''.join(partes))
+            elem.clear()
+    return textos
+
+
+def _texto_celula(celula, compartilhados: list[str]) -> str | None:
+    """Valor de um elemento <c> como texto (números como o ``read_excel`` os converteria)."""
+    tipo = celula.get('t')
+    if tipo == 'inlineStr':
+        return ''.join(t.text or '' for t in celula.iter() if _local(t.tag) == 't')
+    valor = next((v.text for v in celula if _local(v.tag) == 'v'), None)
+    if valor is None or tipo == 'e':
+        return None
+    if tipo == 's':
+        return compartilhados[int(valor)]
+    if tipo in (None, 'n'):
+        numero = float(valor) if any(c in valor for c in '.eE') else int(valor)
+        return str(int(numero) if int(numero) == numero else numero)
+    return valor
+
+
+def _cabecalho_citizen(z: zipfile.ZipFile, caminho_aba: str,
+                      compartilhados: list[str]) -> tuple[int, str | None] | None:
+    """
+    Linha (número na planilha) e letras da coluna 'Chave' do cabeçalho,
+    lendo a aba só até encontrá-lo. None se não houver cabeçalho; as letras
+    são None se as células não trouxerem referências (atributo ``r``).
+    """
+    with z.open(caminho_aba) as f:
+        for _, linha in ET.iterparse(f):
+            if _local(linha.tag) != 'row':
+                continue
+            for celula in linha:
+                if _texto_celula(celula, compartilhados) == 'Chave':
+                    referencia = celula.get('r')
+                    if not referencia:
+                        return 0, None
+                    letras = _REFERENCIA_COLUNA.match(referencia).group()
+                    return int(referencia[len(letras):]), letras
+            linha.clear()
+    return None
+
+
+_VALOR = re.compile(rb'<v>([^<]*)</v>')
+_TEXTO = re.compile(rb'<t(?:\s[^>]*)?>([^<]*)</t>')
+_TIPO = re.compile(rb'\bt="([^"]*)"')
+
+
+def _texto_bruto(atributos: bytes, conteudo: bytes | None, compartilhados: list[str]) -> str | None:
+    """Como :func:`_texto_celula`, para uma célula localizada nos bytes da aba."""
+    tipo = _TIPO.search(atributos)
+    tipo = tipo.group(1).decode('ascii') if tipo else None
+    if not conteudo:
+        return None
+    if tipo == 'inlineStr':
+        return unescape(b''.join(_TEXTO.findall(conteudo)).decode('utf-8'))
+    valor = _VALOR.search(conteudo)
+    if valor is None or tipo == 'e':
+        return None
+    valor = valor.group(1).decode('utf-8')
+    if tipo == 's':
+        return compartilhados[int(valor)]
+    if tipo in (None, 'n'):
+        numero = float(valor) if any(c in valor for c in '.eE') else int(valor)
+        return str(int(numero) if int(numero) == numero else numero)
+    return unescape(valor)
+
+
+def sondar_chaves_citizen(fonte, tamanho_bloco: int = 1 << 20) -> list[str]:
+    """
+    Valores distintos da coluna 'Chave' da aba 'Notas Fiscais', na ordem da
+    primeira ocorrência, sem montar as células da planilha: o cabeçalho é
+    localizado com ``iterparse`` e as células da coluna são buscadas direto
+    nos bytes da aba, bloco a bloco.
+
+    Diferente de :func:`iterar_blocos_citizen`, nenhuma outra coluna é
+    convertida e nenhum filtro de linha é aplicado: o resultado inclui todas
+    as chaves que a leitura completa pode produzir (e eventualmente outras,
+    como as de despesas manuais).
+
+    Parâmetros
+    ----------
+    fonte : bytes | str | Path | arquivo binário
+        Planilha XLSX.
+
+    Retorna
+    -------
+    list[str]
+        Chaves sem espaços nas pontas; lista vazia se a aba ou a coluna não
+        existirem.
+    """
+    if isinstance(fonte, (bytes, bytearray)):
+        fonte = io.BytesIO(fonte)
+    with zipfile.ZipFile(fonte) as z:
+        caminho_aba, caminho_textos = _partes_da_aba(z, ABA_CITIZEN)
+        if caminho_aba is None:
+            return []
+        compartilhados = _textos_compartilhados(z, caminho_textos)
+        cabecalho = _cabecalho_citizen(z, caminho_aba, compartilhados)
+        if cabecalho is None:
+            return []
+        linha_cabecalho, letras = cabecalho
+        if letras is None:
+            return _chaves_por_blocos(fonte)
+
+        celula = re.compile(rb'<c\s([^>]*?\br="' + letras.encode('ascii') + rb'(\d+)"[^>]*?)(?:/>|>(.*?)</c>)',
+                            re.S)
+        vistas: dict[str, None] = {}
+        with z.open(caminho_aba) as f:
+            resto = b''
+            while bloco := f.read(tamanho_bloco):
+                dados = resto + bloco
+                fim = 0
+                for m in celula.finditer(dados):
+                    fim = m.end()
+                    if int(m.group(2)) <= linha_cabecalho:
+                        continue
+                    valor = _texto_bruto(m.group(1), m.group(3), compartilhados)
+                    if valor is not None and valor not in _NULOS_EXCEL:
+                        vistas[valor.strip()] = None
+                resto = dados[max(fim, len(dados) - _SOBREPOSICAO):]
+        return list(vistas)
+
+
+def _chaves_por_blocos(fonte) -> list[str]:
+    """Sondagem pela leitura completa, para planilhas sem referências de célula."""
+    vistas: dict[str, None] = {}
+    for bloco in iterar_blocos_citizen(fonte):
+        for valor in bloco['Chave'].dropna():
+            vistas[str(valor).strip()] = None
+    return list(vistas)
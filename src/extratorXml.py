@@ -8,11 +8,20 @@ e contém dados muito mais ricos e confiáveis do que os PDFs DANFE:
   - Razão social e CNPJ do emissor
   - Data/hora exata da emissão
   - Valores precisos sem necessidade de regex
+
+Para documentos muito grandes (NF-e de atacado com milhares de <det>) ou
+lotes baixados da SEFAZ com vários documentos concatenados, use
+:func:`iterar_itens_do_xml` / :func:`iterar_notas_do_xml`, que leem o XML em
+blocos e descartam cada <det> assim que ele é convertido — a memória fica
+constante, independentemente do tamanho do arquivo.
 """
 
+import io
+import re
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator
 
 # Namespace padrão dos documentos NF-e brasileiros
 _NS = 'http://www.portalfiscal.inf.br/nfe'
@@ -23,6 +32,23 @@ def _t(tag: str) -> str:
     return f'{{{_NS}}}{tag}'
 
 
+_TAG_INF_NFE = _t('infNFe')
+_TAG_DET = _t('det')
+
+# Tamanho dos blocos lidos no modo streaming
+TAMANHO_BLOCO_STREAMING = 1 << 16
+
+# Declaração XML (com BOM opcional) — removida de documentos concatenados
+_DECLARACAO = re.compile(rb'(?:\xef\xbb\xbf)?<\?xml[^>]*\?>')
+_ENCODING_DECLARADO = re.compile(rb'\s*(?:\xef\xbb\xbf)?\s*<\?xml[^>]*?encoding=["\']([\w.-]+)')
+_ABERTURA_INF_NFE = re.compile(rb'<(?:\w+:)?infNFe[\s>]')
+# Tag de abertura de <infNFe> com os atributos, e o Id com a chave de acesso
+_TAG_ABERTURA_INF_NFE = re.compile(rb'<(?:\w+:)?infNFe(?=[\s>])([^>]*)>')
+_ID_NFE = re.compile(rb'\bId\s*=\s*["\']NFe(\d{44})["\']')
+# Bytes repetidos entre blocos na sondagem, para não perder uma tag cortada
+_SOBREPOSICAO_SONDAGEM = 4096
+
+
 def _get(element, tag: str) -> str | None:
     """Busca um filho direto e retorna seu texto, ou None se não existir."""
     child = element.find(_t(tag))
@@ -78,22 +104,145 @@ def _parse_data(dh_emi: str | None) -> str:
         return dh_emi[:10]  # Fallback: apenas a parte da data
 
 
+def _parse_raiz(conteudo_xml: bytes | str):
+    """
+    Faz o parse do XML direto dos bytes (o ElementTree respeita a declaração
+    de encoding, sem cópia intermediária em str). Só se os bytes forem
+    inválidos é feita uma segunda tentativa decodificando com substituição
+    de caracteres, como fallback para arquivos com bytes corrompidos.
+    Levanta ``ET.ParseError`` se o conteúdo não for XML.
+    """
+    try:
+        return ET.fromstring(conteudo_xml)
+    except ET.ParseError:
+        if not isinstance(conteudo_xml, bytes):
+            raise
+        return ET.fromstring(conteudo_xml.decode('utf-8', errors='replace'))
+
+
+def _chave_de(nfe) -> str | None:
+    """Chave de acesso: atributo Id de <infNFe> sem o prefixo 'NFe' (44 dígitos)."""
+    id_attr = nfe.get('Id', '')  # ex.: 'NFe26260306057223049189650130001286971130305212'
+    chave = id_attr[len('NFe'):] if id_attr.startswith('NFe') else id_attr
+    return chave or None
+
+
+def _cabecalho_de(nfe) -> dict:
+    """Monta os campos da nota que se repetem em todos os itens."""
+    ide  = nfe.find(_t('ide'))
+    emit = nfe.find(_t('emit'))
+
+    cnpj = _get(emit, 'CNPJ') if emit is not None else None
+    # Prefere o nome fantasia; cai para razão social se não existir
+    loja = (_get(emit, 'xFant') or _get(emit, 'xNome')) if emit is not None else None
+
+    return {
+        'data':      _parse_data(_get(ide, 'dhEmi') if ide is not None else None),
+        'loja':      loja or '',
+        'cnpj':      cnpj or '',
+        'endereco':  _montar_endereco_emit(emit),
+        'chave_nfe': _chave_de(nfe) or '',
+    }
+
+
+def _item_de(det, cabecalho: dict, nome_origem: str) -> dict | None:
+    """Converte um <det> em dict de item; None para itens sem <prod> ou zerados."""
+    prod = det.find(_t('prod'))
+    if prod is None:
+        return None
+
+    nome_produto = _get(prod, 'xProd') or 'Desconhecido'
+    codigo       = _get(prod, 'cProd') or ''
+    ean          = _get(prod, 'cEAN') or ''
+    ncm          = _get(prod, 'NCM') or ''
+    unidade      = _get(prod, 'uCom') or ''
+    qtd          = _float(_get(prod, 'qCom'))
+    preco_unit   = _float(_get(prod, 'vUnCom'))
+
+    # vItem reflete o valor real pago (já com eventuais descontos por item)
+    # vProd é o valor antes de desconto ao nível do item
+    v_item = _get(det, 'vItem')
+    v_prod = _get(prod, 'vProd')
+    preco_total  = _float(v_item if v_item is not None else v_prod)
+
+    # Ignora itens zerados (ex.: sacolas de cortesia sem valor fiscal)
+    if preco_total <= 0 and preco_unit <= 0:
+        return None
+
+    return {
+        'data':           cabecalho['data'],
+        'produto':        nome_produto,
+        'qtd':            qtd,
+        'unidade':        unidade,
+        'preco_unit':     preco_unit,
+        'preco_total':    preco_total,
+        'codigo':         codigo,
+        'ean':            ean if ean != 'SEM GTIN' else '',
+        'ncm':            ncm,
+        'loja':           cabecalho['loja'],
+        'cnpj':           cabecalho['cnpj'],
+        'endereco':       cabecalho['endereco'],
+        'chave_nfe':      cabecalho['chave_nfe'],
+        'arquivo_origem': nome_origem,
+    }
+
+
+def extrair_nota_do_xml(conteudo_xml: bytes | str, nome_origem: str) -> dict:
+    """
+    Extrai chave, cabeçalho e itens de uma NF-e / NFC-e com um único parse.
+
+    Parâmetros
+    ----------
+    conteudo_xml : bytes | str
+        Conteúdo bruto do arquivo XML. Bytes são interpretados diretamente,
+        sem decodificação prévia para str.
+    nome_origem : str
+        Nome do arquivo de origem (para rastreabilidade no CSV).
+
+    Retorna
+    -------
+    dict
+        ``{'chave': str | None, 'cabecalho': dict, 'itens': list[dict]}``.
+        O cabeçalho tem data, loja, cnpj, endereco e chave_nfe; os itens têm
+        o mesmo formato de :func:`extrair_itens_do_xml`. XML inválido ou sem
+        <infNFe> resulta em chave None, cabeçalho vazio e nenhum item.
+    """
+    vazio = {'chave': None, 'cabecalho': {}, 'itens': []}
+    try:
+        root = _parse_raiz(conteudo_xml)
+    except ET.ParseError as e:
+        print(f'[ERRO XML] {nome_origem}: XML inválido — {e}')
+        return vazio
+
+    # A NFe pode estar em diferentes níveis dependendo se é "nfeProc" ou "NFe" direta
+    nfe = root.find('.//' + _t('infNFe'))
+    if nfe is None:
+        print(f'[AVISO XML] {nome_origem}: tag <infNFe> não encontrada.')
+        return vazio
+
+    cabecalho = _cabecalho_de(nfe)
+    itens = []
+    for det in nfe.findall(_t('det')):
+        item = _item_de(det, cabecalho, nome_origem)
+        if item is not None:
+            itens.append(item)
+
+    return {'chave': _chave_de(nfe), 'cabecalho': cabecalho, 'itens': itens}
+
+
 def extrair_chave_do_xml(conteudo_xml: bytes | str) -> str | None:
     """
     Extrai apenas a chave de acesso NF-e (44 dígitos) do XML.
     Retorna None se não encontrar.
     """
-    if isinstance(conteudo_xml, bytes):
-        conteudo_xml = conteudo_xml.decode('utf-8', errors='replace')
     try:
-        root = ET.fromstring(conteudo_xml)
+        root = _parse_raiz(conteudo_xml)
     except ET.ParseError:
         return None
     inf = root.find('.//' + _t('infNFe'))
     if inf is None:
         return None
-    id_attr = inf.get('Id', '')  # ex.: 'NFe26260306057223049189650130001286971130305212'
-    return id_attr.lstrip('NFe') if id_attr else None
+    return _chave_de(inf)
 
 
 def extrair_itens_do_xml(conteudo_xml: bytes | str, nome_origem: str) -> list[dict]:
@@ -114,76 +263,199 @@ def extrair_itens_do_xml(conteudo_xml: bytes | str, nome_origem: str) -> list[di
           data, produto, qtd, unidade, preco_unit, preco_total,
           codigo, ean, ncm, loja, cnpj, endereco, chave_nfe, arquivo_origem
     """
-    if isinstance(conteudo_xml, bytes):
-        conteudo_xml = conteudo_xml.decode('utf-8', errors='replace')
+    return extrair_nota_do_xml(conteudo_xml, nome_origem)['itens']
 
-    try:
-        root = ET.fromstring(conteudo_xml)
-    except ET.ParseError as e:
-        print(f'[ERRO XML] {nome_origem}: XML inválido — {e}')
-        return []
 
-    # A NFe pode estar em diferentes níveis dependendo se é "nfeProc" ou "NFe" direta
-    nfe = root.find('.//' + _t('infNFe'))
-    if nfe is None:
-        print(f'[AVISO XML] {nome_origem}: tag <infNFe> não encontrada.')
-        return []
+def contar_notas(conteudo_xml: bytes, limite: int = 2) -> int:
+    """
+    Conta as aberturas de <infNFe> nos bytes, parando em ``limite``. Serve
+    para detectar lotes com vários documentos sem fazer o parse.
+    """
+    total = 0
+    for _ in _ABERTURA_INF_NFE.finditer(conteudo_xml):
+        total += 1
+        if total >= limite:
+            break
+    return total
 
-    # Chave de acesso: atributo Id sem o prefixo 'NFe' (44 dígitos)
-    id_attr = nfe.get('Id', '')
-    chave_nfe = id_attr[len('NFe'):] if id_attr.startswith('NFe') else id_attr
 
-    # ── Cabeçalho da nota ────────────────────────────────────────────────────
-    ide  = nfe.find(_t('ide'))
-    emit = nfe.find(_t('emit'))
+def sondar_chaves_xml(fonte, tamanho_bloco: int = TAMANHO_BLOCO_STREAMING) -> list[str | None]:
+    """
+    Chaves de acesso das notas de um XML, uma por <infNFe> na ordem do
+    documento, por busca direta nos bytes — sem parse. Serve para a
+    pré-sondagem da ingestão, que só precisa saber quais notas cada arquivo
+    traz antes de decidir quais ler por inteiro.
 
-    data_compra = _parse_data(_get(ide, 'dhEmi') if ide is not None else None)
+    ``fonte`` são bytes, um caminho ou um arquivo binário (lido em blocos).
+    Uma <infNFe> sem Id de 44 dígitos resulta em None na sua posição.
+    """
+    def _chaves(dados: bytes):
+        for m in _TAG_ABERTURA_INF_NFE.finditer(dados):
+            id_nfe = _ID_NFE.search(m.group(1))
+            yield m, id_nfe.group(1).decode('ascii') if id_nfe else None
 
-    cnpj = _get(emit, 'CNPJ') if emit is not None else None
-    # Prefere o nome fantasia; cai para razão social se não existir
-    loja = (_get(emit, 'xFant') or _get(emit, 'xNome')) if emit is not None else None
-    endereco = _montar_endereco_emit(emit)
+    if isinstance(fonte, (bytes, bytearray)):
+        return [chave for _, chave in _chaves(fonte)]
+
+    fluxo, fechar = _abrir_fonte(fonte)
+    try:
+        chaves: list[str | None] = []
+        resto = b''
+        while bloco := fluxo.read(tamanho_bloco):
+            dados = resto + bloco
+            fim = 0
+            for m, chave in _chaves(dados):
+                chaves.append(chave)
+                fim = m.end()
+            resto = dados[max(fim, len(dados) - _SOBREPOSICAO_SONDAGEM):]
+        return chaves
+    finally:
+        if fechar:
+            fluxo.close()
+
+
+def _blocos_sem_declaracao(fluxo, primeiro: bytes, tamanho_bloco: int) -> Iterator[bytes]:
+    """
+    Repassa os bytes do fluxo removendo as declarações ``<?xml ...?>`` — em
+    lotes concatenados cada documento traz a sua, o que não é permitido no
+    meio de um XML. Uma declaração cortada entre dois blocos fica pendente
+    até o bloco seguinte.
+    """
+    pendente = b''
+    bloco = primeiro
+    while bloco:
+        dados = _DECLARACAO.sub(b'', pendente + bloco)
+        corte = dados.rfind(b'<?')
+        if corte != -1 and dados.find(b'?>', corte) == -1:
+            pendente, dados = dados[corte:], dados[:corte]
+        elif dados.endswith(b'<'):
+            pendente, dados = b'<', dados[:-1]
+        else:
+            pendente = b''
+        yield dados
+        bloco = fluxo.read(tamanho_bloco)
+    if pendente:
+        yield pendente
+
+
+def _eventos_streaming(fluxo, nome_origem: str, tamanho_bloco: int):
+    """
+    Núcleo do modo streaming. Envolve o conteúdo em um elemento raiz
+    sintético (aceitando assim vários documentos concatenados) e gera:
 
-    # ── Itens ────────────────────────────────────────────────────────────────
+    - ``('item', dict)`` a cada <det> fechado — o elemento é removido da
+      árvore logo em seguida;
+    - ``('nota', chave, cabecalho)`` a cada <infNFe> fechado.
+
+    Documentos já concluídos são removidos da raiz sintética, de modo que a
+    árvore em memória nunca passa de um cabeçalho de nota mais um <det>.
+    """
+    primeiro = fluxo.read(tamanho_bloco)
+    declarado = _ENCODING_DECLARADO.match(primeiro)
+    encoding = declarado.group(1) if declarado else b'UTF-8'
+
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    parser.feed(b'<?xml version="1.0" encoding="' + encoding + b'"?><lote>')
+
+    profundidade = 0
+    raiz = inf = cabecalho = None
+
+    def _consumir():
+        nonlocal profundidade, raiz, inf, cabecalho
+        for evento, elem in parser.read_events():
+            if evento == 'start':
+                profundidade += 1
+                if profundidade == 1:
+                    raiz = elem
+                elif elem.tag == _TAG_INF_NFE:
+                    inf, cabecalho = elem, None
+                continue
+
+            profundidade -= 1
+            if elem.tag == _TAG_DET and inf is not None:
+                # <ide> e <emit> precedem os <det> no schema: o cabeçalho já está completo
+                if cabecalho is None:
+                    cabecalho = _cabecalho_de(inf)
+                item = _item_de(elem, cabecalho, nome_origem)
+                inf.remove(elem)
+                if item is not None:
+                    yield ('item', item)
+            elif elem.tag == _TAG_INF_NFE:
+                yield ('nota', _chave_de(elem), cabecalho or _cabecalho_de(elem))
+                inf = None
+            elif profundidade == 1:
+                raiz.remove(elem)
+
+    for bloco in _blocos_sem_declaracao(fluxo, primeiro, tamanho_bloco):
+        parser.feed(bloco)
+        yield from _consumir()
+    parser.feed(b'</lote>')
+    parser.close()
+    yield from _consumir()
+
+
+def _abrir_fonte(fonte):
+    """Normaliza a fonte do modo streaming: caminho, bytes ou arquivo binário."""
+    if isinstance(fonte, (str, Path)):
+        return open(fonte, 'rb'), True
+    if isinstance(fonte, (bytes, bytearray)):
+        return io.BytesIO(fonte), True
+    return fonte, False
+
+
+def iterar_notas_do_xml(fonte, nome_origem: str,
+                        tamanho_bloco: int = TAMANHO_BLOCO_STREAMING) -> Iterator[dict]:
+    """
+    Versão em streaming de :func:`extrair_nota_do_xml` para arquivos grandes
+    ou com várias notas concatenadas.
+
+    Parâmetros
+    ----------
+    fonte : str | Path | bytes | arquivo binário
+        Caminho do XML, conteúdo em memória ou objeto com ``read()``.
+    nome_origem : str
+        Nome do arquivo de origem (para rastreabilidade no CSV).
+    tamanho_bloco : int
+        Quantidade de bytes lida por vez.
+
+    Retorna
+    -------
+    Iterator[dict]
+        Um ``{'chave', 'cabecalho', 'itens'}`` por <infNFe>, na ordem do
+        arquivo. Em caso de XML inválido, as notas completas antes do erro
+        são entregues e o erro é apenas registrado no log.
+    """
+    fluxo, fechar = _abrir_fonte(fonte)
     itens = []
-    for det in nfe.findall(_t('det')):
-        prod = det.find(_t('prod'))
-        if prod is None:
-            continue
-
-        nome_produto = _get(prod, 'xProd') or 'Desconhecido'
-        codigo       = _get(prod, 'cProd') or ''
-        ean          = _get(prod, 'cEAN') or ''
-        ncm          = _get(prod, 'NCM') or ''
-        unidade      = _get(prod, 'uCom') or ''
-        qtd          = _float(_get(prod, 'qCom'))
-        preco_unit   = _float(_get(prod, 'vUnCom'))
-
-        # vItem reflete o valor real pago (já com eventuais descontos por item)
-        # vProd é o valor antes de desconto ao nível do item
-        v_item = _get(det, 'vItem')
-        v_prod = _get(prod, 'vProd')
-        preco_total  = _float(v_item if v_item is not None else v_prod)
-
-        # Ignora itens zerados (ex.: sacolas de cortesia sem valor fiscal)
-        if preco_total <= 0 and preco_unit <= 0:
-            continue
-
-        itens.append({
-            'data':           data_compra,
-            'produto':        nome_produto,
-            'qtd':            qtd,
-            'unidade':        unidade,
-            'preco_unit':     preco_unit,
-            'preco_total':    preco_total,
-            'codigo':         codigo,
-            'ean':            ean if ean != 'SEM GTIN' else '',
-            'ncm':            ncm,
-            'loja':           loja or '',
-            'cnpj':           cnpj or '',
-            'endereco':       endereco,
-            'chave_nfe':      chave_nfe,
-            'arquivo_origem': nome_origem,
-        })
-
-    return itens
+    try:
+        for evento in _eventos_streaming(fluxo, nome_origem, tamanho_bloco):
+            if evento[0] == 'item':
+                itens.append(evento[1])
+            else:
+                yield {'chave': evento[1], 'cabecalho': evento[2], 'itens': itens}
+                itens = []
+    except ET.ParseError as e:
+        print(f'[ERRO XML] {nome_origem}: XML inválido — {e}')
+    finally:
+        if fechar:
+            fluxo.close()
+
+
+def iterar_itens_do_xml(fonte, nome_origem: str,
+                        tamanho_bloco: int = TAMANHO_BLOCO_STREAMING) -> Iterator[dict]:
+    """
+    Gera os itens de uma ou mais NF-e à medida que cada <det> é fechado,
+    sem montar a árvore do documento. Os dicts têm o mesmo formato de
+    :func:`extrair_itens_do_xml`. Aceita as mesmas fontes de
+    :func:`iterar_notas_do_xml`.
+    """
+    fluxo, fechar = _abrir_fonte(fonte)
+    try:
+        for evento in _eventos_streaming(fluxo, nome_origem, tamanho_bloco):
+            if evento[0] == 'item':
+                yield evento[1]
+    except ET.ParseError as e:
+        print(f'[ERRO XML] {nome_origem}: XML inválido — {e}')
+    finally:
+        if fechar:
+            fluxo.close()
@@ -31,6 +31,8 @@ from reportlab.platypus import (
 )
 from reportlab.platypus.flowables import Image as RLImage
 
+from varredura import varrer_pasta
+
 
 # ─── Configurações visuais ────────────────────────────────────────────────────
 COR_CABECALHO   = colors.HexColor('#1a3a5c')   # Azul escuro
@@ -647,10 +649,9 @@ if __name__ == '__main__':
         # Arquivo(s) passados como argumento
         fontes = [Path(a) for a in sys.argv[1:]]
     else:
-        # Varre resources/notas_fiscais/ inteiro
+        # Varre resources/notas_fiscais/ inteiro, com as subpastas
         pasta  = raiz / 'resources' / 'notas_fiscais'
-        fontes = [f for f in pasta.iterdir()
-                  if f.suffix.lower() in ('.xml', '.zip')]
+        fontes = [a.caminho for a in varrer_pasta(pasta, ('.xml', '.zip'))]
         print(f'Processando {len(fontes)} arquivo(s) em: {pasta}')
 
     total = 0
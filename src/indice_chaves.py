@@ -0,0 +1,137 @@
+"""
+Índice persistente de chaves de acesso NF-e.
+
+Mapeia cada chave de 44 dígitos já ingerida para a fonte de onde veio
+(arquivo, caminho dentro do ZIP, formato, quantidade de itens e data da
+ingestão). Fica em ``resources/outputData/indice_chaves.sqlite`` e permite
+deduplicar XML, PDF e XLSX contra todas as execuções anteriores com uma
+consulta pela chave primária, sem reler nem reinterpretar arquivos antigos.
+
+Também guarda as cópias de cada chave que não foram usadas (a mesma nota em
+outro arquivo, num formato de prioridade igual ou menor): quando a origem
+registrada de uma chave é removida ou alterada, :meth:`IndiceChaves.origens_orfas`
+indica quais origens inalteradas ainda têm a nota e precisam ser lidas de novo.
+
+As alterações só são confirmadas (``commit``) por :meth:`IndiceChaves.salvar`,
+chamado depois que o CSV foi gravado — se a execução falhar no meio, o índice
+continua coerente com o último CSV exportado.
+"""
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+NOME_INDICE = 'indice_chaves.sqlite'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS chaves (
+    chave       TEXT PRIMARY KEY,
+    arquivo     TEXT NOT NULL,
+    membro      TEXT NOT NULL DEFAULT '',
+    formato     TEXT NOT NULL,
+    qtd_itens   INTEGER NOT NULL DEFAULT 0,
+    ingerido_em TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_chaves_arquivo ON chaves (arquivo);
+CREATE TABLE IF NOT EXISTS copias (
+    chave       TEXT NOT NULL,
+    arquivo     TEXT NOT NULL,
+    membro      TEXT NOT NULL DEFAULT '',
+    formato     TEXT NOT NULL,
+    PRIMARY KEY (chave, arquivo, membro)
+) WITHOUT ROWID;
+"""
+
+
+def separar_origem(origem: str) -> tuple[str, str]:
+    """Divide um 'arquivo_origem' em (arquivo, caminho dentro do ZIP)."""
+    arquivo, _, membro = origem.partition('::')
+    return arquivo, membro
+
+
+class IndiceChaves:
+    """Acesso ao índice SQLite de chaves NF-e."""
+
+    def __init__(self, caminho: Path | str = ':memory:'):
+        self.caminho = caminho
+        if caminho != ':memory:':
+            Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(caminho))
+        self._conn.executescript(_ESQUEMA)
+
+    def __contains__(self, chave: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM chaves WHERE chave = ?', (chave,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM chaves').fetchone()[0]
+
+    def origem(self, chave: str) -> dict | None:
+        """Retorna a fonte registrada para a chave, ou None se ela nunca foi ingerida."""
+        linha = self._conn.execute(
+            'SELECT arquivo, membro, formato, qtd_itens, ingerido_em FROM chaves WHERE chave = ?',
+            (chave,),
+        ).fetchone()
+        if linha is None:
+            return None
+        return dict(zip(['arquivo', 'membro', 'formato', 'qtd_itens', 'ingerido_em'], linha))
+
+    def chaves(self) -> set[str]:
+        """Todas as chaves registradas."""
+        return {linha[0] for linha in self._conn.execute('SELECT chave FROM chaves')}
+
+    def registrar(self, chave: str, origem: str, formato: str, qtd_itens: int) -> None:
+        """Registra (ou substitui) a fonte de uma chave."""
+        arquivo, membro = separar_origem(origem)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO chaves VALUES (?, ?, ?, ?, ?, ?)',
+            (chave, arquivo, membro, formato, qtd_itens, datetime.now().isoformat(timespec='seconds')),
+        )
+
+    def registrar_copia(self, chave: str, origem: str, formato: str) -> None:
+        """Registra uma cópia não usada da chave (nota repetida em outra origem)."""
+        arquivo, membro = separar_origem(origem)
+        self._conn.execute('INSERT OR REPLACE INTO copias VALUES (?, ?, ?, ?)', (chave, arquivo, membro, formato))
+
+    def remover(self, chave: str) -> None:
+        self._conn.execute('DELETE FROM chaves WHERE chave = ?', (chave,))
+
+    def limpar(self) -> None:
+        self._conn.execute('DELETE FROM chaves')
+        self._conn.execute('DELETE FROM copias')
+
+    def _filtro(self, mantida: Callable[[str], bool]) -> None:
+        self._conn.create_function(
+            'mantida', 2,
+            lambda arquivo, membro: mantida(f'{arquivo}::{membro}' if membro else arquivo),
+            deterministic=True,
+        )
+
+    def origens_orfas(self, mantida: Callable[[str], bool]) -> set[str]:
+        """
+        Origens que passam no filtro ``mantida`` e têm cópias de chaves cuja
+        origem registrada não passa (ou já saiu do índice) — sem relê-las, a
+        nota sumiria da base.
+        """
+        self._filtro(mantida)
+        linhas = self._conn.execute(
+            'SELECT DISTINCT c.arquivo, c.membro FROM copias c LEFT JOIN chaves k ON k.chave = c.chave '
+            'WHERE mantida(c.arquivo, c.membro) AND (k.chave IS NULL OR NOT mantida(k.arquivo, k.membro))'
+        )
+        return {f'{arquivo}::{membro}' if membro else arquivo for arquivo, membro in linhas}
+
+    def manter_apenas(self, mantida: Callable[[str], bool]) -> int:
+        """
+        Remove as chaves (e as cópias) cuja origem não passa no filtro
+        ``mantida(arquivo_origem)`` (arquivos removidos ou que serão
+        reprocessados). Retorna quantas chaves saíram.
+        """
+        self._filtro(mantida)
+        self._conn.execute('DELETE FROM copias WHERE NOT mantida(arquivo, membro)')
+        return self._conn.execute('DELETE FROM chaves WHERE NOT mantida(arquivo, membro)').rowcount
+
+    def salvar(self) -> None:
+        """Confirma as alterações pendentes em disco."""
+        self._conn.commit()
+
+    def fechar(self) -> None:
+        self._conn.close()
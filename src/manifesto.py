@@ -0,0 +1,219 @@
+"""
+Manifesto de ingestão incremental.
+
+Guarda, para cada arquivo de entrada já processado, o tamanho, o mtime e o
+hash SHA-256 do conteúdo — e, para ZIPs, o CRC-32 de cada membro (lido de
+``ZipInfo.CRC``, sem descompactar nada). Em execuções seguintes o processador
+consulta o manifesto para ler apenas arquivos novos ou alterados e, dentro de
+um ZIP alterado, apenas os membros cujo CRC mudou.
+
+O manifesto é um JSON em ``resources/outputData/manifesto_ingestao.json``,
+gravado de forma atômica (arquivo temporário + ``os.replace``) por
+:func:`gravar_json_atomico` — a mesma função grava o checkpoint, as
+métricas de ingestão e o status do vigia.
+
+O dashboard usa o mesmo manifesto para saber o que mudou na pasta desde a
+última ingestão (:meth:`ManifestoIngestao.comparar_pasta`): arquivos novos,
+alterados, renomeados, copiados ou removidos.
+"""
+import hashlib
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import NamedTuple
+
+from varredura import varrer_pasta
+
+# Incrementar quando o formato das entradas mudar — manifestos antigos são descartados
+VERSAO_MANIFESTO = 1
+
+NOME_MANIFESTO = 'manifesto_ingestao.json'
+
+
+def gravar_json_atomico(caminho: Path, conteudo, default=None) -> None:
+    """
+    Grava ``conteudo`` em JSON de forma atômica: escreve ``<nome>.tmp`` na
+    mesma pasta e o coloca no lugar com ``os.replace``, de modo que quem lê
+    o arquivo nunca vê uma gravação pela metade. ``default`` converte os
+    valores que o ``json`` não serializa.
+    """
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    temporario.write_text(json.dumps(conteudo, ensure_ascii=False, indent=1, default=default), encoding='utf-8')
+    os.replace(temporario, caminho)
+
+
+def calcular_sha256(caminho: Path, tamanho_bloco: int = 1 << 20) -> str:
+    """Calcula o SHA-256 de um arquivo lendo-o em blocos (memória constante)."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def crcs_membros_zip(caminho: Path) -> dict[str, list[int]]:
+    """
+    Retorna ``{nome_membro: [crc32, tamanho_descompactado]}`` para os membros
+    de primeiro nível de um ZIP, lidos apenas do diretório central.
+    Retorna dict vazio se o arquivo não for um ZIP válido.
+    """
+    try:
+        with zipfile.ZipFile(caminho) as z:
+            return {
+                info.filename: [info.CRC, info.file_size]
+                for info in z.infolist()
+                if not info.is_dir()
+            }
+    except (zipfile.BadZipFile, OSError):
+        return {}
+
+
+class MudancasPasta(NamedTuple):
+    """
+    Diferença entre a pasta de notas e o manifesto da última ingestão.
+
+    ``renomeados`` e ``duplicados`` mapeiam o nome atual para o arquivo do
+    manifesto com o mesmo conteúdo: no primeiro caso o original saiu da
+    pasta, no segundo ele continua lá (cópia com outro nome).
+    """
+    novos: list[str]
+    alterados: list[str]
+    renomeados: dict[str, str]
+    duplicados: dict[str, str]
+    removidos: list[str]
+
+    @property
+    def pendentes(self) -> list[str]:
+        """Arquivos com conteúdo ainda não ingerido (novos ou alterados)."""
+        return sorted(self.novos + self.alterados)
+
+    def __bool__(self) -> bool:
+        return any(self)
+
+
+class ManifestoIngestao:
+    """
+    Conjunto de entradas ``{caminho_relativo: {tamanho, mtime, sha256, membros}}``.
+
+    O caminho relativo é o mesmo valor gravado como raiz de ``arquivo_origem``
+    no CSV (a parte antes de ``::`` nos ZIPs).
+    """
+
+    def __init__(self, caminho: Path | None = None):
+        self.caminho = Path(caminho) if caminho else None
+        self.entradas: dict[str, dict] = {}
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> 'ManifestoIngestao':
+        """Lê o manifesto do disco; devolve um manifesto vazio se não existir ou for inválido."""
+        manifesto = cls(caminho)
+        try:
+            dados = json.loads(Path(caminho).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return manifesto
+        if dados.get('versao') == VERSAO_MANIFESTO:
+            manifesto.entradas = dados.get('arquivos', {})
+        return manifesto
+
+    def salvar(self, caminho: Path | None = None) -> None:
+        """Grava o manifesto de forma atômica."""
+        gravar_json_atomico(caminho or self.caminho, {'versao': VERSAO_MANIFESTO, 'arquivos': self.entradas})
+
+    def verificar(self, relativo: str, arquivo: Path,
+                  assinatura: tuple[int, int] | None = None) -> tuple[str, dict]:
+        """
+        Compara um arquivo em disco com a entrada registrada.
+
+        Retorna
+        -------
+        tuple[str, dict]
+            ``(situacao, entrada_atual)`` onde situacao é ``'novo'``,
+            ``'alterado'`` ou ``'inalterado'``. Tamanho e mtime iguais bastam
+            para considerar o arquivo inalterado; caso contrário o hash do
+            conteúdo decide (um ``touch`` não força reprocessamento).
+            ``assinatura`` (``(tamanho, mtime_ns)`` já obtidos na varredura)
+            evita um novo ``stat``.
+        """
+        if assinatura is None:
+            stat = arquivo.stat()
+            assinatura = (stat.st_size, stat.st_mtime_ns)
+        tamanho, mtime = assinatura
+        anterior = self.entradas.get(relativo)
+
+        if anterior and anterior.get('tamanho') == tamanho and anterior.get('mtime') == mtime:
+            return 'inalterado', anterior
+
+        entrada = {
+            'tamanho': tamanho,
+            'mtime': mtime,
+            'sha256': calcular_sha256(arquivo),
+        }
+        if arquivo.suffix.lower() == '.zip':
+            entrada['membros'] = crcs_membros_zip(arquivo)
+
+        if anterior is None:
+            return 'novo', entrada
+        if anterior.get('sha256') == entrada['sha256']:
+            return 'inalterado', entrada
+        return 'alterado', entrada
+
+    def membros_inalterados(self, relativo: str, entrada_atual: dict) -> set[str]:
+        """Membros de um ZIP alterado cujo CRC e tamanho não mudaram."""
+        anteriores = (self.entradas.get(relativo) or {}).get('membros', {})
+        atuais = entrada_atual.get('membros', {})
+        return {nome for nome, crc in atuais.items() if anteriores.get(nome) == crc}
+
+    def comparar_pasta(self, pasta: Path, extensoes: set[str],
+                       hashes: dict[tuple[str, int, int], str] | None = None) -> MudancasPasta:
+        """
+        Classifica os arquivos de entrada de ``pasta`` em relação ao manifesto.
+
+        Arquivos com tamanho e mtime iguais aos registrados não são lidos; o
+        SHA-256 só é calculado para os demais (novos, alterados ou apenas
+        tocados), de modo que o custo é um ``stat`` por arquivo mais a leitura
+        dos que mudaram. A pasta é percorrida com as subpastas, como na
+        ingestão, e os arquivos são identificados pelo caminho relativo.
+        ``hashes`` memoriza os hashes por ``(nome, tamanho, mtime_ns)`` entre
+        chamadas.
+        """
+        hashes = {} if hashes is None else hashes
+        atuais = {arquivo.relativo: arquivo for arquivo in varrer_pasta(pasta, extensoes)}
+
+        def _sha256(nome: str) -> str:
+            arquivo = atuais[nome]
+            chave = (nome, arquivo.tamanho, arquivo.mtime_ns)
+            if chave not in hashes:
+                hashes[chave] = calcular_sha256(arquivo.caminho)
+            return hashes[chave]
+
+        alterados, desconhecidos = [], []
+        for nome, arquivo in sorted(atuais.items()):
+            anterior = self.entradas.get(nome)
+            if anterior is None:
+                desconhecidos.append(nome)
+            elif (anterior.get('tamanho'), anterior.get('mtime')) == (arquivo.tamanho, arquivo.mtime_ns):
+                continue
+            elif anterior.get('sha256') != _sha256(nome):
+                alterados.append(nome)
+
+        ausentes = [nome for nome in self.entradas if nome not in atuais]
+        por_hash: dict[str, list[str]] = {}
+        for nome, entrada in self.entradas.items():
+            por_hash.setdefault(entrada.get('sha256'), []).append(nome)
+
+        novos, renomeados, duplicados = [], {}, {}
+        for nome in desconhecidos:
+            iguais = por_hash.get(_sha256(nome))
+            if not iguais:
+                novos.append(nome)
+                continue
+            original = next((n for n in iguais if n in ausentes and n not in renomeados.values()), None)
+            if original is not None:
+                renomeados[nome] = original
+            else:
+                duplicados[nome] = iguais[0]
+        removidos = sorted(set(ausentes) - set(renomeados.values()))
+        return MudancasPasta(novos, alterados, renomeados, duplicados, removidos)
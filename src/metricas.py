@@ -0,0 +1,138 @@
+"""
+Métricas de desempenho da ingestão: tempo por etapa e por arquivo.
+
+As linhas ``[XML] … n item(s)`` dizem o que foi lido, mas não onde uma
+execução lenta gasta o tempo. A extração marca suas etapas com
+:func:`medir`:
+
+- ``planejamento``: comparação com o manifesto (hash dos arquivos alterados);
+- ``presondagem``: leitura apenas das chaves de acesso, antes da extração;
+- ``leitura``: leitura dos arquivos avulsos e consulta aos caches;
+- ``descompactacao``: leitura dos membros de ZIPs;
+- ``sonda_chave``: localização da chave de acesso em PDFs;
+- ``parse``: interpretação de XML, PDF e XLSX em itens;
+- ``deduplicacao``: registro dos documentos (chaves NF-e) no processo principal;
+- ``exportacao``: normalização e gravação de CSV, Parquet e SQLite.
+
+O cronômetro é um por processo: :func:`coletar` devolve (e zera) o que foi
+medido desde a última coleta, o que permite atribuir as etapas a cada arquivo
+— também nos processos do pool (``--jobs``), que as devolvem junto com os
+documentos. :class:`MetricasIngestao` reúne tudo no processo principal e, ao
+final da exportação, grava ``resources/outputData/metricas_ingestao.json`` e
+imprime um resumo com vazão (arquivos/s, itens/s, MB/s) e os arquivos mais
+lentos.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from manifesto import gravar_json_atomico
+
+NOME_METRICAS = 'metricas_ingestao.json'
+
+ETAPAS = ('planejamento', 'presondagem', 'leitura', 'descompactacao', 'sonda_chave', 'parse', 'deduplicacao', 'exportacao')
+
+# Segundos acumulados por etapa neste processo desde a última coleta
+_acumulado: dict[str, float] = defaultdict(float)
+
+
+@contextmanager
+def medir(etapa: str) -> Iterator[None]:
+    """Soma ao cronômetro do processo o tempo gasto dentro do bloco."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _acumulado[etapa] += time.perf_counter() - inicio
+
+
+def medir_iteracao(etapa: str, iteravel: Iterable) -> Iterator:
+    """
+    Repassa os elementos de ``iteravel`` medindo apenas o tempo de produzi-los
+    (não o tempo de quem consome, enquanto o gerador está suspenso).
+    """
+    iterador = iter(iteravel)
+    while True:
+        with medir(etapa):
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                return
+        yield elemento
+
+
+def coletar() -> dict[str, float]:
+    """Tempos por etapa medidos desde a última coleta (e zera o cronômetro)."""
+    etapas = dict(_acumulado)
+    _acumulado.clear()
+    return etapas
+
+
+class MetricasIngestao:
+    """Tempos, bytes e itens de uma execução, por arquivo e por etapa."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.duracao: float | None = None
+        self.etapas: dict[str, float] = dict.fromkeys(ETAPAS, 0.0)
+        self.arquivos: list[dict] = []
+
+    def registrar_etapas(self, etapas: dict[str, float]) -> None:
+        for etapa, segundos in etapas.items():
+            self.etapas[etapa] = self.etapas.get(etapa, 0.0) + segundos
+
+    def registrar_arquivo(self, nome: str, tamanho: int, itens: int, segundos: float,
+                          etapas: dict[str, float]) -> None:
+        """Registra um arquivo lido; ``etapas`` também entram no total da execução."""
+        self.registrar_etapas(etapas)
+        self.arquivos.append({
+            'arquivo': nome,
+            'bytes': tamanho,
+            'itens': itens,
+            'segundos': round(segundos, 6),
+            'etapas': {etapa: round(s, 6) for etapa, s in etapas.items()},
+        })
+
+    def finalizar(self) -> None:
+        self.duracao = time.perf_counter() - self.inicio
+
+    def relatorio(self, mais_lentos: int = 20) -> dict:
+        duracao = self.duracao if self.duracao is not None else time.perf_counter() - self.inicio
+        total_bytes = sum(a['bytes'] for a in self.arquivos)
+        total_itens = sum(a['itens'] for a in self.arquivos)
+
+        def _por_segundo(valor: float) -> float:
+            return round(valor / duracao, 3) if duracao > 0 else 0.0
+
+        return {
+            'duracao_segundos': round(duracao, 6),
+            'arquivos': len(self.arquivos),
+            'itens': total_itens,
+            'bytes': total_bytes,
+            'arquivos_por_segundo': _por_segundo(len(self.arquivos)),
+            'itens_por_segundo': _por_segundo(total_itens),
+            'mb_por_segundo': _por_segundo(total_bytes / (1024 * 1024)),
+            'etapas_segundos': {etapa: round(s, 6) for etapa, s in self.etapas.items()},
+            'mais_lentos': sorted(self.arquivos, key=lambda a: a['segundos'], reverse=True)[:mais_lentos],
+            'por_arquivo': self.arquivos,
+        }
+
+    def resumo(self, mais_lentos: int = 5) -> str:
+        r = self.relatorio(mais_lentos)
+        linhas = [
+            f"Ingestão: {r['arquivos']} arquivo(s), {r['itens']} item(ns), "
+            f"{r['bytes'] / (1024 * 1024):.1f} MB em {r['duracao_segundos']:.2f} s",
+            f"  Vazão: {r['arquivos_por_segundo']:.1f} arquivos/s, {r['itens_por_segundo']:.0f} itens/s, "
+            f"{r['mb_por_segundo']:.2f} MB/s",
+            "  Etapas: " + ', '.join(f"{etapa} {s:.2f} s" for etapa, s in r['etapas_segundos'].items() if s),
+        ]
+        if r['mais_lentos']:
+            linhas.append("  Mais lentos:")
+            linhas += [f"    {a['segundos']:8.3f} s  {a['arquivo']} ({a['itens']} item(ns))" for a in r['mais_lentos']]
+        return '\n'.join(linhas)
+
+    def salvar(self, caminho: Path) -> None:
+        """Grava o relatório em JSON de forma atômica."""
+        gravar_json_atomico(caminho, self.relatorio())
@@ -0,0 +1,126 @@
+"""
+Base em duas tabelas ligadas: uma linha por nota e uma linha por item.
+
+No CSV cada item repete loja, CNPJ, endereço, data, chave e arquivo de
+origem, e quem precisa de totais por nota (o mapa de NFs do dashboard)
+reconstrói as notas com ``groupby`` sobre todos os itens. Aqui a base é
+dividida em:
+
+- notas: ``id_nota``, ``identificador`` (chave NF-e ou, sem ela,
+  ``arquivo_origem|data|loja``), as colunas de :data:`COLUNAS_NOTA` e os
+  totais ``qtd_itens`` e ``valor_total``;
+- itens: ``id_nota`` e as colunas de :data:`COLUNAS_ITEM`.
+
+O processador grava as duas tabelas em Parquet ao lado do CSV
+(``minha_inflacao_notas.parquet`` e ``minha_inflacao_itens.parquet``); o
+dashboard usa as notas diretamente e só junta os itens quando precisa da
+visão item a item (:func:`juntar_notas_itens`). Na exportação em blocos, a
+divisão é feita bloco a bloco por :class:`SeparadorNotas`, com o mesmo
+resultado de :func:`separar_notas` sobre a base inteira.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Colunas da base exportada que descrevem a nota (repetidas em cada item)
+COLUNAS_NOTA = ['chave_nfe', 'loja', 'cnpj', 'endereco', 'data', 'arquivo_origem']
+# Colunas próprias de cada item
+COLUNAS_ITEM = ['categoria', 'produto', 'produto_raw', 'qtd', 'unidade', 'preco_unit', 'preco_total',
+                'codigo', 'ean', 'ncm']
+# Ordem das colunas da base item a item (a mesma do CSV)
+COLUNAS_BASE = ['data', 'loja', 'cnpj', 'endereco', 'categoria', 'produto', 'produto_raw', 'qtd', 'unidade',
+                'preco_unit', 'preco_total', 'codigo', 'ean', 'ncm', 'chave_nfe', 'arquivo_origem']
+
+
+def caminhos_notas_itens(caminho_csv: Path) -> tuple[Path, Path]:
+    """Arquivos Parquet de notas e de itens correspondentes a um CSV exportado."""
+    caminho_csv = Path(caminho_csv)
+    return (caminho_csv.with_name(f'{caminho_csv.stem}_notas.parquet'),
+            caminho_csv.with_name(f'{caminho_csv.stem}_itens.parquet'))
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    return serie.astype(object).where(serie.notna(), '').astype(str)
+
+
+def identificar_notas(df: pd.DataFrame) -> pd.Series:
+    """
+    Identificador da nota de cada item: a chave NF-e ou, quando ela falta,
+    ``arquivo_origem|data|loja``.
+    """
+    vazia = pd.Series('', index=df.index)
+    chave = _texto(df['chave_nfe']) if 'chave_nfe' in df.columns else vazia
+    partes = [_texto(df[c]) if c in df.columns else vazia for c in ['arquivo_origem', 'data', 'loja']]
+    return chave.where(chave != '', partes[0] + '|' + partes[1] + '|' + partes[2])
+
+
+class SeparadorNotas:
+    """
+    Divisão em notas e itens feita bloco a bloco, na ordem da base.
+
+    :meth:`itens` devolve os itens de cada bloco já com ``id_nota``; as notas
+    (uma linha por identificador, numeradas na ordem em que aparecem, mesmo
+    que os itens de uma nota fiquem em blocos diferentes) e seus totais são
+    acumulados e entregues no final por :meth:`notas`.
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._notas: list[pd.DataFrame] = []
+        self._qtd = np.zeros(0, dtype=np.int64)
+        self._valor = np.zeros(0, dtype=float)
+
+    def itens(self, bloco: pd.DataFrame) -> pd.DataFrame:
+        """Itens do bloco (``id_nota`` e :data:`COLUNAS_ITEM`), registrando as notas novas."""
+        identificador = identificar_notas(bloco)
+        novas = (~identificador.duplicated() & identificador.map(self._ids).isna()).to_numpy()
+        if novas.any() or not self._notas:
+            primeiro = len(self._ids)
+            notas = bloco.loc[novas, [c for c in COLUNAS_NOTA if c in bloco.columns]].reset_index(drop=True)
+            notas.insert(0, 'identificador', identificador[novas].to_numpy())
+            notas.insert(0, 'id_nota', np.arange(primeiro, primeiro + len(notas)))
+            self._notas.append(notas)
+            self._ids.update(zip(notas['identificador'], notas['id_nota'].tolist()))
+        codigos = identificador.map(self._ids).to_numpy(dtype=np.int64)
+
+        total = len(self._ids)
+        self._qtd = np.bincount(codigos, minlength=total) + np.pad(self._qtd, (0, total - len(self._qtd)))
+        self._valor = np.pad(self._valor, (0, total - len(self._valor)))
+        if 'preco_total' in bloco.columns:
+            # Soma item a item, na ordem da base: o mesmo total com a nota dividida entre blocos
+            np.add.at(self._valor, codigos, bloco['preco_total'].fillna(0).to_numpy(dtype=float))
+
+        itens = bloco[[c for c in COLUNAS_ITEM if c in bloco.columns]].reset_index(drop=True)
+        itens.insert(0, 'id_nota', codigos)
+        return itens
+
+    def notas(self) -> pd.DataFrame:
+        """Uma linha por nota vista até aqui, com ``qtd_itens`` e ``valor_total``."""
+        if not self._notas:
+            return pd.DataFrame(columns=['id_nota', 'identificador', 'qtd_itens', 'valor_total'])
+        notas = pd.concat(self._notas, ignore_index=True)
+        notas['qtd_itens'] = self._qtd
+        notas['valor_total'] = self._valor
+        return notas
+
+
+def separar_notas(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Divide a base (um item por linha) em ``(notas, itens)``.
+
+    ``notas`` tem uma linha por nota, na ordem em que aparecem, com
+    ``id_nota`` (0, 1, ...), ``identificador``, as colunas de
+    :data:`COLUNAS_NOTA`, ``qtd_itens`` e ``valor_total``; ``itens`` mantém
+    as linhas da base com ``id_nota`` e as colunas de :data:`COLUNAS_ITEM`.
+    """
+    separador = SeparadorNotas()
+    itens = separador.itens(df)
+    return separador.notas(), itens
+
+
+def juntar_notas_itens(notas: pd.DataFrame, itens: pd.DataFrame) -> pd.DataFrame:
+    """Base item a item (colunas do CSV) a partir das tabelas de notas e itens."""
+    colunas_nota = ['id_nota'] + [c for c in COLUNAS_NOTA if c in notas.columns]
+    df = itens.merge(notas[colunas_nota], on='id_nota', how='left', sort=False)
+    return df[[c for c in COLUNAS_BASE if c in df.columns]]
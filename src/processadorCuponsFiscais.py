@@ -1,18 +1,704 @@
 import pdfplumber
+import numpy as np
 import pandas as pd
+import contextlib
+import io
+import os
 import re
+import shutil
+import sqlite3
+import tempfile
+import time
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from extratorXml import extrair_itens_do_xml, extrair_chave_do_xml
+from typing import Callable, Iterable, Iterator, NamedTuple
+from acumulador_itens import AcumuladorItens
+from base_sqlite import BaseSqlite, NOME_BASE_SQLITE
+from cache_texto_pdf import CacheTextoPdf, NOME_CACHE_PDF, sha256_da_fonte
+from cache_xlsx import CACHE_XLSX_DISPONIVEL, CacheXlsx, NOME_CACHE_XLSX
+from checkpoint import INTERVALO_CHECKPOINT, CheckpointIngestao, NOME_CHECKPOINT, Retomada
+from exportacao import ExportacaoEmBlocos
+from extratorPdf import iterar_itens_danfe, sondar_chave_pdf
+from extratorXlsx import iterar_blocos_citizen, sondar_chaves_citizen
+from extratorXml import contar_notas, extrair_nota_do_xml, iterar_notas_do_xml, sondar_chaves_xml
+from indice_chaves import IndiceChaves, NOME_INDICE
+from manifesto import ManifestoIngestao, NOME_MANIFESTO
+from metricas import MetricasIngestao, NOME_METRICAS, coletar, medir, medir_iteracao
+from notas_itens import COLUNAS_BASE
+from varredura import ArquivoEntrada, casa_filtros, varrer_pasta
+
+NOME_CSV = 'minha_inflacao.csv'
+
+EXTENSOES_ENTRADA = {'.xml', '.pdf', '.zip', '.xlsx'}
+
+# XMLs acima deste tamanho são lidos em streaming, sem carregar o arquivo inteiro
+LIMITE_XML_STREAMING = 8 * 1024 * 1024
+
+# Membros de ZIP (PDF, XLSX, ZIP aninhado) acima deste tamanho são copiados
+# para um arquivo temporário em disco em vez de ficarem em memória
+LIMITE_SPOOL_MEMORIA = 32 * 1024 * 1024
+
+# Total de bytes descompactados permitido por ZIP de entrada (inclui aninhados);
+# protege contra exportações gigantes e "zip bombs"
+LIMITE_DESCOMPACTADO_POR_ZIP = 4 * 1024 * 1024 * 1024
+
+# Versão da extração de texto de PDF — incrementar ao mudar a sonda da chave ou
+# a forma de extrair o texto das páginas invalida o cache de texto de PDF
+VERSAO_TEXTO_PDF = 1
+
+# Versão da normalização das planilhas Citizen — incrementar ao mudar a
+# conversão das colunas invalida o cache de XLSX
+VERSAO_XLSX_CITIZEN = 1
+
+# Prioridade entre formatos quando a mesma chave NF-e aparece em mais de um
+# (menor vence) — XML é a fonte mais rica, PDF a mais pobre.
+_PRIORIDADE_FORMATO = {'.xml': 0, '.xlsx': 1, '.pdf': 2}
+
+# Fase da varredura em que cada formato de arquivo avulso é lido:
+# 0 — ZIPs e XMLs (registram as chaves), 1 — XLSXs (Citizen), 2 — PDFs
+_FASE_FORMATO = {'.xml': 0, '.zip': 0, '.xlsx': 1, '.pdf': 2}
+
+# Primeira data do DANFE (data da compra)
+_DATA_DANFE = re.compile(r'(\d{2}/\d{2}/\d{2,4})')
+
+# Colunas dos itens vindos das planilhas Citizen (antes de 'arquivo_origem')
+_COLUNAS_CITIZEN = ['data', 'loja', 'cnpj', 'endereco', 'produto', 'qtd', 'unidade', 'preco_unit',
+                    'preco_total', 'codigo', 'ean', 'ncm', 'chave_nfe']
+
+# Colunas lidas como texto ao recarregar o CSV (evita perder zeros à esquerda)
+_COLUNAS_TEXTO = ['cnpj', 'codigo', 'ean', 'ncm', 'chave_nfe', 'arquivo_origem']
+
+# Identificadores gravados como texto sem o '.0' de valores lidos como float
+_COLUNAS_IDENTIFICADORES = ['codigo', 'ean', 'ncm', 'cnpj']
+
+# Itens normalizados e gravados por vez na exportação (limita a memória de pico)
+TAMANHO_BLOCO_EXPORTACAO = 50_000
+
+
+def _pasta_saida() -> Path:
+    """Pasta resources/outputData do projeto."""
+    return Path(__file__).resolve().parent.parent / 'resources' / 'outputData'
+
+
+def _prevalece(formato: str, formato_anterior: str) -> bool:
+    """Indica se uma nota em ``formato`` substitui a mesma nota vinda antes em ``formato_anterior``."""
+    return _PRIORIDADE_FORMATO[formato] < _PRIORIDADE_FORMATO.get(formato_anterior, len(_PRIORIDADE_FORMATO))
+
+
+def _filtro_origens(mantidos: dict[str, set[str] | None]) -> Callable[[str], bool]:
+    """
+    Cria o filtro que decide se um 'arquivo_origem' da base anterior continua
+    válido. ``mantidos`` mapeia o nome do arquivo para ``None`` (arquivo
+    inteiro inalterado) ou para o conjunto de membros de ZIP inalterados.
+    """
+    def _mantida(origem: str) -> bool:
+        raiz, _, resto = origem.partition('::')
+        if raiz not in mantidos:
+            return False
+        membros = mantidos[raiz]
+        return membros is None or resto.split('::')[0] in membros
+    return _mantida
+
+
+# ── Conversões por coluna (importador Citizen) ────────────────────────────────
+# Equivalentes, coluna a coluna, às conversões ``str(valor or '')`` e
+# ``float(valor)`` que eram feitas célula por célula.
+
+def _valor_ou(sheet: pd.DataFrame, coluna: str, padrao, coalescer: bool = True) -> pd.Series:
+    """``row.get(coluna, padrao)`` (ou ``... or padrao``, com ``coalescer``) para a coluna inteira."""
+    if coluna not in sheet.columns:
+        return pd.Series(padrao, index=sheet.index, dtype=object)
+    valores = sheet[coluna]
+    return valores.where(valores.astype(bool), padrao) if coalescer else valores
+
+
+def _str_coluna(valores: pd.Series) -> pd.Series:
+    """``str(valor)`` célula a célula (``astype(str)`` mantém NaN/None como ausentes)."""
+    return valores.map(str).astype(object)
+
+
+def _texto_coluna(sheet: pd.DataFrame, *colunas: str) -> pd.Series:
+    """``str(row.get(c1, '') or row.get(c2, '') or '').strip()`` para a coluna inteira."""
+    resultado = pd.Series('', index=sheet.index, dtype=object)
+    for coluna in reversed(colunas):
+        if coluna in sheet.columns:
+            valores = sheet[coluna]
+            resultado = valores.where(valores.astype(bool), resultado)
+    return _str_coluna(resultado).str.strip()
+
+
+def _juntar_partes(partes: list[pd.Series], separador: str) -> pd.Series:
+    """``separador.join(p for p in partes if p and p != 'nan')`` linha a linha."""
+    resultado = partes[0].where((partes[0] != '') & (partes[0] != 'nan'), '')
+    for parte in partes[1:]:
+        valida = (parte != '') & (parte != 'nan')
+        com_separador = resultado.where(resultado == '', resultado + separador)
+        resultado = resultado.where(~valida, com_separador + parte)
+    return resultado
+
+
+def _float_ou_zero(valor) -> float:
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _float_coluna(valores: pd.Series) -> pd.Series:
+    """
+    ``float(valor)`` com 0.0 nos valores inválidos, para a coluna inteira. A
+    conversão é vetorizada; só as células que o pandas não converte (texto
+    inválido, 'nan', '') passam pela conversão do Python, que decide o valor.
+    """
+    numeros = pd.to_numeric(valores, errors='coerce').astype(float)
+    falhas = numeros.isna() & valores.notna()
+    if falhas.any():
+        numeros[falhas] = valores[falhas].map(_float_ou_zero)
+    return numeros
+
+
+class Documento(NamedTuple):
+    """
+    Uma nota fiscal extraída de um arquivo, ainda não deduplicada.
+
+    ``itens`` é None quando a extração foi pulada porque a chave já era
+    conhecida (PDF cuja nota já veio por XML, por exemplo).
+    """
+    formato: str
+    origem: str
+    chave: str | None
+    itens: list[dict] | None
+
+
+class Atualizacao(NamedTuple):
+    """
+    Resultado de :meth:`ProcessadorDeCupons.atualizar`.
+
+    ``novos`` traz os itens lidos nesta execução, como foram exportados.
+    Com ``somente_acrescimo`` nenhum item da base anterior foi removido ou
+    substituído, e a base nova é a anterior seguida de ``novos``.
+    """
+    arquivos: list[str]
+    novos: pd.DataFrame
+    somente_acrescimo: bool
+    itens: int
+
+
+class Caches(NamedTuple):
+    """Caches de conversão usados na extração (repassados também aos processos do pool)."""
+    pdf: CacheTextoPdf | None = None
+    xlsx: CacheXlsx | None = None
+
+
+# ── Extração (sem estado) ─────────────────────────────────────────────────────
+# As funções abaixo apenas leem e interpretam arquivos, gerando Documentos na
+# mesma ordem em que o processamento serial os registraria. A deduplicação
+# fica a cargo de ProcessadorDeCupons._registrar_documentos, sempre no processo
+# principal — isso permite rodar a extração em um pool de processos sem alterar
+# o resultado. ``conhecida(chave, formato)`` é apenas uma dica para evitar a
+# extração de notas (PDFs, notas de XLSX) que certamente serão descartadas, e
+# ``ignoradas`` lista as origens (arquivo avulso ou ``zip::membro``) que não
+# precisam ser lidas: membros inalterados desde a última execução e cópias de
+# notas que a pré-sondagem atribuiu a outra origem.
+
+def _caches_padrao() -> Caches:
+    """
+    Caches de texto de PDF e de planilhas Citizen em resources/outputData, nas
+    versões atuais da extração. O de XLSX só existe se o pyarrow estiver instalado.
+    """
+    versao_pdf = f'{VERSAO_TEXTO_PDF}/pdfplumber {pdfplumber.__version__}'
+    cache_xlsx = None
+    if CACHE_XLSX_DISPONIVEL:
+        cache_xlsx = CacheXlsx(_pasta_saida() / NOME_CACHE_XLSX, f'{VERSAO_XLSX_CITIZEN}')
+    return Caches(CacheTextoPdf(_pasta_saida() / NOME_CACHE_PDF, versao_pdf), cache_xlsx)
+
+
+def _documentos_pdf(fonte, origem: str, conhecida: Callable[[str, str], bool],
+                    cache: CacheTextoPdf | None = None) -> Iterator[Documento]:
+    """
+    Extrai um DANFE em PDF (caminho ou arquivo em memória).
+
+    A chave é obtida primeiro pela sonda barata (links e fluxos de conteúdo);
+    só se ela falhar o texto da primeira página é extraído — e esse texto é
+    reaproveitado na extração dos itens, sem repetir o layout da página.
+    Com ``cache``, a chave e o texto das páginas de um PDF já lido vêm do
+    cache, sem abrir o PDF.
+    """
+    try:
+        with medir('leitura'):
+            digest = sha256_da_fonte(fonte) if cache else None
+            entrada = cache.obter(digest) if cache else None
+        chave = entrada['chave'] if entrada else None
+        paginas = entrada['paginas'] if entrada else None
+        if entrada is None or (paginas is None and not (chave and conhecida(chave, '.pdf'))):
+            with medir('parse'):
+                pdf = pdfplumber.open(fonte)
+            with pdf:
+                textos: dict[int, str] = {}
+                if entrada is None:
+                    with medir('sonda_chave'):
+                        chave = sondar_chave_pdf(pdf)
+                        if chave is None and pdf.pages:
+                            textos[0] = pdf.pages[0].extract_text() or ''
+                            chave = ProcessadorDeCupons._extrair_chave_pdf(textos[0])
+                if not (chave and conhecida(chave, '.pdf')):
+                    with medir('parse'):
+                        paginas = ProcessadorDeCupons._textos_do_pdf(pdf, textos)
+            if cache:
+                cache.gravar(digest, chave, paginas)
+        if chave and conhecida(chave, '.pdf'):
+            itens = None
+        else:
+            with medir('parse'):
+                itens = ProcessadorDeCupons._itens_do_texto_pdf('\n'.join(paginas), origem, chave)
+    except Exception as e:
+        print(f"[ERRO PDF] {origem}: {e}")
+        return
+    yield Documento('.pdf', origem, chave, itens)
+
+
+def _documentos_xml(fonte, origem: str) -> Iterator[Documento]:
+    """
+    Extrai um XML de NF-e / NFC-e. ``fonte`` são os bytes do arquivo (parse
+    único em memória) ou, para arquivos grandes, um caminho ou arquivo aberto
+    lido em streaming. Lotes com várias notas concatenadas também seguem pelo
+    streaming e geram um Documento por nota.
+    """
+    if isinstance(fonte, bytes):
+        with medir('parse'):
+            nota = extrair_nota_do_xml(fonte, origem) if contar_notas(fonte) < 2 else None
+        if nota is not None:
+            yield Documento('.xml', origem, nota['chave'], nota['itens'])
+            return
+    for nota in medir_iteracao('parse', iterar_notas_do_xml(fonte, origem)):
+        yield Documento('.xml', origem, nota['chave'], nota['itens'])
+
+
+def _documentos_xlsx(fonte, origem: str, conhecida: Callable[[str, str], bool] | None = None,
+                     cache: CacheXlsx | None = None) -> Iterator[Documento]:
+    """
+    Extrai uma exportação do app Citizen (bytes ou arquivo) — um Documento por
+    chave NF-e. Notas de chaves já conhecidas saem com ``itens=None``.
+    """
+    try:
+        with medir('parse'):
+            notas = ProcessadorDeCupons._notas_do_xlsx_citizen(fonte, origem, conhecida, cache)
+    except Exception as e:
+        print(f"[ERRO XLSX] {origem}: {e}")
+        return
+    for chave, itens in notas:
+        yield Documento('.xlsx', origem, chave if len(chave) == 44 else None, itens)
+
+
+class LimiteDescompactacaoExcedido(Exception):
+    """O ZIP descompactaria mais bytes do que LIMITE_DESCOMPACTADO_POR_ZIP."""
+
+
+class _Orcamento:
+    """Bytes descompactados ainda permitidos para um ZIP de entrada e seus aninhados."""
+
+    def __init__(self, limite: int):
+        self.restante = limite
+
+    def consumir(self, info: zipfile.ZipInfo, origem: str) -> None:
+        # ZipExtFile nunca entrega mais que file_size, então o valor declarado é um teto seguro
+        if info.file_size > self.restante:
+            raise LimiteDescompactacaoExcedido(
+                f"{origem}: limite de {LIMITE_DESCOMPACTADO_POR_ZIP} bytes descompactados excedido")
+        self.restante -= info.file_size
+
+
+def _spool_membro(z: zipfile.ZipFile, nome: str) -> tempfile.SpooledTemporaryFile:
+    """
+    Copia um membro do ZIP em blocos para um arquivo temporário que fica em
+    memória até LIMITE_SPOOL_MEMORIA e passa para o disco acima disso. O
+    resultado é pesquisável (seek), como exigem pdfplumber, openpyxl e zipfile.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=LIMITE_SPOOL_MEMORIA)
+    with medir('descompactacao'), z.open(nome) as f:
+        shutil.copyfileobj(f, spool, 1 << 20)
+    spool.seek(0)
+    return spool
+
+
+def _membros_zip(z: zipfile.ZipFile, nome_zip_raiz: str,
+                 ignoradas: frozenset[str]) -> dict[str, list[zipfile.ZipInfo]]:
+    """Membros de um ZipFile a ler, por extensão, na ordem do arquivo (sem pastas, __MACOSX e ``ignoradas``)."""
+    membros: dict[str, list[zipfile.ZipInfo]] = {'.xml': [], '.xlsx': [], '.pdf': [], '.zip': []}
+    for info in z.infolist():
+        if info.filename.startswith('__MACOSX') or info.is_dir():
+            continue
+        if f"{nome_zip_raiz}::{info.filename}" in ignoradas:
+            continue
+        lista = membros.get(os.path.splitext(info.filename)[1].lower())
+        if lista is not None:
+            lista.append(info)
+    return membros
+
+
+def _documentos_zip(z: zipfile.ZipFile, nome_zip_raiz: str, conhecida: Callable[[str, str], bool],
+                    ignoradas: frozenset[str] = frozenset(),
+                    orcamento: _Orcamento | None = None,
+                    caches: Caches = Caches()) -> Iterator[Documento]:
+    """
+    Extrai os membros de um ZipFile aberto (ordem: XML, XLSX, PDF, ZIPs aninhados).
+
+    Os membros são lidos direto do ZipFile, um por vez: XMLs pequenos vão
+    para memória, XMLs grandes são lidos em streaming e os demais formatos
+    passam por um arquivo temporário (ver ``_spool_membro``). O total
+    descompactado é limitado por ``orcamento``, compartilhado com os ZIPs
+    aninhados.
+    """
+    if orcamento is None:
+        orcamento = _Orcamento(LIMITE_DESCOMPACTADO_POR_ZIP)
+
+    membros = _membros_zip(z, nome_zip_raiz, ignoradas)
+    xmls, xlsxs, pdfs, zips = membros['.xml'], membros['.xlsx'], membros['.pdf'], membros['.zip']
+
+    # --- XMLs ---
+    for info in xmls:
+        origem = f"{nome_zip_raiz}::{info.filename}"
+        orcamento.consumir(info, origem)
+        with z.open(info) as f:
+            if info.file_size > LIMITE_XML_STREAMING:
+                yield from _documentos_xml(f, origem)
+                continue
+            with medir('descompactacao'):
+                conteudo = f.read()
+        yield from _documentos_xml(conteudo, origem)
+
+    # --- XLSXs (Citizen) ---
+    for info in xlsxs:
+        origem = f"{nome_zip_raiz}::{info.filename}"
+        orcamento.consumir(info, origem)
+        with _spool_membro(z, info.filename) as spool:
+            yield from _documentos_xlsx(spool, origem, conhecida, caches.xlsx)
+
+    # --- PDFs (deduplicação por chave, sem pular em bloco) ---
+    for info in pdfs:
+        origem = f"{nome_zip_raiz}::{info.filename}"
+        orcamento.consumir(info, origem)
+        with _spool_membro(z, info.filename) as spool:
+            yield from _documentos_pdf(spool, origem, conhecida, caches.pdf)
+
+    # --- ZIPs aninhados (recursão) ---
+    for info in zips:
+        origem = f"{nome_zip_raiz}::{info.filename}"
+        orcamento.consumir(info, origem)
+        spool = _spool_membro(z, info.filename)
+        try:
+            inner_z = zipfile.ZipFile(spool)
+        except Exception as e:
+            spool.close()
+            print(f"[ERRO ZIP aninhado] {info.filename}: {e}")
+            continue
+        with spool, inner_z:
+            print(f"  [ZIP aninhado] abrindo {origem}")
+            yield from _documentos_zip(inner_z, origem, conhecida, ignoradas, orcamento, caches)
+
+
+def _documentos_arquivo(caminho: Path, conhecida: Callable[[str, str], bool],
+                        ignoradas: frozenset[str] = frozenset(),
+                        caches: Caches = Caches(), nome: str | None = None) -> Iterator[Documento]:
+    """
+    Extrai um arquivo avulso da pasta de notas, escolhendo o parser pela
+    extensão. ``nome`` identifica o arquivo nas origens (o caminho relativo à
+    pasta de notas); por padrão, o nome do arquivo.
+    """
+    caminho = Path(caminho)
+    sufixo = caminho.suffix.lower()
+    nome = nome or caminho.name
+    if nome in ignoradas:
+        return
+    if sufixo == '.pdf':
+        yield from _documentos_pdf(caminho, nome, conhecida, caches.pdf)
+        return
+    try:
+        if sufixo == '.xml':
+            if caminho.stat().st_size > LIMITE_XML_STREAMING:
+                yield from _documentos_xml(caminho, nome)
+            else:
+                with medir('leitura'):
+                    conteudo = caminho.read_bytes()
+                yield from _documentos_xml(conteudo, nome)
+        elif sufixo == '.xlsx':
+            with medir('leitura'):
+                conteudo = caminho.read_bytes()
+            yield from _documentos_xlsx(conteudo, nome, conhecida, caches.xlsx)
+        elif sufixo == '.zip':
+            with zipfile.ZipFile(caminho, 'r') as z:
+                yield from _documentos_zip(z, nome, conhecida, ignoradas, caches=caches)
+    except Exception as e:
+        print(f"[ERRO {sufixo[1:].upper()}] {nome}: {e}")
+
+
+def _extrair_arquivo(caminho: Path, conhecidas: dict[str, str | None],
+                     ignoradas: frozenset[str] = frozenset(),
+                     caches: Caches = Caches(),
+                     vencedoras: dict[str, str] | None = None,
+                     nome: str | None = None) -> tuple[list[Documento], dict[str, float], float]:
+    """
+    Ponto de entrada dos processos do pool: extrai todos os documentos de um
+    arquivo e devolve ``(documentos, tempos_por_etapa, segundos)``.
+    ``conhecidas`` mapeia cada chave já registrada para o formato de origem
+    na base anterior, ou None se foi registrada nesta execução (e não pode
+    mais ser substituída). As chaves vistas dentro do próprio arquivo
+    também contam (ex.: DANFE que acompanha o XML no mesmo ZIP), assim como
+    as que a pré-sondagem reservou para um formato melhor (``vencedoras``).
+    """
+    vistas = dict(conhecidas)
+    vencedoras = vencedoras or {}
+
+    def _conhecida(chave: str, formato: str) -> bool:
+        vencedora = vencedoras.get(chave)
+        if vencedora is not None and _prevalece(vencedora, formato):
+            return True
+        if chave not in vistas:
+            return False
+        anterior = vistas[chave]
+        return anterior is None or not _prevalece(formato, anterior)
+
+    coletar()
+    inicio = time.perf_counter()
+    documentos = []
+    for doc in _documentos_arquivo(caminho, _conhecida, ignoradas, caches, nome):
+        documentos.append(doc)
+        if doc.chave:
+            vistas[doc.chave] = None
+    return documentos, coletar(), time.perf_counter() - inicio
+
+
+# ── Pré-sondagem de chaves (sem estado) ───────────────────────────────────────
+# Antes da extração, cada arquivo é percorrido atrás apenas das chaves de
+# acesso das notas que contém: o Id de <infNFe> nos bytes do XML, a coluna
+# 'Chave' da planilha Citizen e a sonda de chave do PDF. Com todas as chaves
+# em mãos, ProcessadorDeCupons._resolver_vencedoras escolhe uma origem por
+# nota, e as demais cópias não chegam a ser lidas por inteiro.
+
+class Ocorrencia(NamedTuple):
+    """Uma nota encontrada na pré-sondagem; ``chave`` é None se não foi possível identificá-la."""
+    origem: str
+    formato: str
+    chave: str | None
+
+
+def _chave_sondada_pdf(fonte, cache: CacheTextoPdf | None = None) -> str | None:
+    """
+    Chave de um DANFE: do cache, se o PDF já foi lido, ou pela sonda (com o
+    texto da primeira página como último recurso). O resultado vai para o
+    cache sem as páginas, que só são extraídas se o PDF for mesmo lido.
+    """
+    digest = sha256_da_fonte(fonte) if cache else None
+    entrada = cache.obter(digest) if cache else None
+    if entrada is not None:
+        return entrada['chave']
+    with pdfplumber.open(fonte) as pdf:
+        chave = sondar_chave_pdf(pdf)
+        if chave is None and pdf.pages:
+            chave = ProcessadorDeCupons._extrair_chave_pdf(pdf.pages[0].extract_text() or '')
+    if cache:
+        cache.gravar(digest, chave, None)
+    return chave
+
+
+def _chaves_sondadas_xlsx(fonte, cache: CacheXlsx | None = None) -> list[str | None]:
+    """
+    Chaves de uma planilha Citizen, na ordem das notas: do cache de XLSX, se
+    a planilha já foi lida, ou apenas da coluna 'Chave'.
+    """
+    tabela = cache.obter(sha256_da_fonte(fonte)) if cache is not None else None
+    chaves = tabela[0] if tabela is not None else sondar_chaves_citizen(fonte)
+    return [chave if len(chave) == 44 else None for chave in chaves]
+
+
+def _sondar_zip(z: zipfile.ZipFile, nome_zip_raiz: str, ignoradas: frozenset[str],
+                orcamento: _Orcamento, caches: Caches) -> Iterator[Ocorrencia]:
+    """Ocorrências dos membros de um ZipFile aberto, na mesma ordem de ``_documentos_zip``."""
+    membros = _membros_zip(z, nome_zip_raiz, ignoradas)
+    for formato in ('.xml', '.xlsx', '.pdf'):
+        for info in membros[formato]:
+            origem = f"{nome_zip_raiz}::{info.filename}"
+            orcamento.consumir(info, origem)
+            chaves: list[str | None] = []
+            try:
+                if formato == '.xml':
+                    with z.open(info) as f:
+                        chaves = sondar_chaves_xml(f)
+                elif formato == '.xlsx':
+                    with _spool_membro(z, info.filename) as spool:
+                        chaves = _chaves_sondadas_xlsx(spool, caches.xlsx)
+                elif formato == '.pdf':
+                    with _spool_membro(z, info.filename) as spool:
+                        chaves = [_chave_sondada_pdf(spool, caches.pdf)]
+            except Exception:
+                chaves = []
+            for chave in chaves or [None]:
+                yield Ocorrencia(origem, formato, chave)
+
+    for info in membros['.zip']:
+        origem = f"{nome_zip_raiz}::{info.filename}"
+        orcamento.consumir(info, origem)
+        spool = _spool_membro(z, info.filename)
+        try:
+            inner_z = zipfile.ZipFile(spool)
+        except Exception:
+            spool.close()
+            continue
+        with spool, inner_z:
+            yield from _sondar_zip(inner_z, origem, ignoradas, orcamento, caches)
+
+
+def _sondar_arquivo(caminho: Path, ignoradas: frozenset[str] = frozenset(),
+                    caches: Caches = Caches(), nome: str | None = None) -> tuple[list[Ocorrencia] | None, float]:
+    """
+    Pré-sondagem de um arquivo da pasta (também executada nos processos do
+    pool): as notas que ele contém, por origem, sem extrair itens. Devolve
+    ``(ocorrencias, segundos)``; ``ocorrencias`` é None se o arquivo não pôde
+    ser sondado — nesse caso nada nele é descartado.
+
+    Uma origem sem nenhuma chave identificada (XML sem <infNFe>, planilha sem
+    a aba 'Notas Fiscais', PDF sem chave) aparece com ``chave=None`` e é
+    sempre lida.
+    """
+    caminho = Path(caminho)
+    sufixo = caminho.suffix.lower()
+    nome = nome or caminho.name
+    inicio = time.perf_counter()
+    ocorrencias: list[Ocorrencia] | None = []
+    try:
+        if nome in ignoradas:
+            pass
+        elif sufixo == '.xml':
+            fonte = caminho if caminho.stat().st_size > LIMITE_XML_STREAMING else caminho.read_bytes()
+            ocorrencias = [Ocorrencia(nome, '.xml', c) for c in sondar_chaves_xml(fonte) or [None]]
+        elif sufixo == '.xlsx':
+            ocorrencias = [Ocorrencia(nome, '.xlsx', c) for c in _chaves_sondadas_xlsx(caminho, caches.xlsx) or [None]]
+        elif sufixo == '.pdf':
+            ocorrencias = [Ocorrencia(nome, '.pdf', _chave_sondada_pdf(caminho, caches.pdf))]
+        elif sufixo == '.zip':
+            with zipfile.ZipFile(caminho, 'r') as z:
+                orcamento = _Orcamento(LIMITE_DESCOMPACTADO_POR_ZIP)
+                ocorrencias = list(_sondar_zip(z, nome, ignoradas, orcamento, caches))
+    except Exception:
+        ocorrencias = None
+    # A sondagem conta inteira como a etapa 'presondagem', não nas etapas internas
+    coletar()
+    return ocorrencias, time.perf_counter() - inicio
+
 
 class ProcessadorDeCupons:
     def __init__(self):
-        self.dados_consolidados = []
+        self.dados_consolidados = AcumuladorItens()
         # Conjunto de chaves de acesso NF-e já processadas (44 dígitos).
         # Evita duplicidade quando o mesmo documento existe como XML e como PDF.
         self._chaves_processadas: set[str] = set()
+        # Modo incremental: linhas já exportadas de arquivos inalterados, que são
+        # mescladas aos itens novos em exportar_csv().
+        self._base_anterior: pd.DataFrame | None = None
+        # Índice persistente das chaves já ingeridas (execuções anteriores e atual)
+        self._indice: IndiceChaves | None = None
+        # Chaves da base anterior substituídas por uma fonte de maior prioridade
+        self._chaves_substituidas: set[str] = set()
+        self._manifesto: ManifestoIngestao | None = None
+        # Caches de conversão de PDF e XLSX (ligados por varrer_diretorio)
+        self._caches = Caches()
+        # Linhas do CSV anterior antes do filtro de arquivos inalterados
+        self._linhas_anteriores = 0
+        # Itens acrescentados na última exportação (depois da base anterior)
+        self._novos_exportados = pd.DataFrame()
+        # Tempos por etapa e por arquivo (relatório metricas_ingestao.json)
+        self.metricas = MetricasIngestao()
+        # Aviso de progresso por arquivo: progresso(nome, concluidos, total, itens)
+        self._progresso: Callable[[str, int, int, int], None] | None = None
+        self._concluidos = 0
+        # Arquivos lidos na última varredura (novos ou alterados)
+        self._arquivos_lidos: list[str] = []
+        # Pré-sondagem: notas encontradas em cada arquivo, a origem escolhida
+        # para cada chave e o tempo gasto por arquivo
+        self._sondagem: dict[ArquivoEntrada, list[Ocorrencia]] = {}
+        self._vencedoras: dict[str, Ocorrencia] = {}
+        self._segundos_sondagem: dict[ArquivoEntrada, float] = {}
+        # Origens descartadas pela pré-sondagem, por arquivo
+        self._descartadas: dict[ArquivoEntrada, frozenset[str]] = {}
+        # Checkpoint da varredura em andamento (ligado por varrer_diretorio)
+        self._checkpoint: CheckpointIngestao | None = None
+
+    def fechar(self) -> None:
+        """
+        Fecha a conexão com o índice de chaves. Alterações que
+        :meth:`exportar_csv` não chegou a salvar são descartadas.
+        """
+        if self._indice is not None:
+            self._indice.fechar()
+            self._indice = None
+
+    def __enter__(self) -> 'ProcessadorDeCupons':
+        return self
 
-    def _converter_valor(self, valor_str):
+    def __exit__(self, tipo, valor, rastro) -> None:
+        self.fechar()
+
+    def _chave_duplicada(self, chave: str, formato: str) -> bool:
+        """
+        Indica se a chave NF-e já foi registrada, nesta execução ou na base
+        anterior. Se a nota anterior veio de um formato de menor prioridade
+        (ex.: PDF) e agora chega em um formato melhor (ex.: XML), a nota
+        anterior é descartada e a nova prevalece.
+        """
+        if self._chave_conhecida(chave, formato):
+            return True
+        if self._indice is not None and chave in self._indice:
+            self._chaves_substituidas.add(chave)
+        return False
+
+    def _chave_conhecida(self, chave: str, formato: str = '.pdf') -> bool:
+        """
+        Dica para pular a extração: a chave já foi registrada nesta execução,
+        ou na base anterior a partir de um formato que ``formato`` não supera,
+        ou a pré-sondagem a encontrou em um formato melhor.
+        """
+        if chave in self._chaves_processadas:
+            return True
+        vencedora = self._vencedoras.get(chave)
+        if vencedora is not None and _prevalece(vencedora.formato, formato):
+            return True
+        anterior = self._indice.origem(chave) if self._indice is not None else None
+        return anterior is not None and not _prevalece(formato, anterior['formato'])
+
+    def _registrar_documentos(self, documentos: Iterable[Documento]) -> int:
+        """
+        Aplica a deduplicação por chave NF-e, na ordem recebida, e acumula os
+        itens em dados_consolidados. Retorna a quantidade de itens adicionados.
+        """
+        total = 0
+        for doc in documentos:
+            with medir('deduplicacao'):
+                total += self._registrar_documento(doc)
+        return total
+
+    def _registrar_documento(self, doc: Documento) -> int:
+        rotulo = doc.formato[1:].upper()
+        if doc.chave:
+            if doc.itens is None or self._chave_duplicada(doc.chave, doc.formato):
+                print(f"  [SKIP {rotulo}] {doc.origem}: chave {doc.chave[:8]}... já processada")
+                if self._indice is not None:
+                    self._indice.registrar_copia(doc.chave, doc.origem, doc.formato)
+                if self._checkpoint is not None:
+                    self._checkpoint.documento(doc.origem, chave=doc.chave, formato=doc.formato, copia=True)
+                return 0
+            self._chaves_processadas.add(doc.chave)
+            if self._indice is not None:
+                self._indice.registrar(doc.chave, doc.origem, doc.formato, len(doc.itens))
+        if self._checkpoint is not None:
+            self._checkpoint.documento(doc.origem, doc.itens, doc.chave, doc.formato,
+                                       doc.chave in self._chaves_substituidas)
+        self.dados_consolidados.extend(doc.itens)
+        print(f"  [{rotulo}] {doc.origem}: {len(doc.itens)} item(s)")
+        return len(doc.itens)
+
+    @staticmethod
+    def _converter_valor(valor_str):
         if not valor_str: return 0.0
         limpo = valor_str.replace('.', '').replace(',', '.')
         try:
@@ -20,7 +706,8 @@ class ProcessadorDeCupons:
         except ValueError:
             return 0.0
 
-    def _extrair_chave_pdf(self, texto: str) -> str | None:
+    @staticmethod
+    def _extrair_chave_pdf(texto: str) -> str | None:
         """
         Tenta localizar a chave de acesso NF-e (44 dígitos) dentro do texto
         extraído de um DANFE PDF. A chave pode estar formatada em blocos
@@ -32,41 +719,40 @@ class ProcessadorDeCupons:
         match = re.search(r'(?<![\d])(\d{44})(?![\d])', texto_sem_espacos)
         return match.group(1) if match else None
 
-    def _extrair_dados_do_pdf(self, pdf, nome_arquivo_origem):
-        texto_completo = ""
-        for page in pdf.pages:
-            texto_completo += page.extract_text() or ""
-
-        match_data = re.search(r'(\d{2}/\d{2}/\d{2,4})', texto_completo)
-        data_compra = match_data.group(1) if match_data else "Data Desconhecida"
+    @staticmethod
+    def _textos_do_pdf(pdf, textos_extraidos=None) -> list[str]:
+        """
+        Texto de cada página de um PDF aberto com pdfplumber. ``textos_extraidos``
+        ({índice_da_página: texto}) evita extrair de novo páginas já lidas.
+        """
+        textos_extraidos = textos_extraidos or {}
+        return [
+            (page.extract_text() or "") if textos_extraidos.get(i) is None else textos_extraidos[i]
+            for i, page in enumerate(pdf.pages)
+        ]
 
-        texto_linear = texto_completo.replace('\n', ' ').replace('\r', '')
+    @staticmethod
+    def _itens_do_texto_pdf(texto_completo: str, nome_arquivo_origem, chave_nfe=None) -> list[dict]:
+        """
+        Interpreta os itens a partir do texto completo (páginas separadas por
+        quebra de linha) de um DANFE — ver ``extratorPdf.iterar_itens_danfe``.
+        """
+        converter = ProcessadorDeCupons._converter_valor
 
-        regex_item = (
-            r'(?P<nome>.+?)'                
-            r'\(Código:\s*(?P<codigo>[A-Za-z]?\d+)\)' 
-            r'\s*Vl\. Total'                
-            r'\s*Qtde\.:\s*(?P<qtd>[\d,.]+)' 
-            r'\s*UN:\s*(?P<un>\w+)'         
-            r'\s*Vl\. Unit\.:\s*(?P<vunit>[\d,.]+)' 
-            r'\s*(?P<vtotal>[\d,.]+)'       
-        )
+        match_data = _DATA_DANFE.search(texto_completo)
+        data_compra = match_data.group(1) if match_data else "Data Desconhecida"
 
-        itens_encontrados = 0
-        for match in re.finditer(regex_item, texto_linear):
-            nome = match.group('nome').strip()
-            if "CNPJ" in nome or "Recife" in nome:
-                if "PE" in nome:
-                    nome = nome.split(" PE ")[-1].strip()
-            
-            codigo = match.group('codigo')
-            qtd = self._converter_valor(match.group('qtd'))
-            unidade = match.group('un')
-            preco_unit = self._converter_valor(match.group('vunit'))
-            preco_total = self._converter_valor(match.group('vtotal'))
+        itens = []
+        for item in iterar_itens_danfe(texto_completo):
+            nome = item['nome']
+            codigo = item['codigo']
+            qtd = converter(item['qtd'])
+            unidade = item['un']
+            preco_unit = converter(item['vunit'])
+            preco_total = converter(item['vtotal'])
 
             if preco_total > 0:
-                self.dados_consolidados.append({
+                itens.append({
                     'data': data_compra,
                     'produto': nome, # Nome original (sujo)
                     'endereco': '',
@@ -75,145 +761,161 @@ class ProcessadorDeCupons:
                     'preco_unit': preco_unit,
                     'preco_total': preco_total,
                     'codigo': codigo,
+                    'chave_nfe': chave_nfe or '',
                     'arquivo_origem': nome_arquivo_origem
                 })
-                itens_encontrados += 1
-        return itens_encontrados
+        return itens
 
     def processar_arquivo_pdf(self, caminho_arquivo):
-        try:
-            with pdfplumber.open(caminho_arquivo) as pdf:
-                # Extrai o texto da primeira página apenas para verificar a chave
-                texto_p1 = pdf.pages[0].extract_text() or '' if pdf.pages else ''
-                chave = self._extrair_chave_pdf(texto_p1)
-                if chave:
-                    if chave in self._chaves_processadas:
-                        print(f"  [SKIP PDF] {caminho_arquivo.name}: chave já processada via XML")
-                        return
-                    self._chaves_processadas.add(chave)
-                self._extrair_dados_do_pdf(pdf, caminho_arquivo.name)
-        except Exception as e:
-            print(f"[ERRO] {caminho_arquivo.name}: {e}")
+        """Processa um DANFE em PDF — pulado se a chave já foi registrada (ex.: via XML)."""
+        self._registrar_documentos(_documentos_pdf(caminho_arquivo, Path(caminho_arquivo).name, self._chave_conhecida,
+                                                    self._caches.pdf))
 
     def processar_arquivo_xml(self, caminho_arquivo):
         """Processa um único arquivo XML (NF-e / NFC-e) diretamente do disco."""
-        try:
-            conteudo = Path(caminho_arquivo).read_bytes()
-            chave = extrair_chave_do_xml(conteudo)
-            if chave:
-                if chave in self._chaves_processadas:
-                    print(f"  [SKIP XML] {caminho_arquivo.name}: chave duplicada, ignorado")
-                    return
-                self._chaves_processadas.add(chave)
-            itens = extrair_itens_do_xml(conteudo, caminho_arquivo.name)
-            self.dados_consolidados.extend(itens)
-            print(f"  [XML] {caminho_arquivo.name}: {len(itens)} item(s)")
-        except Exception as e:
-            print(f"[ERRO XML] {caminho_arquivo.name}: {e}")
+        self._registrar_documentos(_documentos_arquivo(Path(caminho_arquivo), self._chave_conhecida,
+                                                        caches=self._caches))
 
-    def _processar_xlsx_citizen(self, conteudo_bytes: bytes, nome_origem: str) -> int:
-        """Processa exportação de Notas Fiscais do app Citizen (XLSX).
+    @staticmethod
+    def _notas_do_xlsx_citizen(fonte, nome_origem: str,
+                               conhecida: Callable[[str, str], bool] | None = None,
+                               cache: CacheXlsx | None = None
+                               ) -> list[tuple[str, list[dict] | None]]:
+        """
+        Lê a aba 'Notas Fiscais' de uma exportação do app Citizen (bytes,
+        caminho ou arquivo binário) e devolve ``[(chave, itens), ...]`` na
+        ordem em que as notas aparecem.
 
-        Espera uma aba 'Notas Fiscais' com cabeçalho contendo a coluna 'Chave'.
-        Usa a chave NF-e (44 dígitos) para deduplicação global.
-        Retorna a quantidade de itens adicionados.
+        A tabela normalizada vem de ``cache`` quando a mesma planilha (mesmo
+        SHA-256) já foi lida; senão é montada por ``_tabela_citizen`` e
+        gravada no cache. As linhas das notas para as quais
+        ``conhecida(chave, '.xlsx')`` é verdadeiro são descartadas antes de
+        montar os itens (anti-join) e a nota sai com ``itens=None``.
         """
-        try:
-            import io as _io
-            df_sheets = pd.read_excel(_io.BytesIO(conteudo_bytes), sheet_name=None)
-            sheet = df_sheets.get('Notas Fiscais')
-            if sheet is None:
-                return 0
+        if isinstance(fonte, bytes):
+            fonte = io.BytesIO(fonte)
 
-            # Localiza a linha que contém o cabeçalho ('Chave' deve estar presente)
-            header_row = None
-            for i, row in sheet.iterrows():
-                if 'Chave' in row.values:
-                    header_row = i
-                    break
-            if header_row is None:
-                return 0
+        tabela = None
+        if cache is not None:
+            digest = sha256_da_fonte(fonte)
+            tabela = cache.obter(digest)
+            cache.referenciar(nome_origem, digest)
+        if tabela is None:
+            tabela = ProcessadorDeCupons._tabela_citizen(fonte)
+            if cache is not None:
+                cache.gravar(digest, *tabela)
+        chaves, itens = tabela
 
-            sheet.columns = sheet.iloc[header_row].tolist()
-            sheet = sheet.iloc[header_row + 1:].reset_index(drop=True)
+        descartadas = {
+            n for n, chave in enumerate(chaves)
+            if conhecida is not None and len(chave) == 44 and conhecida(chave, '.xlsx')
+        }
+        if descartadas:
+            itens = itens[~itens['_nota'].isin(descartadas)]
+        itens_por_nota: list[list[dict] | None] = [
+            None if n in descartadas else [] for n in range(len(chaves))
+        ]
+        registros = itens.drop(columns='_nota').assign(arquivo_origem=nome_origem).to_dict('records')
+        for n, item in zip(itens['_nota'].tolist(), registros):
+            itens_por_nota[n].append(item)
+        return list(zip(chaves, itens_por_nota))
+
+    @staticmethod
+    def _tabela_citizen(fonte) -> tuple[list[str], pd.DataFrame]:
+        """
+        Lê e normaliza uma planilha Citizen. Retorna as chaves das notas, na
+        ordem em que aparecem, e a tabela dos itens válidos (sem
+        ``arquivo_origem``) com a coluna ``_nota`` — a posição da chave.
+
+        A planilha é lida em blocos (``extratorXlsx.iterar_blocos_citizen``) e
+        cada bloco é convertido de uma vez, coluna a coluna; uma nota pode se
+        estender por vários blocos.
+        """
+        # Uma nota por valor de 'Chave', na ordem da primeira ocorrência (como groupby(sort=False))
+        indice_por_valor: dict = {}
+        chaves: list[str] = []
+        blocos = []
+        for sheet in iterar_blocos_citizen(fonte):
             sheet = sheet.dropna(subset=['Chave', 'Descricao'])
             # Mantém apenas linhas de DocumentoFiscal (ignora despesas manuais)
             if 'TipoDespesa' in sheet.columns:
                 sheet = sheet[sheet['TipoDespesa'] == 'DocumentoFiscal']
+            if sheet.empty:
+                continue
 
-            count = 0
-            for chave_val, grupo in sheet.groupby('Chave', sort=False):
-                chave_str = str(chave_val).strip()
-                if len(chave_str) == 44 and chave_str in self._chaves_processadas:
-                    print(f"  [SKIP XLSX] chave {chave_str[:8]}...: já processada")
-                    continue
-                if len(chave_str) == 44:
-                    self._chaves_processadas.add(chave_str)
-
-                for _, row in grupo.iterrows():
-                    loja = str(row.get('NomeFantasia', '') or '').strip()
-                    if not loja or loja == 'nan':
-                        loja = str(row.get('RazaoSocial', '') or '').strip()
-
-                    logradouro = str(row.get('Endereco', '') or row.get('Logradouro', '') or '').strip()
-                    numero = str(row.get('Numero', '') or row.get('Nro', '') or '').strip()
-                    bairro = str(row.get('Bairro', '') or '').strip()
-                    cidade = str(row.get('Cidade', '') or row.get('Municipio', '') or '').strip()
-                    uf = str(row.get('UF', '') or row.get('Estado', '') or '').strip()
-                    cep = str(row.get('CEP', '') or '').strip()
-
-                    parte_logradouro = ', '.join([p for p in [logradouro, numero] if p and p != 'nan'])
-                    parte_cidade = ' - '.join([p for p in [cidade, uf] if p and p != 'nan'])
-                    parte_cep = f"CEP {cep}" if cep and cep != 'nan' else ''
-                    endereco = ', '.join([p for p in [parte_logradouro, bairro, parte_cidade, parte_cep] if p and p != 'nan'])
-
-                    try:
-                        qtd = float(str(row.get('Quantidade', 0)).replace(',', '.'))
-                    except (ValueError, TypeError):
-                        qtd = 0.0
-
-                    try:
-                        preco_unit = float(row.get('ValorUnitarioProduto', 0) or 0)
-                    except (ValueError, TypeError):
-                        preco_unit = 0.0
-
-                    try:
-                        preco_total = float(row.get('ValorTotalProduto', 0) or 0)
-                    except (ValueError, TypeError):
-                        preco_total = 0.0
-
-                    if preco_total <= 0:
-                        continue
-
-                    data = str(row.get('DataEmissao', '')).strip()
-                    # Normaliza para dd/mm/yyyy se vier em yyyy-mm-dd
-                    if re.match(r'\d{4}-\d{2}-\d{2}', data):
-                        data = f"{data[8:10]}/{data[5:7]}/{data[:4]}"
-
-                    self.dados_consolidados.append({
-                        'data': data,
-                        'loja': loja,
-                        'cnpj': str(row.get('CNPJ', '') or '').strip(),
-                        'endereco': endereco,
-                        'produto': str(row.get('Descricao', '')).strip(),
-                        'qtd': qtd,
-                        'unidade': str(row.get('Unidade', '') or '').strip(),
-                        'preco_unit': preco_unit,
-                        'preco_total': preco_total,
-                        'codigo': '',
-                        'ean': '',
-                        'ncm': str(row.get('NCM', '') or '').strip(),
-                        'chave_nfe': chave_str,
-                        'arquivo_origem': nome_origem,
-                    })
-                    count += 1
-
-            return count
-        except Exception as e:
-            print(f"[ERRO XLSX] {nome_origem}: {e}")
-            return 0
+            codigos, valores_chave = pd.factorize(sheet['Chave'], sort=False)
+            notas_do_bloco = []
+            for valor in valores_chave:
+                nota = indice_por_valor.get(valor)
+                if nota is None:
+                    nota = indice_por_valor[valor] = len(chaves)
+                    chaves.append(str(valor).strip())
+                notas_do_bloco.append(nota)
+            notas = np.asarray(notas_do_bloco, dtype=np.intp)[codigos]
+            blocos.append(ProcessadorDeCupons._itens_do_bloco_citizen(sheet, notas, chaves))
+
+        if not blocos:
+            return chaves, pd.DataFrame(columns=_COLUNAS_CITIZEN + ['_nota'])
+        return chaves, pd.concat(blocos, ignore_index=True)
+
+    @staticmethod
+    def _itens_do_bloco_citizen(sheet: pd.DataFrame, notas: np.ndarray, chaves: list[str]) -> pd.DataFrame:
+        """
+        Converte um bloco de linhas Citizen em itens, coluna a coluna, com o
+        mesmo resultado da leitura célula a célula. ``notas`` indica, por
+        linha, a posição da chave em ``chaves``. Retorna apenas as linhas com
+        valor total positivo.
+        """
+        loja = _texto_coluna(sheet, 'NomeFantasia')
+        loja = loja.where((loja != '') & (loja != 'nan'), _texto_coluna(sheet, 'RazaoSocial'))
+
+        parte_logradouro = _juntar_partes([_texto_coluna(sheet, 'Endereco', 'Logradouro'),
+                                           _texto_coluna(sheet, 'Numero', 'Nro')], ', ')
+        parte_cidade = _juntar_partes([_texto_coluna(sheet, 'Cidade', 'Municipio'),
+                                       _texto_coluna(sheet, 'UF', 'Estado')], ' - ')
+        cep = _texto_coluna(sheet, 'CEP')
+        parte_cep = ('CEP ' + cep).where((cep != '') & (cep != 'nan'), '')
+        endereco = _juntar_partes([parte_logradouro, _texto_coluna(sheet, 'Bairro'), parte_cidade, parte_cep], ', ')
+
+        quantidade = sheet['Quantidade'] if 'Quantidade' in sheet.columns else pd.Series(0, index=sheet.index)
+        qtd = _float_coluna(_str_coluna(quantidade).str.replace(',', '.', regex=False))
+        preco_unit = _float_coluna(_valor_ou(sheet, 'ValorUnitarioProduto', 0))
+        preco_total = _float_coluna(_valor_ou(sheet, 'ValorTotalProduto', 0))
+
+        data = _str_coluna(_valor_ou(sheet, 'DataEmissao', '', coalescer=False)).str.strip()
+        # Normaliza para dd/mm/yyyy se vier em yyyy-mm-dd
+        iso = data.str.match(r'\d{4}-\d{2}-\d{2}')
+        data = data.where(~iso, data.str[8:10] + '/' + data.str[5:7] + '/' + data.str[:4])
 
-    def _processar_membros_zip(self, z: zipfile.ZipFile, nome_zip_raiz: str) -> None:
+        itens_df = pd.DataFrame({
+            'data': data,
+            'loja': loja,
+            'cnpj': _texto_coluna(sheet, 'CNPJ'),
+            'endereco': endereco,
+            'produto': _str_coluna(sheet['Descricao']).str.strip(),
+            'qtd': qtd,
+            'unidade': _texto_coluna(sheet, 'Unidade'),
+            'preco_unit': preco_unit,
+            'preco_total': preco_total,
+            'codigo': '',
+            'ean': '',
+            'ncm': _texto_coluna(sheet, 'NCM'),
+            'chave_nfe': pd.Series([chaves[n] for n in notas], index=sheet.index, dtype=object),
+            '_nota': notas,
+        }, index=sheet.index)
+        return itens_df[~(preco_total <= 0).to_numpy()]
+
+    def _processar_xlsx_citizen(self, conteudo_bytes: bytes, nome_origem: str) -> int:
+        """Processa exportação de Notas Fiscais do app Citizen (XLSX).
+
+        Espera uma aba 'Notas Fiscais' com cabeçalho contendo a coluna 'Chave'.
+        Usa a chave NF-e (44 dígitos) para deduplicação global.
+        Retorna a quantidade de itens adicionados.
+        """
+        return self._registrar_documentos(_documentos_xlsx(conteudo_bytes, nome_origem, cache=self._caches.xlsx))
+
+    def _processar_membros_zip(self, z: zipfile.ZipFile, nome_zip_raiz: str,
+                               membros_ignorados: frozenset[str] = frozenset()) -> None:
         """Processa todos os membros de um ZipFile aberto.
 
         Estratégia:
@@ -222,169 +924,671 @@ class ProcessadorDeCupons:
         3. PDFs — cada um verificado individualmente pela chave extraída;
            só são pulados se a chave já foi registrada (ex.: DANFE de um XML).
         4. ZIPs aninhados — processados recursivamente.
+
+        ``membros_ignorados`` lista membros já ingeridos em execução anterior
+        (CRC inalterado segundo o manifesto), que não são lidos novamente.
         """
-        import io as _io
+        ignoradas = frozenset(f"{nome_zip_raiz}::{m}" for m in membros_ignorados)
+        self._registrar_documentos(_documentos_zip(z, nome_zip_raiz, self._chave_conhecida, ignoradas,
+                                                   caches=self._caches))
 
-        entradas = [
-            n for n in z.namelist()
-            if not n.startswith('__MACOSX') and not n.endswith('/')
-        ]
-        xmls  = [n for n in entradas if n.lower().endswith('.xml')]
-        pdfs  = [n for n in entradas if n.lower().endswith('.pdf')]
-        xlsxs = [n for n in entradas if n.lower().endswith('.xlsx')]
-        zips  = [n for n in entradas if n.lower().endswith('.zip')]
-
-        # --- XMLs ---
-        for nome_xml in xmls:
-            with z.open(nome_xml) as f:
-                conteudo = f.read()
-            chave = extrair_chave_do_xml(conteudo)
-            origem = f"{nome_zip_raiz}::{nome_xml}"
-            if chave:
-                if chave in self._chaves_processadas:
-                    print(f"  [SKIP XML] {origem}: chave duplicada")
-                    continue
-                self._chaves_processadas.add(chave)
-            itens = extrair_itens_do_xml(conteudo, origem)
-            self.dados_consolidados.extend(itens)
-            print(f"  [XML] {origem}: {len(itens)} item(s)")
-
-        # --- XLSXs (Citizen) ---
-        for nome_xlsx in xlsxs:
-            with z.open(nome_xlsx) as f:
-                conteudo = f.read()
-            origem = f"{nome_zip_raiz}::{nome_xlsx}"
-            n = self._processar_xlsx_citizen(conteudo, origem)
-            print(f"  [XLSX] {origem}: {n} item(s)")
-
-        # --- PDFs (deduplicação por chave, sem pular em bloco) ---
-        for nome_pdf in pdfs:
-            with z.open(nome_pdf) as f:
-                pdf_bytes = f.read()
-            origem = f"{nome_zip_raiz}::{nome_pdf}"
-            try:
-                with pdfplumber.open(_io.BytesIO(pdf_bytes)) as pdf:
-                    texto_p1 = pdf.pages[0].extract_text() or '' if pdf.pages else ''
-                    chave = self._extrair_chave_pdf(texto_p1)
-                    if chave:
-                        if chave in self._chaves_processadas:
-                            print(f"  [SKIP PDF] {origem}: chave já processada")
-                            continue
-                        self._chaves_processadas.add(chave)
-                    n = self._extrair_dados_do_pdf(pdf, origem)
-                    if n > 0:
-                        print(f"  [PDF] {origem}: {n} item(s)")
-            except Exception as e:
-                print(f"[ERRO PDF] {origem}: {e}")
-
-        # --- ZIPs aninhados (recursão) ---
-        for nome_zip in zips:
-            with z.open(nome_zip) as f:
-                try:
-                    inner_bytes = _io.BytesIO(f.read())
-                    with zipfile.ZipFile(inner_bytes) as inner_z:
-                        print(f"  [ZIP aninhado] abrindo {nome_zip_raiz}::{nome_zip}")
-                        self._processar_membros_zip(inner_z, f"{nome_zip_raiz}::{nome_zip}")
-                except Exception as e:
-                    print(f"[ERRO ZIP aninhado] {nome_zip}: {e}")
-
-    def processar_zip(self, caminho_zip):
+    def processar_zip(self, caminho_zip, membros_ignorados: frozenset[str] = frozenset()):
         """Processa um ZIP podendo conter PDFs, XMLs, XLSXs e ZIPs aninhados."""
+        caminho_zip = Path(caminho_zip)
+        ignoradas = frozenset(f"{caminho_zip.name}::{m}" for m in membros_ignorados)
+        self._registrar_documentos(_documentos_arquivo(caminho_zip, self._chave_conhecida, ignoradas, self._caches))
+
+    def _carregar_base_anterior(self, caminho_csv: Path, mantida: Callable[[str], bool]) -> bool:
+        """
+        Recarrega o CSV exportado anteriormente, mantendo apenas as linhas cujo
+        arquivo de origem não mudou (segundo o filtro ``mantida``). O nome do
+        produto volta ao valor bruto (``produto_raw``) para que o dicionário
+        seja reaplicado sobre a base inteira na exportação. Retorna False se o
+        CSV não puder ser lido (o chamador então reprocessa tudo).
+        """
         try:
-            with zipfile.ZipFile(caminho_zip, 'r') as z:
-                self._processar_membros_zip(z, caminho_zip.name)
+            df = pd.read_csv(caminho_csv, sep=';', decimal=',', encoding='utf-8-sig',
+                             dtype={c: str for c in _COLUNAS_TEXTO})
+            origens = df['arquivo_origem'].fillna('')
         except Exception as e:
-            print(f"[ERRO ZIP] {caminho_zip.name}: {e}")
+            print(f"[AVISO] Base anterior ilegível ({e}); reprocessando tudo.")
+            return False
 
-    def varrer_diretorio(self, pasta_alvo):
-        pasta = Path(pasta_alvo)
-        arquivos = list(pasta.glob('*'))
-        print(f"Lendo {len(arquivos)} arquivos em: {pasta}")
+        self._linhas_anteriores = len(df)
+        df['arquivo_origem'] = origens
+        df = df[df['arquivo_origem'].map(mantida)].reset_index(drop=True)
+        if 'produto_raw' in df.columns:
+            df['produto'] = df['produto_raw']
+        df = df.drop(columns=[c for c in ['produto_raw', 'categoria'] if c in df.columns])
+        self._base_anterior = df
+        print(f"Base anterior: {len(df)} item(ns) mantido(s) de arquivos inalterados")
+        return True
 
-        # Passo 1: ZIPs e XMLs avulsos primeiro (registram as chaves)
+    def _planejar_ingestao(self, arquivos: Iterable[ArquivoEntrada], completo: bool,
+                           incluir: Iterable[str] = (), excluir: Iterable[str] = ()
+                           ) -> dict[ArquivoEntrada, frozenset[str]]:
+        """
+        Compara os arquivos da pasta com o manifesto da última execução.
+
+        Retorna ``{arquivo: origens_ignoradas}`` apenas para os arquivos que
+        precisam ser lidos (novos ou alterados); as origens ignoradas são os
+        membros de ZIP inalterados (``zip::membro``). Em modo completo, ou quando o
+        CSV anterior ou o índice de chaves não existem (ou o CSV está ilegível),
+        todos os arquivos são considerados novos.
+
+        ``arquivos`` já vem filtrado por ``incluir``/``excluir``. Os filtros só
+        restringem a leitura: os arquivos do manifesto fora deles continuam
+        como estão — entrada no manifesto, linhas na base, chaves no índice e
+        caches —, também em modo completo.
+        """
+        pasta_saida = _pasta_saida()
+        caminho_csv = pasta_saida / NOME_CSV
+        caminho_indice = pasta_saida / NOME_INDICE
+        if not caminho_csv.exists() or not caminho_indice.exists():
+            registrado = ManifestoIngestao()
+        else:
+            registrado = ManifestoIngestao.carregar(pasta_saida / NOME_MANIFESTO)
+        anterior = ManifestoIngestao() if completo else registrado
+        self._manifesto = ManifestoIngestao(pasta_saida / NOME_MANIFESTO)
+        self._indice = IndiceChaves(caminho_indice)
+
+        mantidos: dict[str, set[str] | None] = {}
+        if incluir or excluir:
+            for nome, entrada in registrado.entradas.items():
+                if not casa_filtros(nome, incluir, excluir):
+                    self._manifesto.entradas[nome] = entrada
+                    mantidos[nome] = None
+        fora_dos_filtros = set(mantidos)
+
+        todos: dict[str, ArquivoEntrada] = {}
+        a_processar: dict[ArquivoEntrada, frozenset[str]] = {}
         for arquivo in arquivos:
-            if arquivo.suffix.lower() == '.xml':
-                self.processar_arquivo_xml(arquivo)
-            elif arquivo.suffix.lower() == '.zip':
-                self.processar_zip(arquivo)
+            nome = arquivo.relativo
+            todos[nome] = arquivo
+            situacao, entrada = anterior.verificar(nome, arquivo.caminho, (arquivo.tamanho, arquivo.mtime_ns))
+            self._manifesto.entradas[nome] = entrada
+            if situacao == 'inalterado':
+                mantidos[nome] = None
+                continue
+            membros = anterior.membros_inalterados(nome, entrada) if situacao == 'alterado' else set()
+            if membros:
+                mantidos[nome] = membros
+            a_processar[arquivo] = frozenset(f"{nome}::{m}" for m in membros)
+
+        if anterior.entradas or mantidos:
+            mantida = _filtro_origens(mantidos)
+            orfas = self._indice.origens_orfas(mantida)
+            if orfas:
+                self._reler_origens(orfas, todos, mantidos, a_processar)
+                mantida = _filtro_origens(mantidos)
+            if self._carregar_base_anterior(caminho_csv, mantida):
+                self._indice.manter_apenas(mantida)
+                inalterados = sum(1 for nome, m in mantidos.items() if m is None and nome not in fora_dos_filtros)
+                fora = f", {len(fora_dos_filtros)} fora dos filtros" if fora_dos_filtros else ""
+                if anterior.entradas:
+                    print(f"Incremental: {len(a_processar)} arquivo(s) novo(s) ou alterado(s), "
+                          f"{inalterados} inalterado(s){fora}")
+                return a_processar
+            # Sem a base anterior os itens dos arquivos inalterados não podem ser
+            # recuperados: todos os arquivos são lidos de novo, como no --full
+            a_processar = dict.fromkeys(todos.values(), frozenset())
+            for nome in fora_dos_filtros:
+                del self._manifesto.entradas[nome]
+        self._indice.limpar()
+        return a_processar
+
+    def _reler_origens(self, origens: set[str], arquivos: dict[str, ArquivoEntrada],
+                       mantidos: dict[str, set[str] | None],
+                       a_processar: dict[ArquivoEntrada, frozenset[str]]) -> None:
+        """
+        Acrescenta ao plano origens inalteradas que precisam ser lidas de novo
+        (cópias de notas cuja origem registrada foi removida ou alterada): o
+        arquivo avulso inteiro ou, num ZIP, o membro de primeiro nível. Suas
+        linhas deixam de vir da base anterior.
+        """
+        relidas = 0
+        for origem in sorted(origens):
+            raiz, _, resto = origem.partition('::')
+            arquivo = arquivos.get(raiz)
+            if arquivo is None or raiz not in mantidos:
+                continue
+            relidas += 1
+            if not resto:
+                del mantidos[raiz]
+                a_processar[arquivo] = frozenset()
+                continue
+            membros = mantidos[raiz]
+            if membros is None:
+                membros = set(self._manifesto.entradas[raiz].get('membros', {}))
+            membros = mantidos[raiz] = membros - {resto.split('::')[0]}
+            a_processar[arquivo] = frozenset(f"{raiz}::{m}" for m in membros)
+        # Mesma ordem da varredura: o desempate entre cópias é o mesmo do --full
+        plano = [(arquivo, a_processar[arquivo]) for arquivo in arquivos.values() if arquivo in a_processar]
+        a_processar.clear()
+        a_processar.update(plano)
+        if relidas:
+            print(f"Cópias de notas de origens removidas ou alteradas: {relidas} origem(ns) inalterada(s) relida(s)")
+
+    def _chaves_do_arquivo(self, arquivo: ArquivoEntrada) -> set[str]:
+        """Chaves que a pré-sondagem encontrou no arquivo."""
+        return {o.chave for o in self._sondagem.get(arquivo, ()) if o.chave is not None}
+
+    def _conhecidas_do_arquivo(self, arquivo: ArquivoEntrada) -> dict[str, str | None]:
+        """
+        Chaves do arquivo já conhecidas até aqui, repassadas a um processo do
+        pool para pular notas já cobertas: o formato de origem na base
+        anterior, ou None se registrada nesta execução. Só entram as chaves
+        que a pré-sondagem achou no arquivo — mandar o índice inteiro a cada
+        tarefa custaria arquivos × chaves em serialização; as notas que a
+        sondagem não identificou são lidas e deduplicadas em
+        :meth:`_registrar_documentos`.
+        """
+        conhecidas = {}
+        for chave in self._chaves_do_arquivo(arquivo):
+            if chave in self._chaves_processadas:
+                conhecidas[chave] = None
+            elif self._indice is not None and (anterior := self._indice.origem(chave)) is not None:
+                conhecidas[chave] = anterior['formato']
+        return conhecidas
+
+    def _vencedoras_do_arquivo(self, arquivo: ArquivoEntrada) -> dict[str, str]:
+        """Formato da origem escolhida pela pré-sondagem para cada chave do arquivo."""
+        return {chave: self._vencedoras[chave].formato
+                for chave in self._chaves_do_arquivo(arquivo) if chave in self._vencedoras}
+
+    def _processar_lote(self, arquivos: list[ArquivoEntrada], plano: dict[ArquivoEntrada, frozenset[str]],
+                        executor: ProcessPoolExecutor | None) -> None:
+        """
+        Extrai um lote de arquivos — em série ou no pool de processos — e
+        registra os documentos sempre na ordem dos arquivos, de modo que o
+        resultado (e o CSV) independe do paralelismo.
+        """
+        if executor is None:
+            for arquivo in arquivos:
+                self.metricas.registrar_etapas(coletar())
+                inicio = time.perf_counter()
+                itens = self._registrar_documentos(_documentos_arquivo(
+                    arquivo.caminho, self._chave_conhecida, plano[arquivo], self._caches, arquivo.relativo))
+                self._arquivo_concluido(arquivo, itens, time.perf_counter() - inicio, coletar())
+            return
+
+        futuros = [
+            executor.submit(_extrair_arquivo, arquivo.caminho, self._conhecidas_do_arquivo(arquivo), plano[arquivo],
+                            self._caches, self._vencedoras_do_arquivo(arquivo), arquivo.relativo)
+            for arquivo in arquivos
+        ]
+        for arquivo, futuro in zip(arquivos, futuros):
+            documentos, etapas, segundos = futuro.result()
+            self.metricas.registrar_etapas(coletar())
+            itens = self._registrar_documentos(documentos)
+            deduplicacao = coletar()
+            for etapa, tempo in deduplicacao.items():
+                etapas[etapa] = etapas.get(etapa, 0.0) + tempo
+            self._arquivo_concluido(arquivo, itens, segundos + sum(deduplicacao.values()), etapas)
+
+    def _presondar(self, arquivos: list[ArquivoEntrada], plano: dict[ArquivoEntrada, frozenset[str]],
+                   executor: ProcessPoolExecutor | None) -> dict[ArquivoEntrada, frozenset[str]]:
+        """
+        Pré-sondagem: lê apenas as chaves de acesso dos arquivos a processar
+        (no pool, se houver), escolhe a origem de cada nota e devolve o plano
+        de leitura — ``plano`` acrescido das origens cujas notas ficaram todas
+        com outra origem, que assim não são lidas.
+        """
+        if executor is None:
+            resultados = []
+            for arquivo in arquivos:
+                self.metricas.registrar_etapas(coletar())
+                resultados.append(_sondar_arquivo(arquivo.caminho, plano[arquivo], self._caches, arquivo.relativo))
+        else:
+            futuros = [executor.submit(_sondar_arquivo, arquivo.caminho, plano[arquivo], self._caches, arquivo.relativo)
+                       for arquivo in arquivos]
+            resultados = [futuro.result() for futuro in futuros]
+
+        self._sondagem, self._segundos_sondagem = {}, {}
+        for arquivo, (ocorrencias, segundos) in zip(arquivos, resultados):
+            self._segundos_sondagem[arquivo] = segundos
+            if ocorrencias is not None:
+                self._sondagem[arquivo] = ocorrencias
+        descartadas = self._descartadas = self._resolver_vencedoras()
+        if descartadas:
+            total = sum(len(origens) for origens in descartadas.values())
+            print(f"Pré-sondagem: {len(self._vencedoras)} nota(s) a ler; "
+                  f"{total} origem(ns) só com cópias de notas de outras origens não serão lidas")
+        return {arquivo: plano[arquivo] | descartadas.get(arquivo, frozenset()) for arquivo in plano}
+
+    def _resolver_vencedoras(self) -> dict[ArquivoEntrada, frozenset[str]]:
+        """
+        Escolhe, para cada chave encontrada na pré-sondagem, a origem que vai
+        registrá-la: a de melhor formato (XML, depois XLSX, depois PDF) e, no
+        empate, a primeira na ordem de processamento. Chaves que a base
+        anterior já cobre em um formato não inferior ficam sem origem.
+
+        Retorna, por arquivo, as origens em que todas as notas são cópias
+        descartadas.
+        """
+        ocorrencias = [(arquivo, o) for arquivo, lista in self._sondagem.items() for o in lista]
+        melhor: dict[str, tuple[int, int]] = {}
+        for posicao, (_, o) in enumerate(ocorrencias):
+            ordem = (_PRIORIDADE_FORMATO[o.formato], posicao)
+            if o.chave is not None and ordem < melhor.get(o.chave, (len(_PRIORIDADE_FORMATO), 0)):
+                melhor[o.chave] = ordem
+
+        self._vencedoras = {}
+        lidas: set[tuple[ArquivoEntrada, str]] = set()
+        for posicao, (arquivo, o) in enumerate(ocorrencias):
+            if o.chave is not None:
+                if melhor[o.chave][1] != posicao or self._chave_conhecida(o.chave, o.formato):
+                    if self._indice is not None:
+                        self._indice.registrar_copia(o.chave, o.origem, o.formato)
+                    continue
+                self._vencedoras[o.chave] = o
+            lidas.add((arquivo, o.origem))
+
+        descartadas: dict[ArquivoEntrada, set[str]] = {}
+        for arquivo, o in ocorrencias:
+            if (arquivo, o.origem) not in lidas:
+                descartadas.setdefault(arquivo, set()).add(o.origem)
+        return {arquivo: frozenset(origens) for arquivo, origens in descartadas.items()}
+
+    def _recuperar_descartadas(self, plano: dict[ArquivoEntrada, frozenset[str]]) -> None:
+        """
+        Se a origem escolhida para uma chave não a registrou (XML corrompido,
+        nota da planilha sem itens válidos...), as cópias descartadas dessa
+        chave são lidas agora, como seriam sem a pré-sondagem.
+        """
+        faltantes = {
+            chave: ocorrencia for chave, ocorrencia in self._vencedoras.items()
+            if chave not in self._chaves_processadas
+        }
+        for chave in faltantes:
+            del self._vencedoras[chave]
+        if not faltantes:
+            return
+        for arquivo, ocorrencias in self._sondagem.items():
+            reler = {o.origem for o in ocorrencias if o.chave in faltantes and o != faltantes[o.chave]}
+            if not reler:
+                continue
+            print(f"  [PRÉ-SONDAGEM] relendo {', '.join(sorted(reler))}: a origem escolhida não registrou a nota")
+            ignoradas = plano[arquivo] | ({o.origem for o in ocorrencias} - reler)
+            self._registrar_documentos(_documentos_arquivo(arquivo.caminho, self._chave_conhecida, ignoradas,
+                                                           self._caches, arquivo.relativo))
+        self.metricas.registrar_etapas(coletar())
+
+    def _arquivo_concluido(self, arquivo: ArquivoEntrada, itens: int, segundos: float,
+                           etapas: dict[str, float]) -> None:
+        sondagem = self._segundos_sondagem.pop(arquivo, 0.0)
+        if sondagem:
+            etapas = {**etapas, 'presondagem': sondagem}
+            segundos += sondagem
+        self.metricas.registrar_arquivo(arquivo.relativo, arquivo.tamanho, itens, segundos, etapas)
+        if self._checkpoint is not None:
+            # Com origens descartadas pela pré-sondagem, a retomada reabre o arquivo para elas
+            self._checkpoint.arquivo_concluido(arquivo.relativo, arquivo not in self._descartadas)
+        self._concluidos += 1
+        if self._progresso is not None:
+            self._progresso(arquivo.relativo, self._concluidos, len(self._arquivos_lidos), itens)
+
+    def varrer_diretorio(self, pasta_alvo, completo: bool = False, jobs: int = 1,
+                         progresso: Callable[[str, int, int, int], None] | None = None,
+                         incluir: Iterable[str] = (), excluir: Iterable[str] = (), retomar: bool = False):
+        """
+        Processa os arquivos da pasta de notas fiscais e de suas subpastas.
+
+        A pasta é percorrida uma única vez (:func:`varredura.varrer_pasta`);
+        ``incluir`` e ``excluir`` são padrões glob que restringem os arquivos
+        lidos (ex.: ``incluir=['2024/*']``, ``excluir=['rascunhos']``); os
+        itens já exportados dos demais arquivos continuam na base. Cada
+        arquivo é identificado pelo caminho relativo à pasta.
+
+        Por padrão a ingestão é incremental: o manifesto da execução anterior
+        indica quais arquivos (ou membros de ZIP) mudaram, e apenas esses são
+        lidos; os itens dos demais são recuperados do CSV já exportado. Com
+        ``completo=True`` (``--full`` na linha de comando) tudo é reprocessado.
+
+        Com ``jobs > 1`` a leitura de XML, PDF, XLSX e ZIP é distribuída em um
+        pool de processos (``jobs=0`` usa todos os núcleos). A deduplicação
+        continua no processo principal, na mesma ordem do modo serial.
+
+        O texto extraído de PDFs e as planilhas Citizen já normalizadas ficam
+        em cache (``resources/outputData/cache_pdf`` e ``cache_xlsx``), podados
+        ao final da varredura.
+
+        Antes da extração, uma pré-sondagem lê apenas as chaves de acesso de
+        cada arquivo e escolhe uma origem por nota (XML antes de XLSX antes de
+        PDF); as cópias descartadas não são lidas por inteiro.
 
+        O progresso é gravado periodicamente em um checkpoint
+        (``resources/outputData/checkpoint_ingestao``, ver :mod:`checkpoint`);
+        com ``retomar=True`` (``--resume``) uma execução interrompida continua
+        do último arquivo ou membro de ZIP concluído, desde que com os mesmos
+        parâmetros e sem mudanças nos arquivos já lidos.
+
+        ``progresso(nome, concluidos, total, itens)``, se informado, é chamado
+        a cada arquivo lido.
+        """
+        pasta = Path(pasta_alvo)
+        with medir('planejamento'):
+            plano = self._planejar_ingestao(varrer_pasta(pasta, EXTENSOES_ENTRADA, incluir, excluir), completo,
+                                            incluir, excluir)
+        self.metricas.registrar_etapas(coletar())
+        encontrados = sum(1 for nome in self._manifesto.entradas if casa_filtros(nome, incluir, excluir))
+        print(f"Lendo {encontrados} arquivo(s) em: {pasta}")
+        parametros = {'pasta': str(pasta.resolve()), 'completo': completo,
+                      'incluir': list(incluir), 'excluir': list(excluir)}
+        plano = self._iniciar_checkpoint(plano, parametros, retomar)
+        self._progresso, self._concluidos = progresso, 0
+        self._arquivos_lidos = [arquivo.relativo for arquivo in plano]
+        if self._caches == Caches():
+            self._caches = _caches_padrao()
+
+        # Passo 1: ZIPs e XMLs avulsos primeiro (registram as chaves)
         # Passo 2: XLSXs avulsos (formato Citizen)
-        for arquivo in arquivos:
-            if arquivo.suffix.lower() == '.xlsx':
-                conteudo = arquivo.read_bytes()
-                n = self._processar_xlsx_citizen(conteudo, arquivo.name)
-                print(f"  [XLSX] {arquivo.name}: {n} item(s)")
+        # Passo 3: PDFs avulsos — pula os que já foram cobertos por XML
+        fases: list[list[ArquivoEntrada]] = [[], [], []]
+        for arquivo in plano:
+            fases[_FASE_FORMATO[arquivo.formato]].append(arquivo)
 
-        # Passo 3: processa PDFs avulsos — pula os que já foram cobertos por XML
-        for arquivo in arquivos:
-            if arquivo.suffix.lower() == '.pdf':
-                self.processar_arquivo_pdf(arquivo)
+        jobs = jobs or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else contextlib.nullcontext()
+        try:
+            with pool as executor:
+                leitura = self._presondar([arquivo for fase in fases for arquivo in fase], plano, executor)
+                for fase in fases:
+                    self._processar_lote(fase, leitura, executor)
+            self._recuperar_descartadas(plano)
+        except BaseException:
+            # Erro ou Ctrl+C: guarda o que já foi concluído para o --resume e
+            # descarta as alterações pendentes do índice (fechar sem commit)
+            self._checkpoint.gravar()
+            self.fechar()
+            raise
+        self._podar_caches()
+
+    def _iniciar_checkpoint(self, plano: dict[ArquivoEntrada, frozenset[str]], parametros: dict,
+                            retomar: bool) -> dict[ArquivoEntrada, frozenset[str]]:
+        """
+        Liga o checkpoint da varredura. Com ``retomar``, restaura o progresso
+        da execução interrompida e devolve o plano sem o que já foi concluído;
+        caso contrário (ou se o checkpoint não servir), começa um novo.
+        """
+        self._checkpoint = CheckpointIngestao(_pasta_saida() / NOME_CHECKPOINT, INTERVALO_CHECKPOINT)
+        assinaturas = {arquivo.relativo: (arquivo.tamanho, arquivo.mtime_ns) for arquivo in plano}
+        retomada = self._checkpoint.carregar(parametros) if retomar else None
+        if retomar and retomada is None:
+            print("[AVISO] Nenhum checkpoint compatível com esta execução; processando do início")
+        if retomada is not None:
+            raizes = {origem.partition('::')[0] for origem in retomada.concluidas}
+            alterados = sorted(r for r in raizes if assinaturas.get(r) != retomada.assinaturas.get(r))
+            if alterados:
+                print(f"[AVISO] Checkpoint descartado: {len(alterados)} arquivo(s) já lido(s) mudaram "
+                      f"desde a execução interrompida (ex.: {alterados[0]})")
+                retomada = None
+        if retomada is None:
+            self._checkpoint.iniciar(parametros, assinaturas)
+            return plano
+        return self._restaurar_checkpoint(retomada, plano)
+
+    def _restaurar_checkpoint(self, retomada: Retomada,
+                              plano: dict[ArquivoEntrada, frozenset[str]]) -> dict[ArquivoEntrada, frozenset[str]]:
+        """Restaura itens e chaves do checkpoint e tira do plano as origens já concluídas."""
+        self.dados_consolidados.extend(retomada.itens)
+        for chave, (origem, formato, qtd_itens) in retomada.chaves.items():
+            self._chaves_processadas.add(chave)
+            if self._indice is not None:
+                self._indice.registrar(chave, origem, formato, qtd_itens)
+        if self._indice is not None:
+            for chave, origem, formato in retomada.copias:
+                self._indice.registrar_copia(chave, origem, formato)
+        self._chaves_substituidas |= retomada.substituidas
+
+        membros: dict[str, set[str]] = {}
+        for origem in retomada.concluidas:
+            raiz, separador, _ = origem.partition('::')
+            if separador:
+                membros.setdefault(raiz, set()).add(origem)
+        restante = {
+            arquivo: ignoradas | membros.get(arquivo.relativo, set())
+            for arquivo, ignoradas in plano.items() if arquivo.relativo not in retomada.concluidas
+        }
+        print(f"Retomando a execução interrompida: {len(retomada.itens)} item(ns) e {len(retomada.chaves)} "
+              f"nota(s) restaurados; {len(restante)} de {len(plano)} arquivo(s) a ler")
+        return restante
+
+    def _podar_caches(self) -> None:
+        """Aplica o limite do cache de PDF e remove do cache de XLSX as planilhas que saíram da pasta."""
+        if self._caches.pdf is not None:
+            self._caches.pdf.podar()
+        if self._caches.xlsx is not None and self._manifesto is not None:
+            entradas = self._manifesto.entradas
+
+            def _existe(origem: str) -> bool:
+                raiz, _, resto = origem.partition('::')
+                if raiz not in entradas:
+                    return False
+                return not resto or resto.split('::')[0] in entradas[raiz].get('membros', {})
+            self._caches.xlsx.podar(_existe)
 
     # --- NOVIDADE: Método para aplicar o dicionário ---
-    def _aplicar_normalizacao(self, df):
+    @staticmethod
+    def _carregar_dicionario() -> tuple[dict, dict] | None:
+        """Mapas ``{nome original: nome padrão}`` e ``{nome original: categoria}`` do dicionário de produtos."""
         raiz = Path(__file__).resolve().parent.parent
         caminho_dic = raiz / 'resources' / 'outputData' / 'dicionario_produtos.xlsx'
-        df['produto_raw'] = df['produto']
-        
+
         if caminho_dic.exists():
             print("Aplicando dicionário de produtos...")
             try:
                 # Lê o Excel
                 df_dic = pd.read_excel(caminho_dic)
-                
+
                 # Cria um dicionário Python { 'Nome Sujo': 'Nome Limpo' }
                 mapa_nomes = dict(zip(df_dic['nome_original'], df_dic['nome_padrao']))
                 mapa_categorias = dict(zip(df_dic['nome_original'], df_dic['categoria']))
-                
-                # Aplica a troca
-                # Se não achar no dicionário, mantém o nome original
-                df['produto'] = df['produto_raw'].map(mapa_nomes).fillna(df['produto_raw'])
-                df['categoria'] = df['produto_raw'].map(mapa_categorias).fillna('Outros')
-                
-                return df
+                return mapa_nomes, mapa_categorias
             except Exception as e:
                 print(f"Erro ao ler dicionário: {e}")
-                return df
+                return None
         else:
             print("Dicionário não encontrado. Usando nomes originais.")
-            return df
-
-    def exportar_csv(self, nome_arquivo="minha_inflacao.csv"):
-        df = pd.DataFrame(self.dados_consolidados)
-        
-        if not df.empty:
-            # --- Aplica a Normalização antes de salvar ---
-            df = self._aplicar_normalizacao(df)
-            
-            # Reordena — inclui campos extras vindos de XMLs (ean, ncm, loja, cnpj)
-            cols = ['data', 'loja', 'cnpj', 'endereco', 'categoria', 'produto', 'produto_raw', 'qtd', 'unidade',
-                    'preco_unit', 'preco_total', 'codigo', 'ean', 'ncm', 'chave_nfe', 'arquivo_origem']
-            # Garante que as colunas existem (caso o dicionário tenha falhado)
-            cols_finais = [c for c in cols if c in df.columns]
-            df = df[cols_finais]
-
-            # Mantém identificadores como texto (evita notação científica no CSV)
-            for col in ['codigo', 'ean', 'ncm', 'cnpj']:
-                if col in df.columns:
-                    df[col] = df[col].fillna('').astype(str).str.replace(r'\.0$', '', regex=True)
-            
-            raiz_projeto = Path(__file__).resolve().parent.parent
-            pasta_saida = raiz_projeto / 'resources' / 'outputData'
-            pasta_saida.mkdir(parents=True, exist_ok=True)
-            
-            caminho_completo = pasta_saida / nome_arquivo
-            df.to_csv(caminho_completo, index=False, sep=';', decimal=',', encoding='utf-8-sig')
-            
-            print(f"\n[SUCESSO] Relatório salvo em: {caminho_completo}")
-            cols_preview = [c for c in ['loja', 'produto', 'preco_unit', 'categoria'] if c in df.columns]
-            print(df[cols_preview].head())
-        else:
+            return None
+
+    @staticmethod
+    def _aplicar_normalizacao(df: pd.DataFrame, mapas: tuple[dict, dict] | None) -> pd.DataFrame:
+        df['produto_raw'] = df['produto']
+        if mapas is not None:
+            mapa_nomes, mapa_categorias = mapas
+            # Aplica a troca
+            # Se não achar no dicionário, mantém o nome original
+            df['produto'] = df['produto_raw'].map(mapa_nomes).fillna(df['produto_raw'])
+            df['categoria'] = df['produto_raw'].map(mapa_categorias).fillna('Outros')
+        return df
+
+    def _normalizar_bloco(self, bloco: pd.DataFrame, mapas: tuple[dict, dict] | None,
+                          colunas: list[str]) -> pd.DataFrame:
+        """Dicionário, ordem das colunas e identificadores como texto, em um bloco da base."""
+        bloco = self._aplicar_normalizacao(bloco, mapas).reindex(columns=colunas)
+        # Mantém identificadores como texto (evita notação científica no CSV)
+        for col in _COLUNAS_IDENTIFICADORES:
+            if col in bloco.columns:
+                bloco[col] = bloco[col].fillna('').astype(str).str.replace(r'\.0$', '', regex=True)
+        return bloco
+
+    def _blocos_exportacao(self, base: pd.DataFrame | None, tamanho: int) -> Iterator[tuple[pd.DataFrame, bool]]:
+        """Blocos da base anterior mantida e depois dos itens lidos; o flag indica itens novos."""
+        if base is not None:
+            for inicio in range(0, len(base), tamanho):
+                yield base.iloc[inicio:inicio + tamanho].reset_index(drop=True), False
+        for bloco in self.dados_consolidados.blocos(tamanho):
+            yield bloco, True
+
+    @staticmethod
+    def _exportar_sqlite(df: pd.DataFrame, caminho_csv: Path) -> None:
+        """
+        Sincroniza a base SQLite de notas e itens (``base_sqlite``) com a base
+        recém-exportada no CSV — apenas notas novas ou alteradas são gravadas.
+        """
+        try:
+            base = BaseSqlite(caminho_csv.parent / NOME_BASE_SQLITE)
+            try:
+                gravadas, removidas = base.sincronizar(df)
+                base.marcar_exportacao(caminho_csv)
+            finally:
+                base.fechar()
+        except sqlite3.Error as e:
+            print(f"[AVISO] Base SQLite não atualizada: {e}")
+            return
+        print(f"Base SQLite: {gravadas} nota(s) gravada(s), {removidas} removida(s)")
+
+    def _concluir_metricas(self, pasta_saida: Path, segundos_exportacao: float) -> None:
+        """Fecha as métricas da execução, grava o relatório JSON e imprime o resumo."""
+        self.metricas.registrar_etapas(coletar())
+        self.metricas.registrar_etapas({'exportacao': segundos_exportacao})
+        self.metricas.finalizar()
+        try:
+            self.metricas.salvar(pasta_saida / NOME_METRICAS)
+        except OSError as e:
+            print(f"[AVISO] Relatório de métricas não gravado: {e}")
+        print(self.metricas.resumo())
+
+    def exportar_csv(self, nome_arquivo=NOME_CSV, sqlite: bool = False, reter_novos: bool = False):
+        """
+        Grava a base consolidada em CSV (e em Parquet). Com ``sqlite=True``
+        (``--sqlite`` na linha de comando) também atualiza a base SQLite de
+        notas e itens. Retorna o número de itens exportados.
+
+        A base é normalizada e gravada em blocos de ``TAMANHO_BLOCO_EXPORTACAO``
+        itens (``exportacao``), em temporários que só substituem os arquivos
+        anteriores no final — quem lê o CSV nunca vê um arquivo pela metade.
+        Só o SQLite ainda precisa da base inteira em memória. Com
+        ``reter_novos``, os itens acrescentados nesta execução ficam em
+        ``_novos_exportados`` (usado por :meth:`atualizar`).
+        """
+        inicio_exportacao = time.perf_counter()
+        base = self._base_anterior
+        if base is not None and self._chaves_substituidas and 'chave_nfe' in base.columns:
+            base = base[~base['chave_nfe'].isin(self._chaves_substituidas)]
+        if base is not None and base.empty:
+            base = None
+
+        if base is None and not len(self.dados_consolidados):
             print("\n[AVISO] Nenhum dado extraído.")
+            self._novos_exportados = pd.DataFrame()
+            return 0
+
+        # --- Aplica a Normalização antes de salvar ---
+        mapas = self._carregar_dicionario()
+        # Reordena — inclui campos extras vindos de XMLs (ean, ncm, loja, cnpj)
+        presentes = set(self.dados_consolidados.colunas()) | {'produto_raw'}
+        if base is not None:
+            presentes |= set(base.columns)
+        if mapas is not None:
+            presentes.add('categoria')
+        # Garante que as colunas existem (caso o dicionário tenha falhado)
+        colunas = [c for c in COLUNAS_BASE if c in presentes]
+
+        pasta_saida = _pasta_saida()
+        caminho_completo = pasta_saida / nome_arquivo
+        preview = None
+        novos, completos = [], []
+        with ExportacaoEmBlocos(caminho_completo) as exportacao:
+            for bloco, novo in self._blocos_exportacao(base, TAMANHO_BLOCO_EXPORTACAO):
+                bloco = self._normalizar_bloco(bloco, mapas, colunas)
+                exportacao.gravar(bloco)
+                if preview is None:
+                    preview = bloco.head()
+                if novo and reter_novos:
+                    novos.append(bloco)
+                if sqlite:
+                    completos.append(bloco)
+            exportacao.concluir()
+        if sqlite:
+            self._exportar_sqlite(pd.concat(completos, ignore_index=True), caminho_completo)
+        # Manifesto e índice só são gravados depois do CSV: se a exportação
+        # falhar, a próxima execução reprocessa os mesmos arquivos.
+        if self._manifesto is not None:
+            self._manifesto.salvar()
+        if self._indice is not None:
+            self._indice.salvar()
+        if self._checkpoint is not None:
+            self._checkpoint.descartar()
+        self._concluir_metricas(pasta_saida, time.perf_counter() - inicio_exportacao)
+
+        print(f"\n[SUCESSO] Relatório salvo em: {caminho_completo}")
+        cols_preview = [c for c in ['loja', 'produto', 'preco_unit', 'categoria'] if c in colunas]
+        print(preview[cols_preview])
+        self._novos_exportados = (pd.concat(novos, ignore_index=True) if novos
+                                  else pd.DataFrame(columns=colunas))
+        return exportacao.linhas
+
+    def atualizar(self, pasta_alvo, completo: bool = False, jobs: int = 1, sqlite: bool = False,
+                  progresso: Callable[[str, int, int, int], None] | None = None,
+                  incluir: Iterable[str] = (), excluir: Iterable[str] = ()) -> Atualizacao:
+        """
+        Ingestão incremental e exportação em uma chamada, para uso dentro de
+        outro processo (o dashboard): lê apenas os arquivos novos ou alterados,
+        avisando ``progresso`` a cada um, grava o CSV e devolve os itens
+        acrescentados, para que quem já tem a base carregada só os anexe. O
+        índice de chaves é fechado ao final.
+        """
+        with self:
+            self.varrer_diretorio(pasta_alvo, completo=completo, jobs=jobs, progresso=progresso,
+                                  incluir=incluir, excluir=excluir)
+            itens = self.exportar_csv(sqlite=sqlite, reter_novos=True)
+        somente_acrescimo = (
+            self._base_anterior is not None
+            and len(self._base_anterior) == self._linhas_anteriores
+            and not self._chaves_substituidas
+        )
+        return Atualizacao(self._arquivos_lidos, self._novos_exportados, somente_acrescimo, itens)
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Extrai os itens das notas fiscais e gera o CSV consolidado.')
+    parser.add_argument('--full', action='store_true',
+                        help='ignora o manifesto de ingestão e reprocessa todos os arquivos')
+    parser.add_argument('--sqlite', action='store_true',
+                        help='atualiza também a base SQLite de notas e itens (minha_inflacao.sqlite)')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='processos usados na extração (1 = serial, 0 = todos os núcleos)')
+    parser.add_argument('--watch', action='store_true',
+                        help='continua rodando e ingere os arquivos novos assim que chegam na pasta')
+    parser.add_argument('--intervalo', type=float, default=2.0, metavar='S',
+                        help='segundos entre as verificações da pasta no modo --watch')
+    parser.add_argument('--estabilizacao', type=float, default=3.0, metavar='S',
+                        help='segundos sem mudança para um arquivo ser considerado completo no modo --watch')
+    parser.add_argument('--resume', action='store_true',
+                        help='retoma a última execução interrompida a partir do checkpoint '
+                             '(com os mesmos --full, --incluir e --excluir)')
+    parser.add_argument('--incluir', action='append', default=[], metavar='PADRAO',
+                        help='lê apenas os arquivos que casam com o padrão glob (ex.: "2024/*"); pode repetir')
+    parser.add_argument('--excluir', action='append', default=[], metavar='PADRAO',
+                        help='ignora arquivos e subpastas que casam com o padrão glob; pode repetir')
+    args = parser.parse_args()
+
     raiz_projeto = Path(__file__).resolve().parent.parent
     pasta_cupons = raiz_projeto / 'resources' / 'notas_fiscais'
     
-    app = ProcessadorDeCupons()
-    app.varrer_diretorio(pasta_cupons)
-    app.exportar_csv()
\ No newline at end of file
+    if args.watch:
+        from vigia import NOME_STATUS, VigiaPasta
+
+        completo, retomar = args.full, args.resume
+
+        def _ingerir() -> int:
+            # Só a primeira ingestão respeita --full e --resume; as seguintes são incrementais
+            global completo, retomar
+            with ProcessadorDeCupons() as app:
+                app.varrer_diretorio(pasta_cupons, completo=completo, jobs=args.jobs,
+                                     incluir=args.incluir, excluir=args.excluir, retomar=retomar)
+                itens = app.exportar_csv(sqlite=args.sqlite)
+            completo = retomar = False
+            return itens
+
+        VigiaPasta(pasta_cupons, _ingerir, _pasta_saida() / NOME_STATUS, EXTENSOES_ENTRADA,
+                   intervalo=args.intervalo, estabilizacao=args.estabilizacao,
+                   incluir=args.incluir, excluir=args.excluir).executar()
+    else:
+        with ProcessadorDeCupons() as app:
+            app.varrer_diretorio(pasta_cupons, completo=args.full, jobs=args.jobs,
+                                 incluir=args.incluir, excluir=args.excluir, retomar=args.resume)
+            app.exportar_csv(sqlite=args.sqlite)
@@ -3,6 +3,7 @@ Funções utilitárias compartilhadas entre os módulos do projeto.
 """
 import pandas as pd
 from pathlib import Path
+from notas_itens import caminhos_notas_itens, juntar_notas_itens
 
 
 def format_currency(value: float) -> str:
@@ -29,6 +30,94 @@ def format_currency(value: float) -> str:
     return f"R$ {value:,.2f}".replace(",", "@").replace(".", ",").replace("@", ".")
 
 
+def carregar_notas_itens(pasta_saida: Path,
+                         nome_csv: str = 'minha_inflacao.csv') -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    """
+    Lê as tabelas de notas e de itens gravadas em Parquet junto com o CSV
+    (``notas_itens``). Retorna None se alguma não existir, for mais antiga
+    que o CSV ou não puder ser lida (ex.: pyarrow não instalado).
+    """
+    caminho_csv = pasta_saida / nome_csv
+    caminhos = caminhos_notas_itens(caminho_csv)
+    if not all(c.exists() for c in caminhos):
+        return None
+    if caminho_csv.exists() and min(c.stat().st_mtime for c in caminhos) < caminho_csv.stat().st_mtime:
+        return None
+    try:
+        notas, itens = (pd.read_parquet(c) for c in caminhos)
+    except Exception as e:
+        print(f"[AVISO] Parquet ilegível ({e}); lendo o CSV.")
+        return None
+    return notas, itens
+
+
+def carregar_base(pasta_saida: Path, nome_csv: str = 'minha_inflacao.csv') -> pd.DataFrame | None:
+    """
+    Carrega a base de itens exportada pelo processador, ordenada por data.
+
+    Prefere as tabelas de notas e itens em Parquet (:func:`carregar_notas_itens`),
+    já tipadas, juntando-as em uma linha por item. O CSV é lido — e a coluna
+    'data' convertida — quando elas não estão disponíveis.
+
+    Parâmetros
+    ----------
+    pasta_saida : Path
+        Pasta resources/outputData.
+    nome_csv : str
+        Nome do CSV consolidado.
+
+    Retorna
+    -------
+    pd.DataFrame | None
+        Base com 'data' em datetime64, ou None se não houver base exportada.
+    """
+    tabelas = carregar_notas_itens(pasta_saida, nome_csv)
+    if tabelas is not None:
+        return juntar_notas_itens(*tabelas).sort_values('data')
+
+    caminho_csv = pasta_saida / nome_csv
+    if not caminho_csv.exists():
+        return None
+    # Lê com padrão brasileiro
+    df = pd.read_csv(caminho_csv, sep=';', decimal=',', encoding='utf-8-sig')
+    df['data'] = pd.to_datetime(df['data'], format='mixed', dayfirst=True)
+    return df.sort_values('data')
+
+
+def acrescentar_itens(base: pd.DataFrame | None, novos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Base carregada (:func:`carregar_base`) com itens recém-exportados
+    anexados — como ficaria se a base fosse relida do disco, sem relê-la.
+    'data' dos itens novos é convertida e o resultado volta a ser ordenado
+    por data.
+    """
+    if novos is None or novos.empty:
+        return base
+    novos = novos.copy()
+    novos['data'] = pd.to_datetime(novos['data'], format='mixed', dayfirst=True)
+    if base is None or base.empty:
+        return novos.sort_values('data', kind='stable')
+    return pd.concat([base, novos], ignore_index=True).sort_values('data', kind='stable')
+
+
+def abrir_base_sqlite(pasta_saida: Path, nome_csv: str = 'minha_inflacao.csv'):
+    """
+    Abre a base SQLite de notas e itens (``base_sqlite``) se ela existir e
+    estiver sincronizada com o CSV atual; caso contrário retorna None e quem
+    chamou deve usar o CSV/Parquet. Quem recebe a base deve fechá-la.
+    """
+    from base_sqlite import BaseSqlite, NOME_BASE_SQLITE
+
+    caminho = pasta_saida / NOME_BASE_SQLITE
+    if not caminho.exists():
+        return None
+    base = BaseSqlite(caminho)
+    if not base.corresponde_a(pasta_saida / nome_csv):
+        base.fechar()
+        return None
+    return base
+
+
 def filtrar_produtos(df: pd.DataFrame, busca: str) -> pd.DataFrame:
     """
     Filtra o DataFrame pelo campo 'produto' usando busca por tokens.
@@ -0,0 +1,127 @@
+"""
+Varredura recursiva da pasta de notas fiscais.
+
+As notas costumam ser guardadas em subpastas (ano/mês, loja...), com dezenas
+de milhares de arquivos. :func:`varrer_pasta` percorre a árvore uma única vez
+com ``os.scandir``, entregando os arquivos conforme são encontrados, com o
+tamanho e o mtime do ``stat`` de cada ``DirEntry`` — sem montar a lista
+inteira antes nem repetir o ``stat`` depois.
+
+Cada arquivo é identificado pelo caminho relativo à pasta, separado por
+``/`` (ex.: ``2024/03/nota.xml``) — é o nome usado no manifesto e em
+``arquivo_origem``. Arquivos na raiz continuam identificados só pelo nome,
+como antes da varredura recursiva.
+
+Filtros ``incluir`` e ``excluir`` são padrões glob (``fnmatch``, diferencia
+maiúsculas): um padrão com ``/`` é comparado ao caminho relativo (onde ``*``
+também atravessa subpastas, ex.: ``2024/*``); sem ``/``, ao nome (ex.:
+``*.pdf``, ``rascunhos``). Uma subpasta que casa com ``excluir`` não é
+percorrida. Entradas ocultas (nome iniciado por ``.``) e ``__MACOSX`` são
+sempre ignoradas; links simbólicos para pastas não são seguidos.
+:func:`casa_filtros` aplica os mesmos filtros a um caminho já conhecido (do
+manifesto, por exemplo), sem percorrer a pasta.
+
+A ordem é determinística: em cada pasta, as entradas por nome, descendo em
+cada subpasta na sua posição.
+"""
+import os
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+_IGNORADOS = frozenset({'__MACOSX'})
+
+
+class ArquivoEntrada(NamedTuple):
+    """Um arquivo encontrado na varredura."""
+    caminho: Path
+    relativo: str
+    formato: str  # extensão em minúsculas, ex.: '.xml'
+    tamanho: int
+    mtime_ns: int
+
+
+def _casa(relativo: str, nome: str, padroes: Iterable[str]) -> bool:
+    return any(fnmatchcase(relativo if '/' in padrao else nome, padrao) for padrao in padroes)
+
+
+def casa_filtros(relativo: str, incluir: Iterable[str] = (), excluir: Iterable[str] = ()) -> bool:
+    """
+    Indica se o arquivo ``relativo`` (caminho relativo com ``/``) seria
+    entregue por :func:`varrer_pasta` com esses filtros — inclusive quando é
+    uma subpasta do caminho que casa com ``excluir``.
+    """
+    partes = relativo.split('/')
+    if excluir and any(_casa('/'.join(partes[:i + 1]), parte, excluir) for i, parte in enumerate(partes)):
+        return False
+    return not incluir or _casa(relativo, partes[-1], incluir)
+
+
+def varrer_pasta(pasta: Path | str, extensoes: Iterable[str] | None = None,
+                 incluir: Iterable[str] = (), excluir: Iterable[str] = ()) -> Iterator[ArquivoEntrada]:
+    """
+    Percorre ``pasta`` e suas subpastas, gerando os arquivos de entrada.
+
+    Parâmetros
+    ----------
+    pasta : Path | str
+        Raiz da varredura. Uma pasta inexistente não gera nada.
+    extensoes : Iterable[str] | None
+        Extensões aceitas, em minúsculas (ex.: ``{'.xml', '.pdf'}``); None
+        aceita qualquer arquivo.
+    incluir, excluir : Iterable[str]
+        Padrões glob. Com ``incluir``, só entram os arquivos que casam com
+        algum padrão; ``excluir`` vale para arquivos e subpastas.
+
+    Retorna
+    -------
+    Iterator[ArquivoEntrada]
+        Um por arquivo, na ordem descrita no módulo. Subpastas ilegíveis são
+        puladas com um aviso.
+    """
+    raiz = Path(pasta)
+    extensoes = None if extensoes is None else frozenset(extensoes)
+    incluir, excluir = tuple(incluir), tuple(excluir)
+
+    pendentes: list[Iterator[os.DirEntry]] = []
+    prefixos: list[str] = []
+
+    def _abrir(caminho: Path | str, prefixo: str) -> None:
+        try:
+            with os.scandir(caminho) as entradas:
+                pendentes.append(iter(sorted(entradas, key=lambda e: e.name)))
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"[AVISO] Pasta ignorada na varredura: {caminho} ({e})")
+            return
+        prefixos.append(prefixo)
+
+    _abrir(raiz, '')
+    while pendentes:
+        entrada = next(pendentes[-1], None)
+        if entrada is None:
+            pendentes.pop()
+            prefixos.pop()
+            continue
+        nome = entrada.name
+        if nome.startswith('.') or nome in _IGNORADOS:
+            continue
+        relativo = prefixos[-1] + nome
+        if excluir and _casa(relativo, nome, excluir):
+            continue
+        try:
+            if entrada.is_dir(follow_symlinks=False):
+                _abrir(entrada.path, relativo + '/')
+                continue
+            if not entrada.is_file():
+                continue
+            formato = os.path.splitext(nome)[1].lower()
+            if extensoes is not None and formato not in extensoes:
+                continue
+            if incluir and not _casa(relativo, nome, incluir):
+                continue
+            stat = entrada.stat()
+        except OSError:
+            continue
+        yield ArquivoEntrada(Path(entrada.path), relativo, formato, stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,197 @@
+"""
+Modo de vigia (``--watch``): ingestão contínua da pasta de notas fiscais.
+
+Em vez de depender do botão "Processar e Atualizar" do dashboard ou de uma
+execução manual, o processador fica rodando e verifica a pasta
+``resources/notas_fiscais`` a cada ``intervalo`` segundos (por varredura do
+diretório — sem dependências extras e funciona igual em qualquer sistema).
+
+Cada arquivo de entrada é identificado por ``(tamanho, mtime)``. Um arquivo
+novo ou alterado só é considerado pronto depois de ficar ``estabilizacao``
+segundos sem mudar: downloads e cópias em andamento (que ainda crescem) são
+esperados, e nomes temporários (``.part``, ``.crdownload``, ``~$...``) são
+ignorados. Na primeira verificação, arquivos com mtime mais antigo que isso
+já contam como prontos e são ingeridos logo. Quando todas as mudanças
+estão prontas, a ingestão incremental habitual é executada — o manifesto
+garante que só os arquivos novos ou alterados sejam lidos.
+
+A cada verificação o vigia grava ``resources/outputData/status_ingestao.json``
+(de forma atômica) com o estado, o horário do último sinal de vida
+(``heartbeat``), os arquivos pendentes e o resultado da última ingestão; o
+dashboard lê esse arquivo com :func:`ler_status`.
+"""
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable
+
+from manifesto import gravar_json_atomico
+from varredura import varrer_pasta
+
+NOME_STATUS = 'status_ingestao.json'
+
+# Sufixos e prefixos de arquivos ainda sendo gravados por navegadores e editores
+_SUFIXOS_TEMPORARIOS = ('.part', '.crdownload', '.download', '.tmp')
+_PREFIXOS_TEMPORARIOS = ('.', '~$')
+
+
+def _agora_iso() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def ler_status(caminho: Path) -> dict | None:
+    """Lê o status gravado pelo vigia; ``None`` se não existir ou for inválido."""
+    try:
+        status = json.loads(Path(caminho).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return status if isinstance(status, dict) else None
+
+
+def vigia_ativo(status: dict | None, agora: datetime | None = None) -> bool:
+    """
+    Indica se o status é de um vigia em execução: não parado e com
+    ``heartbeat`` recente (até três intervalos de verificação).
+    """
+    if not status or status.get('estado') == 'parado':
+        return False
+    try:
+        heartbeat = datetime.fromisoformat(status['heartbeat'])
+        intervalo = float(status.get('intervalo', 0))
+    except (KeyError, TypeError, ValueError):
+        return False
+    return ((agora or datetime.now()) - heartbeat).total_seconds() <= max(3 * intervalo, 10)
+
+
+def _temporario(nome: str) -> bool:
+    return nome.startswith(_PREFIXOS_TEMPORARIOS) or nome.lower().endswith(_SUFIXOS_TEMPORARIOS)
+
+
+class VigiaPasta:
+    """
+    Vigia uma pasta e chama ``ingerir()`` quando arquivos de entrada
+    aparecem, mudam ou somem e já estão estáveis.
+
+    ``ingerir`` executa a ingestão incremental e devolve o total de itens da
+    base (gravado no status). ``relogio`` permite simular o tempo nos testes.
+    """
+
+    def __init__(self, pasta: Path, ingerir: Callable[[], int], caminho_status: Path,
+                 extensoes: set[str], intervalo: float = 2.0, estabilizacao: float = 3.0,
+                 relogio: Callable[[], float] = time.time,
+                 incluir: Iterable[str] = (), excluir: Iterable[str] = ()):
+        self.pasta = Path(pasta)
+        self.caminho_status = Path(caminho_status)
+        self.extensoes = extensoes
+        self.intervalo = intervalo
+        self.estabilizacao = estabilizacao
+        self.incluir, self.excluir = tuple(incluir), tuple(excluir)
+        self._ingerir = ingerir
+        self._relogio = relogio
+        # nome -> ((tamanho, mtime_ns), instante em que essa assinatura foi vista pela primeira vez)
+        self._observados: dict[str, tuple[tuple[int, int], float]] = {}
+        # Estado da pasta na última ingestão (None: ainda não houve ingestão)
+        self._ingerido: dict[str, tuple[int, int]] | None = None
+        # Estado em que a última ingestão falhou — não é repetida até a pasta mudar
+        self._falhou: dict[str, tuple[int, int]] | None = None
+        self.status: dict = {
+            'estado': 'iniciando',
+            'pid': os.getpid(),
+            'pasta': str(self.pasta),
+            'intervalo': intervalo,
+            'iniciado_em': _agora_iso(),
+            'heartbeat': _agora_iso(),
+            'pendentes': [],
+            'ultima_ingestao': None,
+            'arquivos_ultima_ingestao': [],
+            'duracao_ultima_ingestao': None,
+            'itens': None,
+            'erro': None,
+        }
+
+    def _listar(self) -> dict[str, tuple[int, int]]:
+        """Assinatura ``(tamanho, mtime_ns)`` de cada arquivo de entrada da pasta e subpastas."""
+        return {
+            arquivo.relativo: (arquivo.tamanho, arquivo.mtime_ns)
+            for arquivo in varrer_pasta(self.pasta, self.extensoes, self.incluir, self.excluir)
+            if not _temporario(arquivo.caminho.name)
+        }
+
+    def _estavel(self, nome: str, agora: float) -> bool:
+        (_, mtime_ns), desde = self._observados[nome]
+        if agora - desde >= self.estabilizacao:
+            return True
+        # Ao iniciar, arquivos que não mudam há algum tempo não precisam esperar
+        return self._ingerido is None and agora - mtime_ns / 1e9 >= self.estabilizacao
+
+    def verificar(self) -> bool:
+        """
+        Uma verificação da pasta: atualiza o status e, se houver mudanças já
+        estáveis, executa a ingestão. Retorna ``True`` se ingeriu.
+        """
+        agora = self._relogio()
+        atuais = self._listar()
+        self._observados = {
+            nome: self._observados[nome] if nome in self._observados and self._observados[nome][0] == assinatura
+            else (assinatura, agora)
+            for nome, assinatura in atuais.items()
+        }
+        anterior = self._ingerido or {}
+        mudados = sorted(n for n, a in atuais.items() if anterior.get(n) != a)
+        removidos = sorted(set(anterior) - set(atuais))
+        instaveis = [n for n in mudados if not self._estavel(n, agora)]
+
+        self.status['heartbeat'] = _agora_iso()
+        self.status['pendentes'] = instaveis
+        ingerir = (self._ingerido is None or mudados or removidos) and not instaveis
+        if not ingerir or atuais == self._falhou:
+            self.status['estado'] = 'aguardando'
+            gravar_json_atomico(self.caminho_status, self.status)
+            return False
+
+        self.status['estado'] = 'processando'
+        gravar_json_atomico(self.caminho_status, self.status)
+        inicio = time.perf_counter()
+        try:
+            itens = self._ingerir()
+        except Exception as e:
+            self._falhou = atuais
+            self.status.update(estado='erro', erro=f'{type(e).__name__}: {e}')
+            print(f"[ERRO] Ingestão falhou: {e}")
+            gravar_json_atomico(self.caminho_status, self.status)
+            return False
+        self._ingerido, self._falhou = atuais, None
+        self.status.update(
+            estado='aguardando',
+            ultima_ingestao=_agora_iso(),
+            arquivos_ultima_ingestao=mudados + removidos,
+            duracao_ultima_ingestao=round(time.perf_counter() - inicio, 3),
+            itens=itens,
+            erro=None,
+            heartbeat=_agora_iso(),
+        )
+        gravar_json_atomico(self.caminho_status, self.status)
+        return True
+
+    def executar(self, parar: Callable[[], bool] = lambda: False) -> None:
+        """Verifica a pasta a cada ``intervalo`` segundos até ``parar()`` ou Ctrl+C."""
+        print(f"Vigiando {self.pasta} (a cada {self.intervalo:g}s; Ctrl+C para encerrar)")
+        tratador_anterior = None
+        if threading.current_thread() is threading.main_thread():
+            # SIGTERM (kill, systemd, timeout) encerra como Ctrl+C, gravando o estado 'parado'
+            tratador_anterior = signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            while not parar():
+                self.verificar()
+                time.sleep(self.intervalo)
+        except KeyboardInterrupt:
+            print("\nVigia encerrado.")
+        finally:
+            if tratador_anterior is not None:
+                signal.signal(signal.SIGTERM, tratador_anterior)
+            self.status.update(estado='parado', heartbeat=_agora_iso(), pendentes=[])
+            gravar_json_atomico(self.caminho_status, self.status)
@@ -0,0 +1,52 @@
+"""
+Testes para src/acumulador_itens.py
+"""
+import pandas as pd
+import acumulador_itens
+from acumulador_itens import AcumuladorItens
+
+ITENS = [
+    {"data": "01/03/2026", "produto": "LEITE", "qtd": 1.0, "preco_total": 4.89, "chave_nfe": "A"},
+    {"data": "01/03/2026", "produto": "CAFE", "qtd": 2, "loja": "MERCADO", "chave_nfe": "A"},
+    {"produto": "LEITE", "loja": None, "preco_unit": 3.5, "chave_nfe": "B"},
+]
+
+
+class TestAcumuladorItens:
+    def test_dataframe_igual_ao_da_lista_de_dicts(self):
+        esperado = pd.DataFrame(ITENS)
+        obtido = AcumuladorItens(ITENS).para_dataframe()
+        pd.testing.assert_frame_equal(obtido, esperado)
+
+    def test_itens_em_varios_lotes(self, monkeypatch):
+        monkeypatch.setattr(acumulador_itens, "TAMANHO_LOTE", 2)
+        acumulador = AcumuladorItens()
+        for item in ITENS * 3:
+            acumulador.extend([item])
+        pd.testing.assert_frame_equal(acumulador.para_dataframe(), pd.DataFrame(ITENS * 3))
+
+    def test_blocos_concatenados_iguais_ao_dataframe(self):
+        acumulador = AcumuladorItens(ITENS * 3)
+        blocos = list(acumulador.blocos(4))
+        assert [len(b) for b in blocos] == [4, 4, 1]
+        # Uma fatia só com texto vira str no pandas 3, outra com ausentes fica object: só os valores importam
+        pd.testing.assert_frame_equal(pd.concat(blocos, ignore_index=True), acumulador.para_dataframe(),
+                                      check_dtype=False)
+        assert acumulador.colunas() == list(pd.DataFrame(ITENS).columns)
+
+    def test_valores_repetidos_guardados_uma_vez(self):
+        acumulador = AcumuladorItens(ITENS * 100)
+        acumulador.para_dataframe()
+        assert acumulador._colunas["chave_nfe"].distintos == ["A", "B"]
+
+    def test_itens_como_dicts(self):
+        acumulador = AcumuladorItens(ITENS)
+        assert len(acumulador) == 3
+        assert acumulador[1] == {"data": "01/03/2026", "produto": "CAFE", "qtd": 2.0, "loja": "MERCADO",
+                                 "chave_nfe": "A"}
+        assert [i["produto"] for i in acumulador] == ["LEITE", "CAFE", "LEITE"]
+
+    def test_vazio(self):
+        acumulador = AcumuladorItens()
+        assert len(acumulador) == 0
+        assert acumulador.para_dataframe().empty
@@ -0,0 +1,90 @@
+"""
+Testes para src/base_sqlite.py
+"""
+import pandas as pd
+import pytest
+from conftest import NFE_CHAVE
+from base_sqlite import BaseSqlite
+
+OUTRA_CHAVE = "2" * 44
+
+
+def _base(**alteracoes):
+    df = pd.DataFrame({
+        "data": ["01/03/2026", "01/03/2026", "05/03/2026", "06/03/2026"],
+        "loja": ["SUPER TESTE", "SUPER TESTE", "LOJA B", "FEIRA"],
+        "cnpj": ["06057223049189", "06057223049189", "11111111000111", ""],
+        "endereco": ["Rua A", "Rua A", "Rua B", ""],
+        "categoria": ["Laticínios", "Padaria", "Bebidas", "Outros"],
+        "produto": ["Leite", "Pão", "Café", "Banana"],
+        "produto_raw": ["LEITE 1L", "PAO", "CAFE 500G", "BANANA"],
+        "qtd": [1.0, 2.0, 1.0, 0.5],
+        "unidade": ["UN", "UN", "PCT", "KG"],
+        "preco_unit": [4.89, 0.5, 20.0, 6.0],
+        "preco_total": [4.89, 1.0, 20.0, 3.0],
+        "codigo": ["001", "002", "", ""],
+        "ean": ["789", "", "", ""],
+        "ncm": ["04011000", "", "", ""],
+        "chave_nfe": [NFE_CHAVE, NFE_CHAVE, OUTRA_CHAVE, ""],
+        "arquivo_origem": ["a.xml", "a.xml", "b.zip::b.xml", "feira.pdf"],
+    })
+    for coluna, valores in alteracoes.items():
+        df[coluna] = valores
+    return df
+
+
+class TestBaseSqlite:
+    def test_sincroniza_e_consulta(self):
+        base = BaseSqlite()
+        assert base.sincronizar(_base()) == (3, 0)
+        assert len(base) == 3
+
+        df = base.consultar_itens()
+        assert len(df) == 4
+        esperado = _base()
+        assert df["produto"].tolist() == esperado["produto"].tolist()
+        assert df["data"].iloc[0] == pd.Timestamp(2026, 3, 1)
+        assert df["loja"].tolist() == esperado["loja"].tolist()
+        assert df["preco_total"].tolist() == pytest.approx(esperado["preco_total"].tolist())
+
+    def test_filtros_na_consulta(self):
+        base = BaseSqlite()
+        base.sincronizar(_base())
+        assert base.consultar_itens(produtos=["Leite", "Café"])["produto"].tolist() == ["Leite", "Café"]
+        assert base.consultar_itens(inicio="2026-03-02", fim="2026-03-05")["produto"].tolist() == ["Café"]
+        assert base.consultar_itens(cnpj="06057223049189", origens=["a.xml"])["produto"].tolist() == ["Leite", "Pão"]
+        assert base.consultar_itens(produtos=[]).empty
+
+    def test_upsert_regrava_apenas_notas_alteradas(self):
+        base = BaseSqlite()
+        base.sincronizar(_base())
+        ids = dict(base._conn.execute("SELECT identificador, id FROM notas"))
+
+        assert base.sincronizar(_base()) == (0, 0)
+        alterada = _base(preco_total=[4.89, 1.5, 20.0, 3.0])
+        assert base.sincronizar(alterada) == (1, 0)
+        assert base.consultar_itens(produtos=["Pão"])["preco_total"].tolist() == [1.5]
+        assert dict(base._conn.execute("SELECT identificador, id FROM notas")) == ids
+
+    def test_notas_ausentes_sao_removidas(self):
+        base = BaseSqlite()
+        base.sincronizar(_base())
+        assert base.sincronizar(_base().iloc[:3]) == (0, 1)
+        assert base.consultar_itens()["produto"].tolist() == ["Leite", "Pão", "Café"]
+        assert base._conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0] == 3
+
+    def test_produtos_e_origens(self):
+        base = BaseSqlite()
+        base.sincronizar(_base())
+        assert sorted(base.produtos()) == ["BANANA", "CAFE 500G", "LEITE 1L", "PAO"]
+        assert base.origens() == {"a.xml", "b.zip::b.xml", "feira.pdf"}
+
+    def test_corresponde_ao_csv_exportado(self, tmp_path):
+        csv = tmp_path / "base.csv"
+        csv.write_text("a")
+        base = BaseSqlite(tmp_path / "base.sqlite")
+        assert not base.corresponde_a(csv)
+        base.marcar_exportacao(csv)
+        assert base.corresponde_a(csv)
+        csv.write_text("ab")
+        assert not base.corresponde_a(csv)
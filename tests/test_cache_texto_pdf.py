@@ -0,0 +1,98 @@
+"""
+Testes para src/cache_texto_pdf.py
+"""
+import io
+import os
+
+import pytest
+from conftest import XML_VALIDO, NFE_CHAVE
+from cache_texto_pdf import CacheTextoPdf, sha256_da_fonte
+from gerador_danfe import gerar_pdf_de_xml
+import processadorCuponsFiscais
+from processadorCuponsFiscais import _documentos_pdf
+
+
+def _nunca(chave, formato):
+    return False
+
+
+# ── sha256_da_fonte ────────────────────────────────────────────────────────────
+
+class TestSha256DaFonte:
+    def test_caminho_e_arquivo_aberto_coincidem(self, tmp_path):
+        caminho = tmp_path / "a.pdf"
+        caminho.write_bytes(b"%PDF-1.4 conteudo")
+        buffer = io.BytesIO(b"%PDF-1.4 conteudo")
+        buffer.read(4)
+        assert sha256_da_fonte(buffer) == sha256_da_fonte(caminho)
+        assert buffer.tell() == 0
+
+
+# ── CacheTextoPdf ──────────────────────────────────────────────────────────────
+
+class TestCacheTextoPdf:
+    def test_grava_e_le_entrada(self, tmp_path):
+        cache = CacheTextoPdf(tmp_path, "v1")
+        cache.gravar("abc", NFE_CHAVE, ["pagina 1", "página 2"])
+        assert cache.obter("abc") == {"chave": NFE_CHAVE, "paginas": ["pagina 1", "página 2"]}
+
+    def test_entrada_ausente(self, tmp_path):
+        assert CacheTextoPdf(tmp_path, "v1").obter("abc") is None
+
+    def test_outra_versao_nao_reaproveita(self, tmp_path):
+        CacheTextoPdf(tmp_path, "v1").gravar("abc", None, ["texto"])
+        assert CacheTextoPdf(tmp_path, "v2").obter("abc") is None
+
+    def test_poda_remove_outras_versoes(self, tmp_path):
+        CacheTextoPdf(tmp_path, "v1").gravar("abc", None, ["texto"])
+        atual = CacheTextoPdf(tmp_path, "v2")
+        atual.gravar("def", None, ["texto"])
+        assert atual.podar() == 1
+        assert atual.obter("def") is not None
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_poda_remove_menos_usadas_acima_do_limite(self, tmp_path):
+        cache = CacheTextoPdf(tmp_path, "v1")
+        for i, digest in enumerate(["a", "b", "c"]):
+            cache.gravar(digest, None, [os.urandom(2000).hex()])
+            os.utime(cache._caminho(digest), ns=(i * 10**9, i * 10**9))
+        tamanho = os.path.getsize(cache._caminho("a"))
+        cache.limite_bytes = 2 * tamanho + tamanho // 2
+
+        cache.obter("a")  # leitura recente protege "a"
+        assert cache.podar() == 1
+        assert cache.obter("b") is None
+        assert cache.obter("a") is not None
+        assert cache.obter("c") is not None
+
+
+# ── Integração com a extração de PDFs ──────────────────────────────────────────
+
+class TestDocumentosPdfComCache:
+    @pytest.fixture
+    def danfe_pdf(self, tmp_path):
+        caminho = tmp_path / "danfe.pdf"
+        gerar_pdf_de_xml(XML_VALIDO.encode("utf-8"), caminho)
+        return caminho
+
+    def test_segunda_leitura_nao_abre_o_pdf(self, tmp_path, danfe_pdf, monkeypatch):
+        cache = CacheTextoPdf(tmp_path / "cache", "v1")
+        primeiro = list(_documentos_pdf(danfe_pdf, "danfe.pdf", _nunca, cache))
+
+        def _falhar(*args, **kwargs):
+            raise AssertionError("PDF não deveria ser aberto")
+        monkeypatch.setattr(processadorCuponsFiscais.pdfplumber, "open", _falhar)
+
+        segundo = list(_documentos_pdf(io.BytesIO(danfe_pdf.read_bytes()), "z.zip::danfe.pdf", _nunca, cache))
+        assert segundo[0].chave == primeiro[0].chave == NFE_CHAVE
+        assert segundo[0].itens == [{**i, "arquivo_origem": "z.zip::danfe.pdf"} for i in primeiro[0].itens]
+
+    def test_pdf_pulado_grava_apenas_a_chave(self, tmp_path, danfe_pdf):
+        cache = CacheTextoPdf(tmp_path / "cache", "v1")
+        docs = list(_documentos_pdf(danfe_pdf, "danfe.pdf", lambda c, f: c == NFE_CHAVE, cache))
+        assert docs[0].itens is None
+        assert cache.obter(sha256_da_fonte(danfe_pdf)) == {"chave": NFE_CHAVE, "paginas": None}
+
+        # Chave deixou de ser conhecida: o texto é extraído e completa a entrada
+        list(_documentos_pdf(danfe_pdf, "danfe.pdf", _nunca, cache))
+        assert cache.obter(sha256_da_fonte(danfe_pdf))["paginas"]
@@ -0,0 +1,75 @@
+"""
+Testes para src/cache_xlsx.py
+"""
+import io
+import os
+
+import pytest
+from conftest import NFE_CHAVE
+import processadorCuponsFiscais
+from processadorCuponsFiscais import ProcessadorDeCupons
+from cache_texto_pdf import sha256_da_fonte
+import test_processador
+
+pytest.importorskip("pyarrow")
+from cache_xlsx import CacheXlsx  # noqa: E402
+
+
+@pytest.fixture
+def planilha():
+    return test_processador._xlsx_citizen(test_processador.TestImportadorCitizen.LINHAS)
+
+
+class TestCacheXlsx:
+    def test_entrada_ausente(self, tmp_path):
+        assert CacheXlsx(tmp_path, "1").obter("abc") is None
+
+    def test_grava_e_le_a_tabela(self, tmp_path, planilha):
+        chaves, itens = ProcessadorDeCupons._tabela_citizen(io.BytesIO(planilha))
+        cache = CacheXlsx(tmp_path, "1")
+        cache.gravar("abc", chaves, itens)
+
+        chaves_lidas, itens_lidos = cache.obter("abc")
+        assert chaves_lidas == chaves
+        assert itens_lidos.to_dict("records") == itens.to_dict("records")
+
+    def test_outra_versao_nao_reaproveita(self, tmp_path, planilha):
+        CacheXlsx(tmp_path, "1").gravar("abc", *ProcessadorDeCupons._tabela_citizen(io.BytesIO(planilha)))
+        assert CacheXlsx(tmp_path, "2").obter("abc") is None
+
+    def test_poda_remove_entradas_sem_fonte_e_de_outras_versoes(self, tmp_path, planilha):
+        tabela = ProcessadorDeCupons._tabela_citizen(io.BytesIO(planilha))
+        CacheXlsx(tmp_path, "1").gravar("velha", *tabela)
+        cache = CacheXlsx(tmp_path, "2")
+        for digest, origem in [("a", "a.xlsx"), ("b", "z.zip::b.xlsx")]:
+            cache.gravar(digest, *tabela)
+            cache.referenciar(origem, digest)
+
+        assert cache.podar(lambda origem: origem == "a.xlsx") == 2
+        assert cache.obter("a") is not None
+        assert cache.obter("b") is None
+        assert len(os.listdir(tmp_path / "referencias")) == 1
+
+
+class TestImportadorCitizenComCache:
+    def test_segunda_leitura_nao_abre_a_planilha(self, tmp_path, planilha, monkeypatch):
+        cache = CacheXlsx(tmp_path, "1")
+        primeiro = ProcessadorDeCupons._notas_do_xlsx_citizen(planilha, "citizen.xlsx", cache=cache)
+        assert cache.obter(sha256_da_fonte(io.BytesIO(planilha))) is not None
+
+        def _falhar(*args, **kwargs):
+            raise AssertionError("XLSX não deveria ser lido")
+        monkeypatch.setattr(processadorCuponsFiscais, "iterar_blocos_citizen", _falhar)
+
+        segundo = ProcessadorDeCupons._notas_do_xlsx_citizen(planilha, "citizen.xlsx", cache=cache)
+        assert segundo == primeiro == ProcessadorDeCupons._notas_do_xlsx_citizen(planilha, "citizen.xlsx",
+                                                                                cache=cache)
+
+    def test_chaves_conhecidas_descartadas_na_leitura_do_cache(self, tmp_path, planilha):
+        cache = CacheXlsx(tmp_path, "1")
+        ProcessadorDeCupons._notas_do_xlsx_citizen(planilha, "citizen.xlsx", cache=cache)
+
+        notas = ProcessadorDeCupons._notas_do_xlsx_citizen(
+            planilha, "outra.xlsx", lambda chave, formato: chave == NFE_CHAVE, cache)
+        assert notas[0] == (NFE_CHAVE, None)
+        assert notas[1][1][0]["arquivo_origem"] == "outra.xlsx"
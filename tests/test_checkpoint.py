@@ -0,0 +1,106 @@
+"""
+Testes para src/checkpoint.py
+"""
+import json
+
+from checkpoint import CheckpointIngestao
+
+PARAMETROS = {"pasta": "/notas", "completo": False, "incluir": [], "excluir": []}
+ASSINATURAS = {"lote.zip": (100, 1), "b.xml": (50, 2)}
+CHAVE_A = "1" * 44
+CHAVE_B = "2" * 44
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _checkpoint(tmp_path, intervalo=0.0, relogio=None):
+    checkpoint = CheckpointIngestao(tmp_path / "checkpoint", intervalo, relogio or Relogio())
+    checkpoint.iniciar(PARAMETROS, ASSINATURAS)
+    return checkpoint
+
+
+class TestCheckpointIngestao:
+    def test_grava_apenas_origens_concluidas(self, tmp_path):
+        checkpoint = _checkpoint(tmp_path)
+        checkpoint.documento("lote.zip::a.xml", [{"produto": "A"}], CHAVE_A, ".xml")
+        checkpoint.documento("lote.zip::b.xml", [{"produto": "B"}], CHAVE_B, ".xml")
+
+        retomada = CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS)
+        assert retomada.itens == [{"produto": "A"}]
+        assert retomada.chaves == {CHAVE_A: ("lote.zip::a.xml", ".xml", 1)}
+        assert retomada.concluidas == {"lote.zip::a.xml"}
+        assert retomada.assinaturas == ASSINATURAS
+
+    def test_copias_puladas(self, tmp_path):
+        checkpoint = _checkpoint(tmp_path)
+        checkpoint.documento("a.xml", [{"produto": "A"}], CHAVE_A, ".xml")
+        checkpoint.documento("lote.zip::a.pdf", chave=CHAVE_A, formato=".pdf", copia=True)
+        checkpoint.arquivo_concluido("lote.zip")
+
+        retomada = CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS)
+        assert retomada.copias == [(CHAVE_A, "lote.zip::a.pdf", ".pdf")]
+        assert set(retomada.chaves) == {CHAVE_A}
+
+    def test_origem_com_varias_notas_so_conclui_ao_trocar_de_origem(self, tmp_path):
+        checkpoint = _checkpoint(tmp_path)
+        checkpoint.documento("lote.xml", [{"produto": "A"}], CHAVE_A, ".xml")
+        checkpoint.documento("lote.xml", [{"produto": "B"}], CHAVE_B, ".xml")
+        assert CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS).itens == []
+
+        checkpoint.arquivo_concluido("lote.xml")
+        retomada = CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS)
+        assert len(retomada.itens) == 2
+        assert set(retomada.chaves) == {CHAVE_A, CHAVE_B}
+
+    def test_respeita_intervalo(self, tmp_path):
+        relogio = Relogio()
+        checkpoint = _checkpoint(tmp_path, intervalo=30, relogio=relogio)
+        checkpoint.arquivo_concluido("a.xml")
+        assert CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS).concluidas == set()
+
+        relogio.agora = 31
+        checkpoint.arquivo_concluido("b.xml")
+        assert CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS).concluidas == {"a.xml", "b.xml"}
+
+    def test_retomada_continua_a_numeracao(self, tmp_path):
+        checkpoint = _checkpoint(tmp_path)
+        checkpoint.documento("a.xml", [{"produto": "A"}], CHAVE_A, ".xml", substituida=True)
+        checkpoint.arquivo_concluido("a.xml")
+
+        retomado = CheckpointIngestao(tmp_path / "checkpoint", 0.0, Relogio())
+        retomado.carregar(PARAMETROS)
+        retomado.documento("b.xml", [{"produto": "B"}], CHAVE_B, ".pdf")
+        retomado.arquivo_concluido("b.xml")
+
+        retomada = CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS)
+        assert retomada.itens == [{"produto": "A"}, {"produto": "B"}]
+        assert retomada.substituidas == {CHAVE_A}
+        assert retomada.concluidas == {"a.xml", "b.xml"}
+
+    def test_parte_sem_estado_atualizado_e_ignorada(self, tmp_path):
+        checkpoint = _checkpoint(tmp_path)
+        checkpoint.arquivo_concluido("a.xml")
+        # Execução morreu depois de gravar a parte 2, antes do estado
+        (tmp_path / "checkpoint" / "parte_000002.json").write_text(
+            json.dumps({"itens": [{"produto": "X"}], "chaves": {}, "substituidas": [], "concluidas": ["b.xml"]}))
+
+        retomada = CheckpointIngestao(tmp_path / "checkpoint").carregar(PARAMETROS)
+        assert retomada.concluidas == {"a.xml"}
+        assert retomada.itens == []
+
+    def test_parametros_diferentes_ou_ausente(self, tmp_path):
+        _checkpoint(tmp_path).arquivo_concluido("a.xml")
+        assert CheckpointIngestao(tmp_path / "checkpoint").carregar({**PARAMETROS, "completo": True}) is None
+        assert CheckpointIngestao(tmp_path / "outro").carregar(PARAMETROS) is None
+
+    def test_descartar(self, tmp_path):
+        checkpoint = _checkpoint(tmp_path)
+        checkpoint.arquivo_concluido("a.xml")
+        checkpoint.descartar()
+        assert not (tmp_path / "checkpoint").exists()
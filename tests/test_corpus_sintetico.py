@@ -0,0 +1,32 @@
+"""
+Testes para benchmarks/corpus_sintetico.py
+"""
+import sys
+from pathlib import Path
+
+import processadorCuponsFiscais
+from processadorCuponsFiscais import ProcessadorDeCupons
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+from corpus_sintetico import gerar_corpus  # noqa: E402
+
+
+class TestCorpusSintetico:
+    def test_mesma_semente_mesmo_corpus(self, tmp_path):
+        gerar_corpus(tmp_path / "a", 40, semente=7, max_pdfs=0)
+        gerar_corpus(tmp_path / "b", 40, semente=7, max_pdfs=0)
+        nomes = sorted(f.name for f in (tmp_path / "a").iterdir())
+        assert nomes == sorted(f.name for f in (tmp_path / "b").iterdir())
+        assert all((tmp_path / "a" / n).read_bytes() == (tmp_path / "b" / n).read_bytes()
+                   for n in nomes if n.endswith(".xml"))
+
+    def test_ingestao_deduplica_para_os_itens_esperados(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        resumo = gerar_corpus(tmp_path / "notas", 60, semente=3, taxa_duplicatas=0.3, notas_por_zip=10,
+                              notas_por_xlsx=10, max_pdfs=2)
+        assert resumo.duplicatas == 18
+        assert resumo.arquivos["pdf"] == 2
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(tmp_path / "notas", completo=True)
+        assert p.exportar_csv() == resumo.itens
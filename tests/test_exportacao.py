@@ -0,0 +1,57 @@
+"""
+Testes para src/exportacao.py
+"""
+import pandas as pd
+import pytest
+from exportacao import ExportacaoEmBlocos
+from notas_itens import caminhos_notas_itens
+from test_base_sqlite import _base
+
+
+def _ler(caminho):
+    return pd.read_csv(caminho, sep=";", decimal=",", encoding="utf-8-sig", dtype=str, keep_default_na=False)
+
+
+class TestExportacaoEmBlocos:
+    def test_blocos_formam_um_unico_csv(self, tmp_path):
+        base = _base()
+        caminho = tmp_path / "base.csv"
+        with ExportacaoEmBlocos(caminho, parquet=False) as exportacao:
+            for inicio in range(0, len(base), 3):
+                exportacao.gravar(base.iloc[inicio:inicio + 3])
+            assert not caminho.exists()
+            exportacao.concluir()
+
+        assert exportacao.linhas == 4
+        inteiro = tmp_path / "inteiro.csv"
+        base.to_csv(inteiro, index=False, sep=";", decimal=",", encoding="utf-8-sig")
+        assert caminho.read_bytes() == inteiro.read_bytes()
+        assert list(tmp_path.glob("*.tmp")) == []
+
+    def test_parquet_de_notas_e_itens(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        caminho = tmp_path / "base.csv"
+        with ExportacaoEmBlocos(caminho) as exportacao:
+            exportacao.gravar(_base().iloc[:1])
+            exportacao.gravar(_base().iloc[1:])
+            exportacao.concluir()
+
+        caminho_notas, caminho_itens = caminhos_notas_itens(caminho)
+        notas, itens = pd.read_parquet(caminho_notas), pd.read_parquet(caminho_itens)
+        assert notas["qtd_itens"].tolist() == [2, 1, 1]
+        assert notas["data"].dtype.kind == "M"
+        assert itens["id_nota"].tolist() == [0, 0, 1, 2]
+        assert isinstance(itens["produto"].dtype, pd.CategoricalDtype)
+        # Parquet nunca mais antigo que o CSV (senão o dashboard volta a ler o CSV)
+        assert min(caminho_notas.stat().st_mtime_ns, caminho_itens.stat().st_mtime_ns) >= caminho.stat().st_mtime_ns
+
+    def test_falha_mantem_arquivos_anteriores(self, tmp_path):
+        caminho = tmp_path / "base.csv"
+        caminho.write_text("anterior", encoding="utf-8")
+        with pytest.raises(RuntimeError):
+            with ExportacaoEmBlocos(caminho) as exportacao:
+                exportacao.gravar(_base())
+                raise RuntimeError("falha no meio da exportação")
+
+        assert caminho.read_text(encoding="utf-8") == "anterior"
+        assert list(tmp_path.glob("*.tmp")) == []
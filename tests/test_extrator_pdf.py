@@ -0,0 +1,121 @@
+"""
+Testes para src/extratorPdf.py
+"""
+import pdfplumber
+import pytest
+from conftest import XML_VALIDO, NFE_CHAVE
+from extratorPdf import _buscar_chave, chave_valida, iterar_itens_danfe, sondar_chave_pdf
+from gerador_danfe import gerar_pdf_de_xml
+from processadorCuponsFiscais import ProcessadorDeCupons
+
+
+# Texto no formato da página de consulta da NFC-e impressa pelo navegador
+TEXTO_CONSULTA = """\
+08/06/2025, 10:32 NFC-e
+SUPERMERCADO BOM PRECO LTDA
+CNPJ: 06.057.223/0491-89
+AV BOA VIAGEM, 100, BOA VIAGEM, Recife, PE
+LEITE INTEGRAL 1L (Código: 7891234) Vl. Total
+Qtde.:2 UN: UN Vl. Unit.: 4,89 9,78
+ARROZ TIPO 1 5KG (Código: A123) Vl. Total
+Qtde.:1 UN: KG Vl. Unit.: 25,90 25,90
+https://nfce.sefaz.pe.gov.br/nfce/consulta 1/2
+08/06/2025, 10:32 NFC-e
+BISCOITO RECHEADO CHOCOLATE
+140G (Código: 555) Vl. Total
+Qtde.:3 UN: UN Vl. Unit.: 2,50 7,50
+Qtde. total de itens: 3
+"""
+
+
+@pytest.fixture
+def danfe_pdf(tmp_path):
+    caminho = tmp_path / "danfe.pdf"
+    gerar_pdf_de_xml(XML_VALIDO.encode("utf-8"), caminho)
+    return caminho
+
+
+# ── chave_valida / _buscar_chave ───────────────────────────────────────────────
+
+class TestChaveValida:
+    def test_chave_com_dv_correto(self):
+        assert chave_valida(NFE_CHAVE) is True
+
+    def test_dv_incorreto(self):
+        assert chave_valida(NFE_CHAVE[:-1] + "3") is False
+
+    def test_tamanho_incorreto(self):
+        assert chave_valida(NFE_CHAVE[:-1]) is False
+
+    def test_busca_ignora_espacos_de_formatacao(self):
+        formatada = " ".join(NFE_CHAVE[i:i + 4] for i in range(0, 44, 4))
+        assert _buscar_chave(f"CHAVE DE ACESSO {formatada}") == NFE_CHAVE
+
+    def test_busca_descarta_sequencia_com_dv_invalido(self):
+        assert _buscar_chave(NFE_CHAVE[:-1] + "3") is None
+
+
+# ── sondar_chave_pdf ───────────────────────────────────────────────────────────
+
+class TestSondarChavePdf:
+    def test_encontra_chave_do_danfe(self, danfe_pdf):
+        with pdfplumber.open(danfe_pdf) as pdf:
+            assert sondar_chave_pdf(pdf) == NFE_CHAVE
+
+    def test_concorda_com_extracao_de_texto(self, danfe_pdf):
+        with pdfplumber.open(danfe_pdf) as pdf:
+            texto = "\n".join(p.extract_text() or "" for p in pdf.pages)
+            assert sondar_chave_pdf(pdf) == ProcessadorDeCupons._extrair_chave_pdf(texto)
+
+    @pytest.mark.parametrize("linha, esperada", [
+        (f"Protocolo {NFE_CHAVE}", None),
+        (f"https://nfce.sefaz.pe.gov.br/nfce/consulta?p={NFE_CHAVE}|2|1|1|ABC", NFE_CHAVE),
+    ])
+    def test_sequencia_solta_so_vale_em_link(self, tmp_path, linha, esperada):
+        from reportlab.pdfgen import canvas
+        caminho = tmp_path / "solta.pdf"
+        folha = canvas.Canvas(str(caminho))
+        folha.drawString(40, 800, "DOCUMENTO AUXILIAR DA NFC-e")
+        folha.drawString(40, 780, linha)
+        folha.save()
+        with pdfplumber.open(caminho) as pdf:
+            assert sondar_chave_pdf(pdf) == esperada
+
+    def test_pdf_ja_lido_via_xml_e_pulado(self, danfe_pdf, capsys):
+        proc = ProcessadorDeCupons()
+        proc._chaves_processadas.add(NFE_CHAVE)
+        proc.processar_arquivo_pdf(danfe_pdf)
+        assert "[SKIP PDF]" in capsys.readouterr().out
+        assert len(proc.dados_consolidados) == 0
+
+
+# ── iterar_itens_danfe ─────────────────────────────────────────────────────────
+
+class TestIterarItensDanfe:
+    def test_extrai_todos_os_itens(self):
+        itens = list(iterar_itens_danfe(TEXTO_CONSULTA))
+        assert [i["codigo"] for i in itens] == ["7891234", "A123", "555"]
+        assert itens[0] == {"nome": "LEITE INTEGRAL 1L", "codigo": "7891234", "qtd": "2",
+                            "un": "UN", "vunit": "4,89", "vtotal": "9,78"}
+
+    def test_cabecalho_da_loja_nao_vaza_no_primeiro_item(self):
+        primeiro = next(iterar_itens_danfe(TEXTO_CONSULTA))
+        assert primeiro["nome"] == "LEITE INTEGRAL 1L"
+
+    def test_cabecalho_de_outra_uf(self):
+        texto = TEXTO_CONSULTA.replace("Recife, PE", "Campinas - SP")
+        assert next(iterar_itens_danfe(texto))["nome"] == "LEITE INTEGRAL 1L"
+
+    def test_quebra_de_pagina_e_nome_em_duas_linhas(self):
+        ultimo = list(iterar_itens_danfe(TEXTO_CONSULTA))[-1]
+        assert ultimo["nome"] == "BISCOITO RECHEADO CHOCOLATE 140G"
+
+    def test_texto_sem_itens(self):
+        assert list(iterar_itens_danfe("DOCUMENTO AUXILIAR DA NFC-e\nsem produtos")) == []
+
+    def test_processador_converte_valores(self):
+        itens = ProcessadorDeCupons._itens_do_texto_pdf(TEXTO_CONSULTA, "nota.pdf", NFE_CHAVE)
+        assert len(itens) == 3
+        assert itens[1]["produto"] == "ARROZ TIPO 1 5KG"
+        assert itens[1]["preco_total"] == pytest.approx(25.90)
+        assert itens[1]["data"] == "08/06/2025"
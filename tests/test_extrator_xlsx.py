@@ -0,0 +1,121 @@
+"""
+Testes para src/extratorXlsx.py
+"""
+import io
+import math
+import zipfile
+
+import pandas as pd
+import pytest
+from extratorXlsx import iterar_blocos_citizen, sondar_chaves_citizen
+
+
+def _planilha(linhas, aba="Notas Fiscais", outras_abas=()):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for nome in outras_abas:
+            pd.DataFrame([[1, 2]]).to_excel(writer, sheet_name=nome, index=False)
+        pd.DataFrame(linhas).to_excel(writer, sheet_name=aba, index=False, header=False)
+    buffer.seek(0)
+    return buffer
+
+
+CABECALHO = ["Chave", "Descricao", "Quantidade"]
+
+
+class TestIterarBlocosCitizen:
+    def test_cabecalho_encontrado_apos_linhas_de_titulo(self):
+        fonte = _planilha([["Exportação Citizen", None, None], CABECALHO, ["123", "LEITE", 2]])
+        blocos = list(iterar_blocos_citizen(fonte))
+        assert len(blocos) == 1
+        assert list(blocos[0].columns) == CABECALHO
+        assert blocos[0].iloc[0].tolist() == ["123", "LEITE", 2]
+
+    def test_cabecalho_na_primeira_linha(self):
+        fonte = _planilha([CABECALHO, ["123", "LEITE", 2]])
+        assert len(next(iterar_blocos_citizen(fonte))) == 1
+
+    def test_blocos_respeitam_o_tamanho(self):
+        linhas = [CABECALHO] + [[str(i), "ITEM", 1] for i in range(7)]
+        tamanhos = [len(b) for b in iterar_blocos_citizen(_planilha(linhas), tamanho_bloco=3)]
+        assert tamanhos == [3, 3, 1]
+
+    def test_valores_convertidos_como_no_read_excel(self):
+        fonte = _planilha([CABECALHO, ["123", "NA", 2.0], ["456", None, 1.5]])
+        bloco = next(iterar_blocos_citizen(fonte))
+        assert math.isnan(bloco.iloc[0]["Descricao"])
+        assert type(bloco.iloc[0]["Quantidade"]) is int
+        assert bloco.iloc[1]["Quantidade"] == 1.5
+        assert math.isnan(bloco.iloc[1]["Descricao"])
+
+    def test_le_apenas_a_aba_de_notas(self):
+        fonte = _planilha([CABECALHO, ["123", "LEITE", 2]], outras_abas=["Resumo"])
+        assert len(next(iterar_blocos_citizen(fonte))) == 1
+
+    def test_sem_aba_ou_sem_cabecalho_nao_gera_blocos(self):
+        assert list(iterar_blocos_citizen(_planilha([CABECALHO], aba="Outra"))) == []
+        assert list(iterar_blocos_citizen(_planilha([["sem", "cabecalho"]]))) == []
+
+
+def _planilha_com_textos_compartilhados(chaves):
+    """XLSX mínimo como o Excel grava: textos na tabela sharedStrings, chave na coluna B."""
+    textos = ["Chave", "Descricao"] + chaves
+    celulas = ['<row r="1"><c r="A1" t="inlineStr"><is><t>Exportação</t></is></c></row>',
+               '<row r="2"><c r="A2" t="s"><v>1</v></c><c r="B2" t="s"><v>0</v></c></row>']
+    for n in range(len(chaves)):
+        celulas.append(f'<row r="{n + 3}"><c r="A{n + 3}" t="inlineStr"><is><t>ITEM</t></is></c>'
+                       f'<c r="B{n + 3}" t="s"><v>{n + 2}</v></c></row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("[Content_Types].xml",
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                    '<Default Extension="xml" ContentType="application/xml"/>'
+                    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-'
+                    'officedocument.spreadsheetml.sheet.main+xml"/>'
+                    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-'
+                    'officedocument.spreadsheetml.worksheet+xml"/>'
+                    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-'
+                    'officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+        zf.writestr("_rels/.rels",
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    f'<Relationship Id="rId1" Type="{rel}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        zf.writestr("xl/workbook.xml",
+                    f'<workbook {ns} xmlns:r="{rel}"><sheets>'
+                    '<sheet name="Notas Fiscais" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr("xl/_rels/workbook.xml.rels",
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    f'<Relationship Id="rId1" Type="{rel}/worksheet" Target="worksheets/sheet1.xml"/>'
+                    f'<Relationship Id="rId2" Type="{rel}/sharedStrings" Target="sharedStrings.xml"/>'
+                    '</Relationships>')
+        zf.writestr("xl/sharedStrings.xml",
+                    f'<sst {ns}>' + "".join(f"<si><t>{t}</t></si>" for t in textos) + "</sst>")
+        zf.writestr("xl/worksheets/sheet1.xml", f'<worksheet {ns}><sheetData>{"".join(celulas)}</sheetData></worksheet>')
+    buffer.seek(0)
+    return buffer
+
+
+class TestSondarChavesCitizen:
+    def test_chaves_distintas_na_ordem(self):
+        linhas = [["Exportação Citizen", None, None], CABECALHO,
+                  ["222", "LEITE", 2], ["111", "PAO", 1], ["222", "CAFE", 1], [None, "MANUAL", 1]]
+        assert sondar_chaves_citizen(_planilha(linhas)) == ["222", "111"]
+
+    def test_textos_compartilhados_como_na_leitura_completa(self):
+        chaves = ["3" * 44, "4" * 44, "3" * 44]
+        fonte = _planilha_com_textos_compartilhados(chaves)
+        completas = [c for b in iterar_blocos_citizen(fonte) for c in b["Chave"]]
+        assert completas == chaves
+        assert sondar_chaves_citizen(fonte) == ["3" * 44, "4" * 44]
+
+    @pytest.mark.parametrize("tamanho_bloco", [16, 64])
+    def test_blocos_pequenos_cortando_celulas(self, tamanho_bloco):
+        linhas = [CABECALHO] + [[str(10 ** 12 + i), "ITEM", 1] for i in range(50)]
+        esperado = [str(10 ** 12 + i) for i in range(50)]
+        assert sondar_chaves_citizen(_planilha(linhas), tamanho_bloco=tamanho_bloco) == esperado
+
+    def test_sem_aba_ou_sem_cabecalho(self):
+        assert sondar_chaves_citizen(_planilha([CABECALHO, ["1", "A", 1]], aba="Outra")) == []
+        assert sondar_chaves_citizen(_planilha([["x", "y", "z"]])) == []
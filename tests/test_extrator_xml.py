@@ -1,6 +1,9 @@
 """
 Testes para src/extratorXml.py
 """
+import io
+import tracemalloc
+
 import pytest
 from conftest import XML_VALIDO, XML_SEM_CHAVE, XML_MALFORMADO, NFE_CHAVE
 from extratorXml import (
@@ -8,6 +11,10 @@ from extratorXml import (
     _parse_data,
     extrair_chave_do_xml,
     extrair_itens_do_xml,
+    extrair_nota_do_xml,
+    iterar_itens_do_xml,
+    iterar_notas_do_xml,
+    sondar_chaves_xml,
 )
 
 
@@ -140,3 +147,116 @@ class TestExtrairItensDoXml:
     def test_xml_bytes(self):
         itens = extrair_itens_do_xml(XML_VALIDO.encode("utf-8"), "bytes.xml")
         assert len(itens) == 2
+
+
+# ── extrair_nota_do_xml (parse único) ──────────────────────────────────────────
+
+class TestExtrairNotaDoXml:
+    def setup_method(self):
+        self.nota = extrair_nota_do_xml(XML_VALIDO.encode("utf-8"), "nota_teste.xml")
+
+    def test_chave(self):
+        assert self.nota["chave"] == NFE_CHAVE
+
+    def test_cabecalho(self):
+        assert self.nota["cabecalho"] == {
+            "data": "01/03/2026",
+            "loja": "SUPER TESTE",
+            "cnpj": "06057223049189",
+            "endereco": "Rua das Flores, 123, Centro, Recife - PE, CEP 50000000",
+            "chave_nfe": NFE_CHAVE,
+        }
+
+    def test_itens_iguais_ao_extrator_de_itens(self):
+        assert self.nota["itens"] == extrair_itens_do_xml(XML_VALIDO, "nota_teste.xml")
+
+    def test_bytes_latin1_com_declaracao_de_encoding(self):
+        xml = XML_VALIDO.replace('encoding="UTF-8"', 'encoding="ISO-8859-1"').replace("PAO FRANCES", "PÃO FRANCÊS")
+        nota = extrair_nota_do_xml(xml.encode("latin-1"), "latin1.xml")
+        assert nota["itens"][1]["produto"] == "PÃO FRANCÊS"
+
+    def test_bytes_invalidos_usam_fallback(self):
+        xml = XML_VALIDO.encode("utf-8").replace(b"PAO FRANCES", b"PAO FRANC\xc3S")
+        nota = extrair_nota_do_xml(xml, "corrompido.xml")
+        assert nota["chave"] == NFE_CHAVE
+        assert len(nota["itens"]) == 2
+
+    def test_xml_sem_chave(self):
+        nota = extrair_nota_do_xml(XML_SEM_CHAVE, "sem_chave.xml")
+        assert nota["chave"] is None
+        assert nota["itens"] == []
+
+    def test_xml_malformado(self):
+        assert extrair_nota_do_xml(XML_MALFORMADO, "ruim.xml") == {"chave": None, "cabecalho": {}, "itens": []}
+
+
+# ── Modo streaming (iterar_itens_do_xml / iterar_notas_do_xml) ─────────────────
+
+OUTRA_CHAVE = "1" * 44
+
+
+def _nfe_atacado(n_itens: int) -> bytes:
+    """NF-e com ``n_itens`` cópias do primeiro <det> do XML_VALIDO."""
+    inicio = XML_VALIDO.index('<det nItem="1">')
+    fim = XML_VALIDO.index('<det nItem="2">')
+    return (XML_VALIDO[:inicio] + XML_VALIDO[inicio:fim] * n_itens + XML_VALIDO[fim:]).encode("utf-8")
+
+
+class TestStreaming:
+    def test_itens_iguais_ao_modo_dom(self):
+        assert list(iterar_itens_do_xml(XML_VALIDO.encode("utf-8"), "nota.xml")) == \
+            extrair_itens_do_xml(XML_VALIDO, "nota.xml")
+
+    def test_aceita_caminho_e_arquivo_aberto(self, tmp_path):
+        caminho = tmp_path / "nota.xml"
+        caminho.write_text(XML_VALIDO, encoding="utf-8")
+        assert len(list(iterar_itens_do_xml(caminho, "nota.xml"))) == 2
+        with open(caminho, "rb") as f:
+            assert len(list(iterar_itens_do_xml(f, "nota.xml"))) == 2
+
+    def test_lote_concatenado_gera_uma_nota_por_documento(self):
+        lote = (XML_VALIDO + XML_VALIDO.replace(NFE_CHAVE, OUTRA_CHAVE)).encode("utf-8")
+        notas = list(iterar_notas_do_xml(lote, "lote.xml"))
+        assert [n["chave"] for n in notas] == [NFE_CHAVE, OUTRA_CHAVE]
+        assert [len(n["itens"]) for n in notas] == [2, 2]
+        assert notas[1]["itens"][0]["chave_nfe"] == OUTRA_CHAVE
+
+    @pytest.mark.parametrize("tamanho_bloco", [1, 7, 64])
+    def test_blocos_pequenos_cortando_declaracoes(self, tamanho_bloco):
+        lote = (XML_VALIDO * 3).encode("utf-8")
+        notas = list(iterar_notas_do_xml(io.BytesIO(lote), "lote.xml", tamanho_bloco=tamanho_bloco))
+        assert len(notas) == 3
+        assert notas[0]["cabecalho"]["loja"] == "SUPER TESTE"
+
+    def test_xml_malformado_nao_gera_itens(self):
+        assert list(iterar_itens_do_xml(XML_MALFORMADO.encode("utf-8"), "ruim.xml")) == []
+
+    def test_memoria_constante_com_o_numero_de_itens(self):
+        def pico(conteudo):
+            tracemalloc.start()
+            for _ in iterar_itens_do_xml(conteudo, "atacado.xml"):
+                pass
+            _, maximo = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return maximo
+
+        pequeno, grande = _nfe_atacado(200), _nfe_atacado(2_000)
+        # 10x mais itens não pode significar 10x mais memória (no DOM seria)
+        assert pico(grande) < 2 * pico(pequeno)
+
+
+# ── sondar_chaves_xml ──────────────────────────────────────────────────────────
+
+class TestSondarChavesXml:
+    def test_uma_chave_por_nota_sem_parse(self):
+        lote = (XML_VALIDO + XML_VALIDO.replace(NFE_CHAVE, OUTRA_CHAVE)).encode("utf-8")
+        assert sondar_chaves_xml(lote) == [NFE_CHAVE, OUTRA_CHAVE]
+
+    def test_nota_sem_id_e_arquivo_sem_nota(self):
+        assert sondar_chaves_xml(XML_SEM_CHAVE.encode("utf-8")) == [None]
+        assert sondar_chaves_xml(XML_MALFORMADO.encode("utf-8")) == []
+
+    @pytest.mark.parametrize("tamanho_bloco", [1, 7, 64])
+    def test_blocos_pequenos_cortando_a_tag(self, tamanho_bloco):
+        lote = (XML_VALIDO * 3).encode("utf-8")
+        assert sondar_chaves_xml(io.BytesIO(lote), tamanho_bloco=tamanho_bloco) == [NFE_CHAVE] * 3
@@ -0,0 +1,72 @@
+"""
+Testes para src/indice_chaves.py
+"""
+from conftest import NFE_CHAVE
+from indice_chaves import IndiceChaves, separar_origem
+
+
+class TestSepararOrigem:
+    def test_arquivo_avulso(self):
+        assert separar_origem("nota.xml") == ("nota.xml", "")
+
+    def test_membro_de_zip_aninhado(self):
+        assert separar_origem("lote.zip::2024/inner.zip::a.xml") == ("lote.zip", "2024/inner.zip::a.xml")
+
+
+class TestIndiceChaves:
+    def test_registrar_e_consultar(self):
+        indice = IndiceChaves()
+        indice.registrar(NFE_CHAVE, "lote.zip::nota.xml", ".xml", 2)
+
+        assert NFE_CHAVE in indice
+        origem = indice.origem(NFE_CHAVE)
+        assert origem["arquivo"] == "lote.zip"
+        assert origem["membro"] == "nota.xml"
+        assert origem["formato"] == ".xml"
+        assert origem["qtd_itens"] == 2
+        assert origem["ingerido_em"]
+
+    def test_chave_desconhecida(self):
+        indice = IndiceChaves()
+        assert "0" * 44 not in indice
+        assert indice.origem("0" * 44) is None
+
+    def test_manter_apenas_remove_origens_filtradas(self):
+        indice = IndiceChaves()
+        indice.registrar("1" * 44, "a.xml", ".xml", 1)
+        indice.registrar("2" * 44, "lote.zip::b.pdf", ".pdf", 1)
+
+        removidas = indice.manter_apenas(lambda origem: origem == "a.xml")
+
+        assert removidas == 1
+        assert indice.chaves() == {"1" * 44}
+
+    def test_origens_orfas_das_copias(self):
+        indice = IndiceChaves()
+        indice.registrar("1" * 44, "a.xml", ".xml", 1)
+        indice.registrar("2" * 44, "b.xml", ".xml", 1)
+        indice.registrar_copia("1" * 44, "citizen.xlsx", ".xlsx")
+        indice.registrar_copia("2" * 44, "lote.zip::danfe.pdf", ".pdf")
+
+        # a.xml removido: a cópia em citizen.xlsx (inalterado) precisa ser relida
+        mantida = lambda origem: origem != "a.xml"
+        assert indice.origens_orfas(mantida) == {"citizen.xlsx"}
+        indice.manter_apenas(mantida)
+        assert indice.chaves() == {"2" * 44}
+
+        # Cópias de origens que saíram também saem do índice
+        indice.manter_apenas(lambda origem: origem == "b.xml")
+        assert indice.origens_orfas(lambda origem: True) == set()
+
+    def test_persistencia_somente_apos_salvar(self, tmp_path):
+        caminho = tmp_path / "indice.sqlite"
+        indice = IndiceChaves(caminho)
+        indice.registrar(NFE_CHAVE, "nota.xml", ".xml", 2)
+        indice.fechar()  # sem salvar: alteração descartada
+        assert len(IndiceChaves(caminho)) == 0
+
+        indice = IndiceChaves(caminho)
+        indice.registrar(NFE_CHAVE, "nota.xml", ".xml", 2)
+        indice.salvar()
+        indice.fechar()
+        assert NFE_CHAVE in IndiceChaves(caminho)
@@ -0,0 +1,117 @@
+"""
+Testes para src/manifesto.py
+"""
+import json
+import os
+
+from manifesto import ManifestoIngestao, MudancasPasta, gravar_json_atomico
+
+EXTENSOES = {".xml", ".pdf", ".zip", ".xlsx"}
+
+
+def _manifesto_da_pasta(pasta):
+    manifesto = ManifestoIngestao()
+    for arquivo in sorted(pasta.iterdir()):
+        manifesto.entradas[arquivo.name] = manifesto.verificar(arquivo.name, arquivo)[1]
+    return manifesto
+
+
+class TestVerificar:
+    def test_novo_inalterado_e_alterado(self, tmp_path):
+        arquivo = tmp_path / "a.xml"
+        arquivo.write_text("<nfe>1</nfe>")
+        manifesto = ManifestoIngestao()
+        situacao, entrada = manifesto.verificar("a.xml", arquivo)
+        assert situacao == "novo"
+        manifesto.entradas["a.xml"] = entrada
+
+        assert manifesto.verificar("a.xml", arquivo)[0] == "inalterado"
+        arquivo.write_text("<nfe>2</nfe>")
+        assert manifesto.verificar("a.xml", arquivo)[0] == "alterado"
+
+
+class TestCompararPasta:
+    def test_pasta_igual_ao_manifesto(self, tmp_path):
+        (tmp_path / "a.xml").write_text("<nfe>1</nfe>")
+        mudancas = _manifesto_da_pasta(tmp_path).comparar_pasta(tmp_path, EXTENSOES)
+        assert mudancas == MudancasPasta([], [], {}, {}, [])
+        assert not mudancas
+
+    def test_classifica_novo_alterado_renomeado_copia_e_removido(self, tmp_path):
+        for nome, conteudo in [("a.xml", "A"), ("b.xml", "B"), ("c.pdf", "C"), ("d.xml", "D")]:
+            (tmp_path / nome).write_text(conteudo)
+        manifesto = _manifesto_da_pasta(tmp_path)
+
+        (tmp_path / "a.xml").write_text("A alterado")
+        (tmp_path / "b.xml").rename(tmp_path / "b-renomeado.xml")
+        (tmp_path / "copia-de-c.pdf").write_text("C")
+        (tmp_path / "d.xml").unlink()
+        (tmp_path / "e.zip").write_bytes(b"novo")
+        (tmp_path / "leia-me.txt").write_text("ignorado")
+
+        mudancas = manifesto.comparar_pasta(tmp_path, EXTENSOES)
+        assert mudancas.novos == ["e.zip"]
+        assert mudancas.alterados == ["a.xml"]
+        assert mudancas.renomeados == {"b-renomeado.xml": "b.xml"}
+        assert mudancas.duplicados == {"copia-de-c.pdf": "c.pdf"}
+        assert mudancas.removidos == ["d.xml"]
+        assert mudancas.pendentes == ["a.xml", "e.zip"]
+
+    def test_arquivo_substituido_com_mesmo_nome(self, tmp_path):
+        arquivo = tmp_path / "a.xml"
+        arquivo.write_text("AAAA")
+        manifesto = _manifesto_da_pasta(tmp_path)
+        arquivo.write_text("BBBB")
+        stat = manifesto.entradas["a.xml"]
+        os.utime(arquivo, ns=(stat["mtime"], stat["mtime"] + 1))
+        assert manifesto.comparar_pasta(tmp_path, EXTENSOES).alterados == ["a.xml"]
+
+    def test_touch_nao_conta_como_alteracao(self, tmp_path):
+        arquivo = tmp_path / "a.xml"
+        arquivo.write_text("A")
+        manifesto = _manifesto_da_pasta(tmp_path)
+        os.utime(arquivo, ns=(0, manifesto.entradas["a.xml"]["mtime"] + 10**9))
+        assert not manifesto.comparar_pasta(tmp_path, EXTENSOES)
+
+    def test_so_le_arquivos_que_mudaram(self, tmp_path, monkeypatch):
+        import manifesto as modulo
+        (tmp_path / "a.xml").write_text("A")
+        manifesto = _manifesto_da_pasta(tmp_path)
+        (tmp_path / "novo.xml").write_text("N")
+        lidos = []
+        original = modulo.calcular_sha256
+        monkeypatch.setattr(modulo, "calcular_sha256", lambda caminho: lidos.append(caminho.name) or original(caminho))
+
+        hashes = {}
+        manifesto.comparar_pasta(tmp_path, EXTENSOES, hashes)
+        manifesto.comparar_pasta(tmp_path, EXTENSOES, hashes)
+        assert lidos == ["novo.xml"]
+
+    def test_pasta_inexistente(self, tmp_path):
+        mudancas = ManifestoIngestao().comparar_pasta(tmp_path / "nao_existe", EXTENSOES)
+        assert not mudancas
+
+    def test_subpastas_pelo_caminho_relativo(self, tmp_path):
+        (tmp_path / "2024").mkdir()
+        (tmp_path / "2024" / "a.xml").write_text("A")
+        manifesto = ManifestoIngestao()
+        manifesto.entradas["2024/a.xml"] = manifesto.verificar("2024/a.xml", tmp_path / "2024" / "a.xml")[1]
+
+        (tmp_path / "2024" / "a.xml").rename(tmp_path / "a.xml")
+        (tmp_path / "2024" / "b.pdf").write_text("B")
+        mudancas = manifesto.comparar_pasta(tmp_path, EXTENSOES)
+        assert mudancas.renomeados == {"a.xml": "2024/a.xml"}
+        assert mudancas.novos == ["2024/b.pdf"]
+
+
+class TestGravarJsonAtomico:
+    def test_cria_a_pasta_e_nao_deixa_temporario(self, tmp_path):
+        caminho = tmp_path / "saida" / "status.json"
+        gravar_json_atomico(caminho, {"loja": "PÃO DE AÇÚCAR"})
+        assert "PÃO DE AÇÚCAR" in caminho.read_text(encoding="utf-8")
+        assert os.listdir(caminho.parent) == ["status.json"]
+
+    def test_default_converte_valores(self, tmp_path):
+        caminho = tmp_path / "a.json"
+        gravar_json_atomico(caminho, {"valor": {1, 2}}, default=sorted)
+        assert json.loads(caminho.read_text(encoding="utf-8")) == {"valor": [1, 2]}
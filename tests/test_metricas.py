@@ -0,0 +1,63 @@
+"""
+Testes para src/metricas.py
+"""
+import json
+import time
+
+from metricas import MetricasIngestao, coletar, medir, medir_iteracao
+
+
+class TestCronometro:
+    def test_medir_acumula_por_etapa(self):
+        coletar()
+        with medir("parse"):
+            time.sleep(0.01)
+        with medir("parse"):
+            pass
+        etapas = coletar()
+        assert set(etapas) == {"parse"}
+        assert etapas["parse"] >= 0.01
+        assert coletar() == {}
+
+    def test_iteracao_nao_conta_o_tempo_do_consumidor(self):
+        coletar()
+
+        def _gerar():
+            yield 1
+            time.sleep(0.01)
+            yield 2
+
+        for _ in medir_iteracao("parse", _gerar()):
+            time.sleep(0.05)
+        etapas = coletar()
+        assert 0.01 <= etapas["parse"] < 0.05
+
+
+class TestMetricasIngestao:
+    def _metricas(self):
+        metricas = MetricasIngestao()
+        metricas.registrar_arquivo("lento.pdf", 2 * 1024 * 1024, 10, 2.0, {"parse": 1.5, "sonda_chave": 0.5})
+        metricas.registrar_arquivo("rapido.xml", 1024 * 1024, 30, 0.5, {"parse": 0.5})
+        metricas.registrar_etapas({"exportacao": 0.5})
+        metricas.finalizar()
+        metricas.duracao = 3.0
+        return metricas
+
+    def test_relatorio(self):
+        relatorio = self._metricas().relatorio()
+        assert relatorio["arquivos"] == 2
+        assert relatorio["itens"] == 40
+        assert relatorio["arquivos_por_segundo"] == round(2 / 3, 3)
+        assert relatorio["mb_por_segundo"] == 1.0
+        assert relatorio["etapas_segundos"]["parse"] == 2.0
+        assert relatorio["etapas_segundos"]["exportacao"] == 0.5
+        assert [a["arquivo"] for a in relatorio["mais_lentos"]] == ["lento.pdf", "rapido.xml"]
+
+    def test_resumo_e_json(self, tmp_path):
+        metricas = self._metricas()
+        resumo = metricas.resumo(mais_lentos=1)
+        assert "2 arquivo(s), 40 item(ns)" in resumo
+        assert "lento.pdf" in resumo and "rapido.xml" not in resumo
+
+        metricas.salvar(tmp_path / "metricas.json")
+        assert json.loads((tmp_path / "metricas.json").read_text())["itens"] == 40
@@ -0,0 +1,46 @@
+"""
+Testes para src/notas_itens.py
+"""
+import pandas as pd
+import pytest
+from notas_itens import SeparadorNotas, caminhos_notas_itens, juntar_notas_itens, separar_notas
+from conftest import NFE_CHAVE
+from test_base_sqlite import OUTRA_CHAVE, _base
+
+
+class TestSepararNotas:
+    def test_uma_linha_por_nota(self):
+        notas, itens = separar_notas(_base())
+        assert notas["identificador"].tolist() == [NFE_CHAVE, OUTRA_CHAVE, "feira.pdf|06/03/2026|FEIRA"]
+        assert notas["id_nota"].tolist() == [0, 1, 2]
+        assert itens["id_nota"].tolist() == [0, 0, 1, 2]
+        assert "loja" not in itens.columns and "produto" not in notas.columns
+
+    def test_totais_por_nota(self):
+        notas, _ = separar_notas(_base())
+        assert notas["qtd_itens"].tolist() == [2, 1, 1]
+        assert notas["valor_total"].tolist() == pytest.approx([5.89, 20.0, 3.0])
+
+
+class TestSeparadorNotas:
+    def test_blocos_iguais_a_base_inteira(self):
+        # A nota de NFE_CHAVE fica dividida entre o primeiro e o segundo bloco
+        base = pd.concat([_base(), _base()], ignore_index=True)
+        separador = SeparadorNotas()
+        itens = pd.concat([separador.itens(base.iloc[i:i + 3].reset_index(drop=True)) for i in range(0, len(base), 3)],
+                          ignore_index=True)
+        notas_esperadas, itens_esperados = separar_notas(base)
+        pd.testing.assert_frame_equal(separador.notas(), notas_esperadas)
+        pd.testing.assert_frame_equal(itens, itens_esperados)
+        assert separador.notas()["qtd_itens"].tolist() == [4, 2, 2]
+
+
+class TestJuntarNotasItens:
+    def test_reconstroi_a_base(self):
+        base = _base()
+        pd.testing.assert_frame_equal(juntar_notas_itens(*separar_notas(base)), base)
+
+
+def test_caminhos_derivados_do_csv(tmp_path):
+    notas, itens = caminhos_notas_itens(tmp_path / "teste.csv")
+    assert (notas.name, itens.name) == ("teste_notas.parquet", "teste_itens.parquet")
@@ -104,7 +104,7 @@ class TestProcessarArquivoXml:
         p = ProcessadorDeCupons()
         # Não deve propagar exceção — apenas logar o erro
         p.processar_arquivo_xml(tmp_path / "nao_existe.xml")
-        assert p.dados_consolidados == []
+        assert len(p.dados_consolidados) == 0
 
 
 # ── processar_zip — prioridade XML sobre PDF ───────────────────────────────────
@@ -166,7 +166,7 @@ class TestExportarCsv:
         monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(raiz / "src" / "processadorCuponsFiscais.py"))
 
         p = ProcessadorDeCupons()
-        p.dados_consolidados = [{
+        p.dados_consolidados.extend([{
             "data": "01/03/2026",
             "produto": "LEITE INTEGRAL UHT 1L",
             "qtd": 1.0,
@@ -175,10 +175,702 @@ class TestExportarCsv:
             "preco_total": 4.89,
             "codigo": "001",
             "arquivo_origem": "citizen.xlsx",
-        }]
+        }])
 
         p.exportar_csv("teste.csv")
 
         df = pd.read_csv(raiz / "resources" / "outputData" / "teste.csv", sep=";", encoding="utf-8-sig")
         assert "produto_raw" in df.columns
         assert df.loc[0, "produto_raw"] == "LEITE INTEGRAL UHT 1L"
+
+    def test_exporta_parquet_tipado(self, tmp_path, monkeypatch):
+        pytest.importorskip("pyarrow")
+        (tmp_path / "src").mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+
+        p = ProcessadorDeCupons()
+        xml_file = tmp_path / "nota.xml"
+        xml_file.write_text(XML_VALIDO, encoding="utf-8")
+        p.processar_arquivo_xml(xml_file)
+        p.exportar_csv("teste.csv")
+
+        pasta_saida = tmp_path / "resources" / "outputData"
+        notas = pd.read_parquet(pasta_saida / "teste_notas.parquet")
+        itens = pd.read_parquet(pasta_saida / "teste_itens.parquet")
+        assert len(notas) == 1 and len(itens) == 2
+        assert notas["qtd_itens"].tolist() == [2]
+        assert notas["data"].dtype.kind == "M"
+        assert notas["cnpj"].iloc[0] == "06057223049189"
+        assert isinstance(notas["loja"].dtype, pd.CategoricalDtype)
+        assert itens["id_nota"].tolist() == [0, 0]
+        assert itens["preco_total"].dtype == "float64"
+        assert isinstance(itens["produto"].dtype, pd.CategoricalDtype)
+        assert notas["valor_total"].iloc[0] == pytest.approx(itens["preco_total"].sum())
+
+    def test_exporta_base_sqlite_sincronizada(self, tmp_path, monkeypatch):
+        from utils import abrir_base_sqlite
+        (tmp_path / "src").mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        xml_file = tmp_path / "nota.xml"
+        xml_file.write_text(XML_VALIDO, encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.processar_arquivo_xml(xml_file)
+        p.exportar_csv(sqlite=True)
+
+        pasta_saida = tmp_path / "resources" / "outputData"
+        base = abrir_base_sqlite(pasta_saida)
+        assert base is not None
+        try:
+            itens = base.consultar_itens(produtos=["LEITE INTEGRAL 1L"])
+        finally:
+            base.fechar()
+        assert itens["chave_nfe"].tolist() == [NFE_CHAVE]
+        assert itens["cnpj"].tolist() == ["06057223049189"]
+
+        # CSV regravado sem --sqlite: a base deixa de ser usada
+        outro = ProcessadorDeCupons()
+        outro.processar_arquivo_xml(xml_file)
+        outro.exportar_csv()
+        assert abrir_base_sqlite(pasta_saida) is None
+
+    def test_exporta_em_blocos_com_base_anterior(self, tmp_path, monkeypatch):
+        (tmp_path / "src").mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        pasta = tmp_path / "notas"
+        pasta.mkdir()
+        (pasta / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        csv = tmp_path / "resources" / "outputData" / "minha_inflacao.csv"
+
+        def _exportar(completo, tamanho_bloco):
+            monkeypatch.setattr(processadorCuponsFiscais, "TAMANHO_BLOCO_EXPORTACAO", tamanho_bloco)
+            p = ProcessadorDeCupons()
+            p.varrer_diretorio(pasta, completo=completo)
+            itens = p.exportar_csv(reter_novos=True)
+            p.fechar()
+            return p, itens
+
+        _exportar(completo=True, tamanho_bloco=50_000)
+        (pasta / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+
+        # Base anterior (a.xml) e itens novos (b.xml) em blocos de um item
+        p, itens = _exportar(completo=False, tamanho_bloco=1)
+        assert itens == 4
+        assert p._novos_exportados["arquivo_origem"].tolist() == ["b.xml", "b.xml"]
+        em_blocos = csv.read_bytes()
+
+        _exportar(completo=True, tamanho_bloco=50_000)
+        assert csv.read_bytes() == em_blocos
+        assert list(csv.parent.glob("*.tmp")) == []
+
+
+# ── Ingestão incremental (manifesto) ───────────────────────────────────────────
+
+OUTRA_CHAVE = '26260306057223049189650130001286971130309999'
+
+
+def _xml_outra_nota(produto="CAFE TORRADO 500G"):
+    return XML_VALIDO.replace(NFE_CHAVE, OUTRA_CHAVE).replace("LEITE INTEGRAL 1L", produto)
+
+
+class TestIngestaoIncremental:
+    @pytest.fixture
+    def raiz(self, tmp_path, monkeypatch):
+        (tmp_path / "src").mkdir()
+        (tmp_path / "notas").mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        return tmp_path
+
+    def _rodar(self, raiz, completo=False):
+        with ProcessadorDeCupons() as p:
+            p.varrer_diretorio(raiz / "notas", completo=completo)
+            p.exportar_csv()
+        return p
+
+    def _csv(self, raiz):
+        return pd.read_csv(raiz / "resources" / "outputData" / "minha_inflacao.csv",
+                           sep=";", decimal=",", encoding="utf-8-sig", dtype={"chave_nfe": str})
+
+    def test_manifesto_gravado_apos_exportacao(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        assert (raiz / "resources" / "outputData" / "manifesto_ingestao.json").exists()
+
+    def test_arquivo_inalterado_nao_e_relido(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+
+        p = self._rodar(raiz)
+
+        # Apenas os itens do arquivo novo foram extraídos nesta execução
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"b.xml"}
+        df = self._csv(raiz)
+        assert len(df) == 4
+        assert set(df["arquivo_origem"]) == {"a.xml", "b.xml"}
+
+    def test_resumo_do_plano_incremental(self, raiz, capsys):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        assert "Incremental:" not in capsys.readouterr().out
+        (raiz / "notas" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+
+        self._rodar(raiz)
+
+        assert "Incremental: 1 arquivo(s) novo(s) ou alterado(s), 1 inalterado(s)" in capsys.readouterr().out
+
+    def test_arquivo_alterado_substitui_itens_antigos(self, raiz):
+        arquivo = raiz / "notas" / "a.xml"
+        arquivo.write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        arquivo.write_text(XML_VALIDO.replace("LEITE INTEGRAL 1L", "LEITE DESNATADO 1L"), encoding="utf-8")
+
+        self._rodar(raiz)
+
+        produtos = set(self._csv(raiz)["produto"])
+        assert "LEITE DESNATADO 1L" in produtos
+        assert "LEITE INTEGRAL 1L" not in produtos
+
+    def test_arquivo_removido_sai_da_base(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        (raiz / "notas" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "b.xml").unlink()
+
+        self._rodar(raiz)
+
+        assert set(self._csv(raiz)["arquivo_origem"]) == {"a.xml"}
+
+    @pytest.mark.parametrize("conteudo", ["\x00\x01;;\n\"sem fim", "data;produto\n01/03/2026;LEITE\n"])
+    def test_base_anterior_ilegivel_reprocessa_tudo(self, raiz, conteudo):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        # CSV corrompido, ou sem a coluna arquivo_origem
+        (raiz / "resources" / "outputData" / "minha_inflacao.csv").write_text(conteudo, encoding="utf-8")
+
+        p = self._rodar(raiz)
+
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"a.xml", "b.xml"}
+        assert set(self._csv(raiz)["arquivo_origem"]) == {"a.xml", "b.xml"}
+
+    def test_copia_inalterada_volta_quando_a_origem_sai(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        with zipfile.ZipFile(raiz / "notas" / "lote.zip", "w") as zf:
+            zf.writestr("dup.xml", XML_VALIDO)
+            zf.writestr("outra.xml", _xml_outra_nota())
+        self._rodar(raiz)
+        assert set(self._csv(raiz)["arquivo_origem"]) == {"a.xml", "lote.zip::outra.xml"}
+        (raiz / "notas" / "a.xml").unlink()
+
+        p = self._rodar(raiz)
+
+        # Só o membro com a cópia é relido; o outro continua vindo da base anterior
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"lote.zip::dup.xml"}
+        df = self._csv(raiz)
+        assert set(df["arquivo_origem"]) == {"lote.zip::dup.xml", "lote.zip::outra.xml"}
+        assert len(df) == 4
+
+    def test_chave_da_base_anterior_deduplica(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "copia.xml").write_text(XML_VALIDO, encoding="utf-8")
+
+        p = self._rodar(raiz)
+
+        assert len(p.dados_consolidados) == 0
+        assert len(self._csv(raiz)) == 2
+
+    def test_zip_alterado_le_apenas_membros_novos(self, raiz):
+        zip_path = raiz / "notas" / "lote.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("a.xml", XML_VALIDO)
+        self._rodar(raiz)
+        with zipfile.ZipFile(zip_path, "a") as zf:
+            zf.writestr("b.xml", _xml_outra_nota())
+
+        p = self._rodar(raiz)
+
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"lote.zip::b.xml"}
+        assert set(self._csv(raiz)["arquivo_origem"]) == {"lote.zip::a.xml", "lote.zip::b.xml"}
+
+    def test_modo_completo_reprocessa_tudo(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+
+        p = self._rodar(raiz, completo=True)
+
+        assert len(p.dados_consolidados) == 2
+        assert len(self._csv(raiz)) == 2
+
+    def test_atualizar_devolve_apenas_o_acrescimo(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        avisos = []
+
+        resultado = ProcessadorDeCupons().atualizar(raiz / "notas", progresso=lambda *a: avisos.append(a))
+
+        assert resultado.arquivos == ["b.xml"]
+        assert resultado.somente_acrescimo
+        assert resultado.itens == 4
+        assert list(resultado.novos["arquivo_origem"]) == ["b.xml", "b.xml"]
+        assert list(resultado.novos.columns) == list(self._csv(raiz).columns)
+        assert avisos == [("b.xml", 1, 1, 2)]
+
+    def test_indice_fechado_ao_final(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        p = self._rodar(raiz)
+        assert p._indice is None
+
+        p = ProcessadorDeCupons()
+        p.atualizar(raiz / "notas")
+        assert p._indice is None
+
+    def test_atualizar_com_remocao_nao_e_acrescimo(self, raiz):
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        (raiz / "notas" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "b.xml").unlink()
+
+        resultado = ProcessadorDeCupons().atualizar(raiz / "notas")
+
+        assert resultado.arquivos == []
+        assert not resultado.somente_acrescimo
+        assert resultado.novos.empty
+
+    def test_subpastas_identificadas_pelo_caminho_relativo(self, raiz):
+        (raiz / "notas" / "2024" / "03").mkdir(parents=True)
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "2024" / "03" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        (raiz / "notas" / "rascunhos").mkdir()
+        (raiz / "notas" / "rascunhos" / "c.xml").write_text(_xml_outra_nota("OUTRO"), encoding="utf-8")
+
+        resultado = ProcessadorDeCupons().atualizar(raiz / "notas", excluir=["rascunhos"])
+
+        assert resultado.arquivos == ["2024/03/b.xml"]
+        assert set(self._csv(raiz)["arquivo_origem"]) == {"a.xml", "2024/03/b.xml"}
+        assert ProcessadorDeCupons().atualizar(raiz / "notas", excluir=["rascunhos"]).arquivos == []
+
+
+    @pytest.mark.parametrize("completo", [False, True])
+    def test_filtros_so_restringem_a_leitura(self, raiz, completo):
+        import json
+        (raiz / "notas" / "2024").mkdir()
+        (raiz / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        (raiz / "notas" / "2024" / "b.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        self._rodar(raiz)
+        (raiz / "notas" / "2024" / "b.xml").write_text(_xml_outra_nota("CAFE SOLUVEL 200G"), encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(raiz / "notas", completo=completo, incluir=["2024/*"])
+        p.exportar_csv()
+        p.fechar()
+
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"2024/b.xml"}
+        df = self._csv(raiz)
+        assert list(df["arquivo_origem"]).count("a.xml") == 2
+        assert "CAFE SOLUVEL 200G" in set(df["produto"])
+        manifesto = json.loads((raiz / "resources" / "outputData" / "manifesto_ingestao.json").read_text())
+        assert set(manifesto["arquivos"]) == {"a.xml", "2024/b.xml"}
+        # Sem filtros, nada mudou: nenhum arquivo é lido
+        assert ProcessadorDeCupons().atualizar(raiz / "notas").arquivos == []
+
+
+# ── Extração paralela (--jobs) ─────────────────────────────────────────────────
+
+class TestExtracaoParalela:
+    def _preparar(self, tmp_path, monkeypatch):
+        (tmp_path / "src").mkdir()
+        pasta = tmp_path / "notas"
+        pasta.mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        (pasta / "b.xml").write_text(XML_VALIDO, encoding="utf-8")
+        with zipfile.ZipFile(pasta / "a.zip", "w") as zf:
+            zf.writestr("dup.xml", XML_VALIDO)
+            zf.writestr("outra.xml", _xml_outra_nota())
+            zf.writestr("danfe.pdf", b"%PDF-1.4 dummy")
+        return pasta
+
+    def _exportar(self, tmp_path, pasta, jobs):
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta, completo=True, jobs=jobs)
+        p.exportar_csv()
+        return (tmp_path / "resources" / "outputData" / "minha_inflacao.csv").read_bytes()
+
+    def test_csv_identico_ao_serial(self, tmp_path, monkeypatch):
+        pasta = self._preparar(tmp_path, monkeypatch)
+        serial = self._exportar(tmp_path, pasta, jobs=1)
+        paralelo = self._exportar(tmp_path, pasta, jobs=2)
+        assert paralelo == serial
+
+    def test_deduplicacao_preservada(self, tmp_path, monkeypatch):
+        pasta = self._preparar(tmp_path, monkeypatch)
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta, completo=True, jobs=2)
+        # a.zip vem antes de b.xml: a nota duplicada é registrada a partir do ZIP
+        assert len(p.dados_consolidados) == 4
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"a.zip::dup.xml", "a.zip::outra.xml"}
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_relatorio_de_metricas(self, tmp_path, monkeypatch, jobs):
+        import json
+        pasta = self._preparar(tmp_path, monkeypatch)
+        self._exportar(tmp_path, pasta, jobs=jobs)
+
+        relatorio = json.loads((tmp_path / "resources" / "outputData" / "metricas_ingestao.json").read_text())
+        assert relatorio["arquivos"] == 2
+        assert relatorio["itens"] == 4
+        assert relatorio["bytes"] == sum(f.stat().st_size for f in pasta.iterdir())
+        por_arquivo = {a["arquivo"]: a for a in relatorio["por_arquivo"]}
+        assert por_arquivo["a.zip"]["itens"] == 4 and por_arquivo["b.xml"]["itens"] == 0
+        assert por_arquivo["a.zip"]["etapas"]["descompactacao"] > 0
+        # b.xml só repete a nota de a.zip::dup.xml: passa apenas pela pré-sondagem
+        assert por_arquivo["b.xml"]["etapas"]["presondagem"] > 0
+        assert "leitura" not in por_arquivo["b.xml"]["etapas"]
+        for etapa in ["planejamento", "parse", "deduplicacao", "exportacao"]:
+            assert relatorio["etapas_segundos"][etapa] > 0
+
+
+    def test_tarefas_levam_so_as_chaves_do_arquivo(self, tmp_path, monkeypatch):
+        from concurrent.futures import Future
+        tarefas = []
+
+        class PoolSincrono:
+            def __init__(self, max_workers=None):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def submit(self, funcao, *args):
+                tarefas.append((funcao, args))
+                futuro = Future()
+                futuro.set_result(funcao(*args))
+                return futuro
+
+        (tmp_path / "src").mkdir()
+        pasta = tmp_path / "notas"
+        pasta.mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        (pasta / "c.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta)
+        p.exportar_csv()
+        p.fechar()
+
+        # b.xml é uma nota nova; d.xml repete a nota de c.xml, já no índice
+        (pasta / "b.xml").write_text(XML_VALIDO, encoding="utf-8")
+        (pasta / "d.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+        monkeypatch.setattr(processadorCuponsFiscais, "ProcessPoolExecutor", PoolSincrono)
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta, jobs=2)
+        p.fechar()
+
+        extracoes = {args[-1]: args for funcao, args in tarefas if funcao is processadorCuponsFiscais._extrair_arquivo}
+        assert {nome: args[1] for nome, args in extracoes.items()} == {"b.xml": {}, "d.xml": {OUTRA_CHAVE: ".xml"}}
+        assert {nome: args[4] for nome, args in extracoes.items()} == {"b.xml": {NFE_CHAVE: ".xml"}, "d.xml": {}}
+
+
+# ── Pré-sondagem de chaves ─────────────────────────────────────────────────────
+
+class TestPreSondagem:
+    @pytest.fixture
+    def pasta(self, tmp_path, monkeypatch):
+        (tmp_path / "src").mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        pasta = tmp_path / "notas"
+        pasta.mkdir()
+        return pasta
+
+    def test_copia_de_xml_nao_e_lida(self, pasta, monkeypatch):
+        lidos = []
+        extrair = processadorCuponsFiscais.extrair_nota_do_xml
+        monkeypatch.setattr(processadorCuponsFiscais, "extrair_nota_do_xml",
+                            lambda conteudo, origem: lidos.append(origem) or extrair(conteudo, origem))
+        for nome in ["a.xml", "b.xml"]:
+            (pasta / nome).write_text(XML_VALIDO, encoding="utf-8")
+        (pasta / "c.xml").write_text(_xml_outra_nota(), encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta, completo=True)
+
+        assert lidos == ["a.xml", "c.xml"]
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"a.xml", "c.xml"}
+
+    @pytest.mark.skipif(not processadorCuponsFiscais.CACHE_XLSX_DISPONIVEL, reason="cache de XLSX requer pyarrow")
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_xml_prevalece_sobre_planilha_lida_antes(self, pasta, jobs):
+        # a.zip vem antes de b.xml, mas a nota em comum fica com o XML
+        with zipfile.ZipFile(pasta / "a.zip", "w") as zf:
+            zf.writestr("citizen.xlsx", _xlsx_citizen(TestImportadorCitizen.LINHAS))
+        (pasta / "b.xml").write_text(XML_VALIDO, encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta, completo=True, jobs=jobs)
+
+        origens = {(i["chave_nfe"], i["arquivo_origem"]) for i in p.dados_consolidados}
+        assert origens == {(NFE_CHAVE, "b.xml"), (OUTRA_CHAVE, "a.zip::citizen.xlsx")}
+
+    def test_copia_lida_se_a_origem_escolhida_falhar(self, pasta):
+        # O Id está nos bytes, mas o XML está truncado e não gera a nota
+        (pasta / "a.xml").write_text(XML_VALIDO[:XML_VALIDO.index("<det")], encoding="utf-8")
+        (pasta / "b.xml").write_text(XML_VALIDO, encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(pasta, completo=True)
+
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"b.xml"}
+        assert len(p.dados_consolidados) == 2
+
+
+# ── Checkpoint e --resume ──────────────────────────────────────────────────────
+
+TERCEIRA_CHAVE = NFE_CHAVE[:-4] + "7777"
+
+
+class TestRetomada:
+    @pytest.fixture
+    def raiz(self, tmp_path, monkeypatch):
+        (tmp_path / "src").mkdir()
+        (tmp_path / "notas").mkdir()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        with zipfile.ZipFile(tmp_path / "notas" / "lote.zip", "w") as zf:
+            zf.writestr("a.xml", XML_VALIDO)
+            zf.writestr("b.xml", _xml_outra_nota())
+            zf.writestr("c.xml", XML_VALIDO.replace(NFE_CHAVE, TERCEIRA_CHAVE))
+        return tmp_path
+
+    def _interromper_em(self, monkeypatch, parar_em, lidos):
+        extrair = processadorCuponsFiscais.extrair_nota_do_xml
+
+        def _extrair(conteudo, origem):
+            lidos.append(origem)
+            if origem == parar_em:
+                raise KeyboardInterrupt
+            return extrair(conteudo, origem)
+        monkeypatch.setattr(processadorCuponsFiscais, "extrair_nota_do_xml", _extrair)
+
+    def _interromper(self, raiz, monkeypatch):
+        self._interromper_em(monkeypatch, "lote.zip::c.xml", [])
+        with pytest.raises(KeyboardInterrupt):
+            ProcessadorDeCupons().varrer_diretorio(raiz / "notas")
+        monkeypatch.undo()
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(raiz / "src" / "processadorCuponsFiscais.py"))
+
+    def _csv(self, raiz):
+        return pd.read_csv(raiz / "resources" / "outputData" / "minha_inflacao.csv",
+                           sep=";", decimal=",", encoding="utf-8-sig", dtype={"chave_nfe": str})
+
+    def test_retoma_do_ultimo_membro_concluido(self, raiz, monkeypatch):
+        self._interromper(raiz, monkeypatch)
+        lidos = []
+        self._interromper_em(monkeypatch, None, lidos)
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(raiz / "notas", retomar=True)
+        p.exportar_csv()
+
+        # b.xml era a última origem registrada: sem saber se ainda teria outras
+        # notas, ela não conta como concluída e é relida junto com c.xml
+        assert lidos == ["lote.zip::b.xml", "lote.zip::c.xml"]
+        df = self._csv(raiz)
+        assert len(df) == 6
+        assert set(df["chave_nfe"]) == {NFE_CHAVE, OUTRA_CHAVE, TERCEIRA_CHAVE}
+        assert not (raiz / "resources" / "outputData" / "checkpoint_ingestao").exists()
+
+    def test_sem_resume_recomeca(self, raiz, monkeypatch):
+        self._interromper(raiz, monkeypatch)
+        lidos = []
+        self._interromper_em(monkeypatch, None, lidos)
+
+        ProcessadorDeCupons().varrer_diretorio(raiz / "notas")
+
+        assert lidos == ["lote.zip::a.xml", "lote.zip::b.xml", "lote.zip::c.xml"]
+
+    def test_arquivo_alterado_desde_a_interrupcao_descarta_checkpoint(self, raiz, monkeypatch):
+        self._interromper(raiz, monkeypatch)
+        with zipfile.ZipFile(raiz / "notas" / "lote.zip", "a") as zf:
+            zf.writestr("d.txt", "novo membro")
+        lidos = []
+        self._interromper_em(monkeypatch, None, lidos)
+
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(raiz / "notas", retomar=True)
+
+        assert len(lidos) == 3
+        assert len(p.dados_consolidados) == 6
+
+
+# ── Índice persistente de chaves ───────────────────────────────────────────────
+
+class TestIndiceChavesPersistente:
+    def _rodar(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(processadorCuponsFiscais, "__file__", str(tmp_path / "src" / "processadorCuponsFiscais.py"))
+        p = ProcessadorDeCupons()
+        p.varrer_diretorio(tmp_path / "notas")
+        p.exportar_csv()
+        p.fechar()
+        return p
+
+    def test_chave_registrada_com_origem(self, tmp_path, monkeypatch):
+        (tmp_path / "notas").mkdir()
+        with zipfile.ZipFile(tmp_path / "notas" / "lote.zip", "w") as zf:
+            zf.writestr("nota.xml", XML_VALIDO)
+        self._rodar(tmp_path, monkeypatch)
+
+        from indice_chaves import IndiceChaves
+        origem = IndiceChaves(tmp_path / "resources" / "outputData" / "indice_chaves.sqlite").origem(NFE_CHAVE)
+        assert origem["arquivo"] == "lote.zip"
+        assert origem["membro"] == "nota.xml"
+        assert origem["qtd_itens"] == 2
+
+    def test_xml_substitui_nota_anterior_de_formato_inferior(self, tmp_path, monkeypatch):
+        (tmp_path / "notas").mkdir()
+        (tmp_path / "notas" / "a.xml").write_text(XML_VALIDO, encoding="utf-8")
+        self._rodar(tmp_path, monkeypatch)
+        # Simula que a nota tinha vindo de um PDF na execução anterior
+        from indice_chaves import IndiceChaves
+        indice = IndiceChaves(tmp_path / "resources" / "outputData" / "indice_chaves.sqlite")
+        indice.registrar(NFE_CHAVE, "a.xml", ".pdf", 2)
+        indice.salvar()
+        indice.fechar()
+        (tmp_path / "notas" / "b.xml").write_text(XML_VALIDO, encoding="utf-8")
+
+        p = self._rodar(tmp_path, monkeypatch)
+
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"b.xml"}
+        df = pd.read_csv(tmp_path / "resources" / "outputData" / "minha_inflacao.csv", sep=";", encoding="utf-8-sig")
+        assert set(df["arquivo_origem"]) == {"b.xml"}
+
+
+class TestLoteXmlConcatenado:
+    def test_lote_gera_itens_de_todas_as_notas(self, tmp_path):
+        lote = tmp_path / "lote_sefaz.xml"
+        lote.write_text(XML_VALIDO + _xml_outra_nota() + XML_VALIDO, encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.processar_arquivo_xml(lote)
+
+        # A terceira nota repete a chave da primeira e é descartada
+        assert len(p.dados_consolidados) == 4
+        assert p._chaves_processadas == {NFE_CHAVE, OUTRA_CHAVE}
+
+    def test_xml_grande_lido_em_streaming(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(processadorCuponsFiscais, "LIMITE_XML_STREAMING", 10)
+        xml_file = tmp_path / "nota.xml"
+        xml_file.write_text(XML_VALIDO, encoding="utf-8")
+
+        p = ProcessadorDeCupons()
+        p.processar_arquivo_xml(xml_file)
+
+        assert len(p.dados_consolidados) == 2
+
+
+# ── ZIPs: leitura em fluxo e limite de descompactação ─────────────────────────
+
+class TestZipStreaming:
+    def _zip_aninhado(self, tmp_path):
+        interno = io.BytesIO()
+        with zipfile.ZipFile(interno, "w") as zf:
+            zf.writestr("2024/nota.xml", XML_VALIDO)
+        zip_path = tmp_path / "export.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("outra.xml", _xml_outra_nota())
+            zf.writestr("interno.zip", interno.getvalue())
+        return zip_path
+
+    def test_zip_aninhado(self, tmp_path):
+        p = ProcessadorDeCupons()
+        p.processar_zip(self._zip_aninhado(tmp_path))
+        origens = {i["arquivo_origem"] for i in p.dados_consolidados}
+        assert origens == {"export.zip::outra.xml", "export.zip::interno.zip::2024/nota.xml"}
+
+    def test_zip_aninhado_grande_passa_pelo_disco(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(processadorCuponsFiscais, "LIMITE_SPOOL_MEMORIA", 16)
+        p = ProcessadorDeCupons()
+        p.processar_zip(self._zip_aninhado(tmp_path))
+        assert len(p.dados_consolidados) == 4
+
+    def test_limite_de_descompactacao_interrompe_o_zip(self, tmp_path, monkeypatch):
+        # Cabe o primeiro XML, mas não o ZIP aninhado
+        monkeypatch.setattr(processadorCuponsFiscais, "LIMITE_DESCOMPACTADO_POR_ZIP", len(XML_VALIDO) + 100)
+        p = ProcessadorDeCupons()
+        p.processar_zip(self._zip_aninhado(tmp_path))
+        assert {i["arquivo_origem"] for i in p.dados_consolidados} == {"export.zip::outra.xml"}
+
+
+# ── Importador Citizen (XLSX) ──────────────────────────────────────────────────
+
+def _xlsx_citizen(linhas):
+    cabecalho = ["Chave", "Descricao", "TipoDespesa", "NomeFantasia", "RazaoSocial", "Endereco", "Numero",
+                 "Bairro", "Cidade", "UF", "CEP", "Quantidade", "ValorUnitarioProduto", "ValorTotalProduto",
+                 "DataEmissao", "CNPJ", "Unidade", "NCM"]
+    titulo = ["Exportação Citizen"] + [None] * (len(cabecalho) - 1)
+    buffer = io.BytesIO()
+    pd.DataFrame([titulo, cabecalho] + linhas).to_excel(buffer, sheet_name="Notas Fiscais", index=False, header=False)
+    return buffer.getvalue()
+
+
+class TestImportadorCitizen:
+    LINHAS = [
+        [NFE_CHAVE, "LEITE 1L", "DocumentoFiscal", None, "MERCADO LTDA", "RUA A", 100, "CENTRO", "Recife", "PE",
+         "50000-000", "1,5", 4.89, 7.34, "2026-03-01", "06057223049189", "UN", "04011000"],
+        [OUTRA_CHAVE, "CAFE 500G", "DocumentoFiscal", "LOJA B", None, None, None, None, "Olinda", None,
+         None, 2, "x", 20.0, "01/03/2026", None, "PCT", None],
+        [NFE_CHAVE, "SACOLA", "DocumentoFiscal", "LOJA A", None, None, None, None, None, None,
+         None, 1, 0, 0, "2026-03-01", None, "UN", None],
+        [NFE_CHAVE, "PAO", "Manual", "LOJA A", None, None, None, None, None, None,
+         None, 1, 1.0, 1.0, "2026-03-01", None, "UN", None],
+    ]
+
+    def test_converte_colunas_como_a_leitura_por_linha(self):
+        notas = ProcessadorDeCupons._notas_do_xlsx_citizen(_xlsx_citizen(self.LINHAS), "citizen.xlsx")
+
+        assert [chave for chave, _ in notas] == [NFE_CHAVE, OUTRA_CHAVE]
+        leite = notas[0][1]
+        # Total zerado e despesa manual ficam de fora
+        assert [i["produto"] for i in leite] == ["LEITE 1L"]
+        assert leite[0]["loja"] == "MERCADO LTDA"
+        assert leite[0]["endereco"] == "RUA A, 100, CENTRO, Recife - PE, CEP 50000-000"
+        assert leite[0]["qtd"] == pytest.approx(1.5)
+        assert leite[0]["data"] == "01/03/2026"
+        cafe = notas[1][1][0]
+        assert cafe["endereco"] == "Olinda"
+        assert cafe["preco_unit"] == 0.0
+        assert cafe["qtd"] == 2.0
+
+    def test_chaves_conhecidas_sao_descartadas_antes_da_conversao(self):
+        notas = ProcessadorDeCupons._notas_do_xlsx_citizen(
+            _xlsx_citizen(self.LINHAS), "citizen.xlsx", lambda chave, formato: chave == NFE_CHAVE)
+        assert notas[0] == (NFE_CHAVE, None)
+        assert len(notas[1][1]) == 1
+
+    def test_nota_anterior_de_pdf_nao_e_descartada(self):
+        from indice_chaves import IndiceChaves
+        p = ProcessadorDeCupons()
+        p._indice = IndiceChaves()
+        p._indice.registrar(NFE_CHAVE, "nota.pdf", ".pdf", 1)
+
+        assert p._chave_conhecida(NFE_CHAVE, ".pdf")
+        assert not p._chave_conhecida(NFE_CHAVE, ".xlsx")
+        assert p._processar_xlsx_citizen(_xlsx_citizen(self.LINHAS), "citizen.xlsx") == 2
+        assert p._chaves_substituidas == {NFE_CHAVE}
+
+    def test_nota_dividida_entre_blocos(self, monkeypatch):
+        from functools import partial
+        from extratorXlsx import iterar_blocos_citizen
+        linhas = self.LINHAS + [[NFE_CHAVE, "MANTEIGA", "DocumentoFiscal", "LOJA A", None, None, None, None, None,
+                                 None, None, 1, 9.9, 9.9, "2026-03-01", None, "UN", None]]
+        inteiro = ProcessadorDeCupons._notas_do_xlsx_citizen(_xlsx_citizen(linhas), "citizen.xlsx")
+        monkeypatch.setattr(processadorCuponsFiscais, "iterar_blocos_citizen",
+                            partial(iterar_blocos_citizen, tamanho_bloco=1))
+
+        em_blocos = ProcessadorDeCupons._notas_do_xlsx_citizen(_xlsx_citizen(linhas), "citizen.xlsx")
+
+        assert em_blocos == inteiro
+        assert [i["produto"] for i in em_blocos[0][1]] == ["LEITE 1L", "MANTEIGA"]
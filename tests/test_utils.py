@@ -203,3 +203,77 @@ class TestFormatCurrency:
     def test_valor_negativo(self):
         from utils import format_currency
         assert format_currency(-123.45) == "R$ -123,45"
+
+
+# ── carregar_base ─────────────────────────────────────────────────────────────
+
+class TestCarregarBase:
+    """Testes para carregar_base(): Parquet preferido ao CSV quando atualizado."""
+
+    @staticmethod
+    def _gravar_csv(pasta, produto):
+        pd.DataFrame({'data': ['02/03/2026', '01/03/2026'], 'produto': [produto, 'CAFE'],
+                      'preco_total': [4.89, 20.0]}).to_csv(
+            pasta / 'minha_inflacao.csv', sep=';', decimal=',', encoding='utf-8-sig', index=False)
+
+    def test_sem_base_retorna_none(self, tmp_path):
+        from utils import carregar_base
+        assert carregar_base(tmp_path) is None
+
+    def test_le_csv_e_converte_datas(self, tmp_path):
+        from utils import carregar_base
+        self._gravar_csv(tmp_path, 'LEITE')
+        df = carregar_base(tmp_path)
+        assert df['produto'].tolist() == ['CAFE', 'LEITE']
+        assert df['data'].iloc[0] == pd.Timestamp(2026, 3, 1)
+        assert df['preco_total'].iloc[1] == pytest.approx(4.89)
+
+    @staticmethod
+    def _gravar_parquet(pasta, produto):
+        from notas_itens import caminhos_notas_itens, separar_notas
+        df = pd.DataFrame({'data': pd.to_datetime(['2026-03-01']), 'loja': pd.Categorical(['LOJA']),
+                           'produto': pd.Categorical([produto]), 'preco_total': [4.89]})
+        for tabela, caminho in zip(separar_notas(df), caminhos_notas_itens(pasta / 'minha_inflacao.csv')):
+            tabela.to_parquet(caminho)
+
+    def test_prefere_parquet_atualizado(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        from utils import carregar_base
+        self._gravar_csv(tmp_path, 'LEITE')
+        self._gravar_parquet(tmp_path, 'DO PARQUET')
+        df = carregar_base(tmp_path)
+        assert df['produto'].tolist() == ['DO PARQUET']
+        assert df['loja'].tolist() == ['LOJA']
+        assert isinstance(df['produto'].dtype, pd.CategoricalDtype)
+
+    def test_ignora_parquet_mais_antigo_que_o_csv(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        import os
+        from utils import carregar_base, carregar_notas_itens
+        self._gravar_parquet(tmp_path, 'DO PARQUET')
+        os.utime(tmp_path / 'minha_inflacao_itens.parquet', (0, 0))
+        self._gravar_csv(tmp_path, 'LEITE')
+        assert carregar_notas_itens(tmp_path) is None
+        assert 'LEITE' in carregar_base(tmp_path)['produto'].tolist()
+
+
+class TestAcrescentarItens:
+    """Testes para acrescentar_itens(): delta anexado à base já carregada."""
+
+    def test_anexa_e_ordena_por_data(self):
+        from utils import acrescentar_itens
+        base = pd.DataFrame({'data': pd.to_datetime(['2026-03-01', '2026-03-05']), 'produto': ['CAFE', 'LEITE']})
+        novos = pd.DataFrame({'data': ['03/03/2026'], 'produto': ['PAO']})
+        df = acrescentar_itens(base, novos)
+        assert df['produto'].tolist() == ['CAFE', 'PAO', 'LEITE']
+        assert df['data'].iloc[1] == pd.Timestamp(2026, 3, 3)
+
+    def test_sem_novos_devolve_a_base(self):
+        from utils import acrescentar_itens
+        base = pd.DataFrame({'data': pd.to_datetime(['2026-03-01']), 'produto': ['CAFE']})
+        assert acrescentar_itens(base, pd.DataFrame()) is base
+
+    def test_sem_base(self):
+        from utils import acrescentar_itens
+        df = acrescentar_itens(None, pd.DataFrame({'data': ['01/03/2026'], 'produto': ['PAO']}))
+        assert df['data'].tolist() == [pd.Timestamp(2026, 3, 1)]
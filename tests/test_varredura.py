@@ -0,0 +1,79 @@
+"""
+Testes para src/varredura.py
+"""
+import os
+
+import pytest
+
+from varredura import casa_filtros, varrer_pasta
+
+EXTENSOES = {".xml", ".pdf", ".zip", ".xlsx"}
+
+
+def _criar(pasta, *relativos):
+    for relativo in relativos:
+        caminho = pasta / relativo
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_text(relativo)
+
+
+def _relativos(*args, **kwargs):
+    return [a.relativo for a in varrer_pasta(*args, **kwargs)]
+
+
+class TestVarrerPasta:
+    def test_percorre_subpastas_em_ordem(self, tmp_path):
+        _criar(tmp_path, "b.xml", "2024/03/nota.xml", "2024/01/cupom.pdf", "a.zip", "2023/lote.zip")
+        assert _relativos(tmp_path, EXTENSOES) == [
+            "2023/lote.zip", "2024/01/cupom.pdf", "2024/03/nota.xml", "a.zip", "b.xml",
+        ]
+
+    def test_entrada_traz_caminho_formato_e_stat(self, tmp_path):
+        _criar(tmp_path, "2024/NOTA.XML")
+        [arquivo] = varrer_pasta(tmp_path, EXTENSOES)
+        stat = (tmp_path / "2024" / "NOTA.XML").stat()
+        assert arquivo.caminho == tmp_path / "2024" / "NOTA.XML"
+        assert arquivo.formato == ".xml"
+        assert (arquivo.tamanho, arquivo.mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+    def test_filtra_extensoes(self, tmp_path):
+        _criar(tmp_path, "a.xml", "leia-me.txt", "sub/b.csv")
+        assert _relativos(tmp_path, EXTENSOES) == ["a.xml"]
+        assert _relativos(tmp_path) == ["a.xml", "leia-me.txt", "sub/b.csv"]
+
+    def test_ignora_ocultos_e_macosx(self, tmp_path):
+        _criar(tmp_path, "a.xml", ".oculto.xml", ".git/b.xml", "__MACOSX/._a.xml", "sub/__MACOSX/c.xml")
+        assert _relativos(tmp_path, EXTENSOES) == ["a.xml"]
+
+    def test_incluir_por_nome_e_por_caminho(self, tmp_path):
+        _criar(tmp_path, "a.xml", "b.pdf", "2023/c.xml", "2024/03/d.pdf")
+        assert _relativos(tmp_path, EXTENSOES, incluir=["*.pdf"]) == ["2024/03/d.pdf", "b.pdf"]
+        assert _relativos(tmp_path, EXTENSOES, incluir=["2024/*"]) == ["2024/03/d.pdf"]
+
+    def test_excluir_poda_subpastas(self, tmp_path):
+        _criar(tmp_path, "a.xml", "rascunhos/b.xml", "2024/rascunhos/c.xml", "2024/d.pdf")
+        assert _relativos(tmp_path, EXTENSOES, excluir=["rascunhos"]) == ["2024/d.pdf", "a.xml"]
+        assert _relativos(tmp_path, EXTENSOES, excluir=["2024"]) == ["a.xml", "rascunhos/b.xml"]
+        assert _relativos(tmp_path, EXTENSOES, excluir=["*.pdf"]) == [
+            "2024/rascunhos/c.xml", "a.xml", "rascunhos/b.xml",
+        ]
+
+    def test_casa_filtros_igual_a_varredura(self, tmp_path):
+        relativos = ["a.xml", "b.pdf", "2023/c.xml", "2024/03/d.pdf", "2024/rascunhos/e.xml", "rascunhos/f.xml"]
+        _criar(tmp_path, *relativos)
+        for filtros in [{"incluir": ["2024/*"]}, {"incluir": ["*.pdf"], "excluir": ["2024"]},
+                        {"excluir": ["rascunhos", "*.pdf"]}, {}]:
+            esperados = _relativos(tmp_path, EXTENSOES, **filtros)
+            assert [r for r in sorted(relativos) if casa_filtros(r, **filtros)] == sorted(esperados)
+
+    def test_pasta_inexistente(self, tmp_path):
+        assert _relativos(tmp_path / "nao-existe", EXTENSOES) == []
+
+    @pytest.mark.skipif(not hasattr(os, "symlink"), reason="sem suporte a links simbólicos")
+    def test_nao_segue_link_para_pasta(self, tmp_path):
+        _criar(tmp_path, "notas/a.xml", "fora/b.xml")
+        try:
+            os.symlink(tmp_path / "fora", tmp_path / "notas" / "atalho", target_is_directory=True)
+        except OSError:
+            pytest.skip("sem permissão para criar links simbólicos")
+        assert _relativos(tmp_path / "notas", EXTENSOES) == ["a.xml"]
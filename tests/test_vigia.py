@@ -0,0 +1,153 @@
+"""
+Testes para src/vigia.py
+"""
+import os
+from datetime import datetime, timedelta
+
+from vigia import VigiaPasta, ler_status, vigia_ativo
+
+EXTENSOES = {".xml", ".pdf", ".zip", ".xlsx"}
+
+
+class Relogio:
+    def __init__(self, inicio):
+        self.agora = inicio
+
+    def __call__(self):
+        return self.agora
+
+
+def _vigia(tmp_path, relogio, ingestoes):
+    pasta = tmp_path / "notas"
+    pasta.mkdir(exist_ok=True)
+
+    def _ingerir():
+        ingestoes.append(sorted(os.listdir(pasta)))
+        return len(ingestoes)
+    return pasta, VigiaPasta(pasta, _ingerir, tmp_path / "status.json", EXTENSOES,
+                             intervalo=1, estabilizacao=3, relogio=relogio)
+
+
+def _antigo(caminho, segundos=60):
+    instante = caminho.stat().st_mtime - segundos
+    os.utime(caminho, (instante, instante))
+
+
+class TestVigiaPasta:
+    def test_ingere_arquivos_existentes_ao_iniciar(self, tmp_path):
+        relogio, ingestoes = Relogio(0), []
+        pasta, vigia = _vigia(tmp_path, relogio, ingestoes)
+        (pasta / "a.xml").write_text("<nfe/>")
+        _antigo(pasta / "a.xml")
+        relogio.agora = (pasta / "a.xml").stat().st_mtime + 60
+
+        assert vigia.verificar() is True
+        assert ingestoes == [["a.xml"]]
+        relogio.agora += 1
+        assert vigia.verificar() is False
+
+    def test_espera_arquivo_parar_de_crescer(self, tmp_path):
+        relogio, ingestoes = Relogio(0), []
+        pasta, vigia = _vigia(tmp_path, relogio, ingestoes)
+        relogio.agora = os.stat(pasta).st_mtime + 100
+        vigia.verificar()
+
+        novo = pasta / "nova.pdf"
+        novo.write_bytes(b"%PDF parcial")
+        assert vigia.verificar() is False
+        assert ler_status(tmp_path / "status.json")["pendentes"] == ["nova.pdf"]
+
+        relogio.agora += 2
+        novo.write_bytes(b"%PDF parcial, agora completo")
+        assert vigia.verificar() is False  # mudou: a contagem recomeça
+
+        relogio.agora += 2
+        assert vigia.verificar() is False
+        relogio.agora += 1
+        assert vigia.verificar() is True
+        assert ingestoes[-1] == ["nova.pdf"]
+        assert ler_status(tmp_path / "status.json")["arquivos_ultima_ingestao"] == ["nova.pdf"]
+
+    def test_ignora_temporarios_e_outras_extensoes(self, tmp_path):
+        relogio, ingestoes = Relogio(0), []
+        pasta, vigia = _vigia(tmp_path, relogio, ingestoes)
+        relogio.agora = os.stat(pasta).st_mtime + 100
+        vigia.verificar()
+        for nome in ["baixando.pdf.part", "~$planilha.xlsx", "leia-me.txt", ".oculto.xml"]:
+            (pasta / nome).write_text("x")
+
+        relogio.agora += 10
+        assert vigia.verificar() is False
+        assert len(ingestoes) == 1
+
+    def test_remocao_dispara_ingestao(self, tmp_path):
+        relogio, ingestoes = Relogio(0), []
+        pasta, vigia = _vigia(tmp_path, relogio, ingestoes)
+        (pasta / "a.xml").write_text("<nfe/>")
+        relogio.agora = (pasta / "a.xml").stat().st_mtime + 60
+        vigia.verificar()
+
+        (pasta / "a.xml").unlink()
+        relogio.agora += 1
+        assert vigia.verificar() is True
+        assert ler_status(tmp_path / "status.json")["arquivos_ultima_ingestao"] == ["a.xml"]
+
+    def test_vigia_subpastas(self, tmp_path):
+        relogio, ingestoes = Relogio(0), []
+        pasta, vigia = _vigia(tmp_path, relogio, ingestoes)
+        relogio.agora = os.stat(pasta).st_mtime + 100
+        vigia.verificar()
+        (pasta / "2024" / "03").mkdir(parents=True)
+        (pasta / "2024" / "03" / "nota.xml").write_text("<nfe/>")
+        (pasta / "2024" / "03" / "baixando.pdf.part").write_text("x")
+
+        relogio.agora += 10
+        vigia.verificar()
+        relogio.agora += 10
+        assert vigia.verificar() is True
+        assert ler_status(tmp_path / "status.json")["arquivos_ultima_ingestao"] == ["2024/03/nota.xml"]
+
+    def test_falha_registrada_e_nao_repetida_ate_a_pasta_mudar(self, tmp_path):
+        relogio = Relogio(0)
+        pasta = tmp_path / "notas"
+        pasta.mkdir()
+        chamadas = []
+
+        def _falhar():
+            chamadas.append(1)
+            raise ValueError("CSV travado")
+        vigia = VigiaPasta(pasta, _falhar, tmp_path / "status.json", EXTENSOES, estabilizacao=3, relogio=relogio)
+        relogio.agora = os.stat(pasta).st_mtime + 100
+
+        assert vigia.verificar() is False
+        status = ler_status(tmp_path / "status.json")
+        assert status["estado"] == "erro" and "CSV travado" in status["erro"]
+        vigia.verificar()
+        assert len(chamadas) == 1
+
+    def test_status_parado_ao_encerrar(self, tmp_path):
+        relogio, ingestoes = Relogio(0), []
+        _, vigia = _vigia(tmp_path, relogio, ingestoes)
+        vigia.intervalo = 0
+        verificacoes = iter([False, True])
+        vigia.executar(parar=lambda: next(verificacoes))
+
+        status = ler_status(tmp_path / "status.json")
+        assert status["estado"] == "parado"
+        assert status["itens"] == 1
+        assert not vigia_ativo(status)
+
+
+class TestVigiaAtivo:
+    def test_heartbeat_recente(self):
+        agora = datetime(2026, 3, 1, 12, 0, 0)
+        status = {"estado": "aguardando", "intervalo": 2, "heartbeat": (agora - timedelta(seconds=5)).isoformat()}
+        assert vigia_ativo(status, agora)
+        assert not vigia_ativo(status, agora + timedelta(minutes=5))
+
+    def test_status_ausente_ou_invalido(self, tmp_path):
+        assert ler_status(tmp_path / "nao_existe.json") is None
+        (tmp_path / "status.json").write_text("{quebrado")
+        assert ler_status(tmp_path / "status.json") is None
+        assert not vigia_ativo(None)
+        assert not vigia_ativo({"estado": "aguardando"})